@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from collections import Counter
+
+from sqlalchemy.orm import sessionmaker
+
+from src.config import settings
+from src.repositories.workflow import WorkFlowRepository
+
+logger = logging.getLogger(__name__)
+
+
+class AccessCounter:
+    """
+    Counts the path and image requests of every workflow in memory.
+    The counts are added to the persisted counters in batches, so reads never write to the database.
+    """
+
+    def __init__(self):
+        self._counts = Counter()
+
+    def record(self, workflow_id: int):
+        self._counts[workflow_id] += 1
+
+    async def flush(self, session_factory: sessionmaker):
+        """
+        Adds the counts recorded since the previous flush to the persisted counters.
+
+        Args:
+            session_factory: The session factory of the primary.
+        """
+        counts, self._counts = self._counts, Counter()
+        if not counts:
+            return
+        try:
+            async with session_factory() as session:
+                await WorkFlowRepository(session=session).add_access_counts(counts=counts)
+        except Exception:
+            # The counts are added by the next flush
+            self._counts.update(counts)
+            raise
+
+    async def flush_periodically(self, session_factory: sessionmaker):
+        while True:
+            await asyncio.sleep(settings.access_count_flush_seconds)
+            try:
+                await self.flush(session_factory=session_factory)
+            except Exception:
+                logger.exception("Flushing the access counts failed")
+
+
+access_counter = AccessCounter()
@@ -1,9 +1,10 @@
 from typing import List
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_async_session
+from src.database import get_async_session, get_async_read_session
 from src.repositories.condition_node import ConditionNodeRepository
 from src.schemas.condition_node import *
 
@@ -13,13 +14,13 @@ router = APIRouter(
 )
 
 
-@router.get("/list", response_model=List[ConditionNodeRead])
+@router.get("/list", response_model=List[ConditionNodeRead], response_class=ORJSONResponse)
 async def list_nodes(
         workflow_id: int = None,
         status_condition: Status = None,
         yes_edge_count: bool = None,
         no_edge_count: bool = None,
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_async_read_session)
 ):
     filters = ConditionNodeKwargs(
         workflow_id=workflow_id,
@@ -28,13 +29,14 @@ async def list_nodes(
         status_condition=status_condition,
 
     )
-    return await ConditionNodeRepository(session=session).list(**filters.model_dump())
+    rows = await ConditionNodeRepository(session=session).list_rows(fields=ConditionNodeRead.model_fields, **filters.model_dump())
+    return ORJSONResponse(rows)
 
 
 @router.get("/{node_id}", response_model=ConditionNodeRead)
 async def get_node(
         node_id: int,
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_async_read_session)
 ):
     return await ConditionNodeRepository(session=session).get(model_object_id=node_id)
 
@@ -1,9 +1,10 @@
 from typing import List
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_async_session
+from src.database import get_async_session, get_async_read_session
 from src.repositories.edge import EdgeRepository
 from src.schemas.edge import EdgeRead, EdgeCreate, EdgeUpdate, EdgeKwargs
 
@@ -13,19 +14,20 @@ router = APIRouter(
 )
 
 
-@router.get("/list", response_model=List[EdgeRead])
+@router.get("/list", response_model=List[EdgeRead], response_class=ORJSONResponse)
 async def list_edges(
         workflow_id: int = None,
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_async_read_session)
 ):
     filters = EdgeKwargs(workflow_id=workflow_id)
-    return await EdgeRepository(session=session).list(**filters.model_dump())
+    rows = await EdgeRepository(session=session).list_rows(fields=EdgeRead.model_fields, **filters.model_dump())
+    return ORJSONResponse(rows)
 
 
 @router.get("/{edge_id}", response_model=EdgeRead)
 async def get_edge(
         edge_id: int,
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_async_read_session)
 ):
     return await EdgeRepository(session=session).get(model_object_id=edge_id)
 
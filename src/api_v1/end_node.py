@@ -1,9 +1,10 @@
 from typing import List
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_async_session
+from src.database import get_async_session, get_async_read_session
 from src.repositories.end_node import EndNodeRepository
 from src.schemas.end_node import *
 
@@ -13,17 +14,18 @@ router = APIRouter(
 )
 
 
-@router.get("/list", response_model=List[EndNodeRead])
+@router.get("/list", response_model=List[EndNodeRead], response_class=ORJSONResponse)
 async def list_nodes(
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_async_read_session)
 ):
-    return await EndNodeRepository(session=session).list()
+    rows = await EndNodeRepository(session=session).list_rows(fields=EndNodeRead.model_fields)
+    return ORJSONResponse(rows)
 
 
 @router.get("/{node_id}", response_model=EndNodeRead)
 async def get_node(
         node_id: int,
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_async_read_session)
 ):
     return await EndNodeRepository(session=session).get(model_object_id=node_id)
 
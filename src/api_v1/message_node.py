@@ -1,9 +1,10 @@
 from typing import List
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_async_session
+from src.database import get_async_session, get_async_read_session
 from src.repositories.message_node import MessageNodeRepository
 from src.schemas.message_node import *
 
@@ -13,21 +14,22 @@ router = APIRouter(
 )
 
 
-@router.get("/list", response_model=List[MessageNodeRead])
+@router.get("/list", response_model=List[MessageNodeRead], response_class=ORJSONResponse)
 async def list_nodes(
         workflow_id: int = None,
         out_edge: bool = None,
         status: Status = None,
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_async_read_session)
 ):
     filters = MessageNodeKwargs(workflow_id=workflow_id, has_out_edge=out_edge, status=status)
-    return await MessageNodeRepository(session=session).list(**filters.model_dump())
+    rows = await MessageNodeRepository(session=session).list_rows(fields=MessageNodeRead.model_fields, **filters.model_dump())
+    return ORJSONResponse(rows)
 
 
 @router.get("/{node_id}", response_model=MessageNodeRead)
 async def get_node(
         node_id: int,
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_async_read_session)
 ):
     return await MessageNodeRepository(session=session).get(model_object_id=node_id)
 
@@ -4,6 +4,7 @@ from src.api_v1.edge import router as edge_router
 from src.api_v1.end_node import router as end_node_router
 from src.api_v1.message_node import router as message_node_router
 from src.api_v1.condition_node import router as condition_node_router
+from src.api_v1.subflow_node import router as subflow_node_router
 
 all_routers = [
     workflow_router,
@@ -11,5 +12,6 @@ all_routers = [
     message_node_router,
     condition_node_router,
     end_node_router,
+    subflow_node_router,
     edge_router,
 ]
@@ -1,9 +1,10 @@
 from typing import List
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_async_session
+from src.database import get_async_session, get_async_read_session
 from src.repositories.start_node import StartNodeRepository
 from src.schemas.start_node import StartNodeKwargs, StartNodeManage, StartNodeRead
 
@@ -13,20 +14,21 @@ router = APIRouter(
 )
 
 
-@router.get("/list", response_model=List[StartNodeRead])
+@router.get("/list", response_model=List[StartNodeRead], response_class=ORJSONResponse)
 async def list_nodes(
         workflow_id: int = None,
         out_edge: bool = None,
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_async_read_session)
 ):
     filters = StartNodeKwargs(workflow_id=workflow_id, has_out_edge=out_edge)
-    return await StartNodeRepository(session=session).list(**filters.model_dump())
+    rows = await StartNodeRepository(session=session).list_rows(fields=StartNodeRead.model_fields, **filters.model_dump())
+    return ORJSONResponse(rows)
 
 
 @router.get("/{node_id}", response_model=StartNodeRead)
 async def get_node(
         node_id: int,
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_async_read_session)
 ):
     return await StartNodeRepository(session=session).get(model_object_id=node_id)
 
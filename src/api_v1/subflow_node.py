@@ -0,0 +1,59 @@
+from typing import List
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import get_async_session, get_async_read_session
+from src.repositories.subflow_node import SubflowNodeRepository
+from src.schemas.subflow_node import *
+
+router = APIRouter(
+    prefix="/node/subflow",
+    tags=["subflow-nodes"]
+)
+
+
+@router.get("/list", response_model=List[SubflowNodeRead], response_class=ORJSONResponse)
+async def list_nodes(
+        workflow_id: int = None,
+        subflow_id: int = None,
+        out_edge: bool = None,
+        session: AsyncSession = Depends(get_async_read_session)
+):
+    filters = SubflowNodeKwargs(workflow_id=workflow_id, subflow_id=subflow_id, has_out_edge=out_edge)
+    rows = await SubflowNodeRepository(session=session).list_rows(fields=SubflowNodeRead.model_fields, **filters.model_dump())
+    return ORJSONResponse(rows)
+
+
+@router.get("/{node_id}", response_model=SubflowNodeRead)
+async def get_node(
+        node_id: int,
+        session: AsyncSession = Depends(get_async_read_session)
+):
+    return await SubflowNodeRepository(session=session).get(model_object_id=node_id)
+
+
+@router.post("/create", status_code=201)
+async def create_node(
+        node_in: SubflowNodeCreate,
+        session: AsyncSession = Depends(get_async_session)
+):
+    return await SubflowNodeRepository(session=session).add(values=node_in.model_dump())
+
+
+@router.patch("/update/{node_id}")
+async def update_node(
+        node_id: int,
+        node_in_data: SubflowNodeUpdate,
+        session: AsyncSession = Depends(get_async_session)
+):
+    return await SubflowNodeRepository(session=session).update(model_object_id=node_id, values=node_in_data.model_dump())
+
+
+@router.delete("/delete/{node_id}", status_code=204)
+async def delete_node(
+        node_id: int,
+        session: AsyncSession = Depends(get_async_session)
+):
+    return await SubflowNodeRepository(session=session).delete(model_object_id=node_id)
@@ -1,12 +1,22 @@
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from starlette.responses import StreamingResponse
+from sqlalchemy.orm import sessionmaker
+from starlette.responses import StreamingResponse, FileResponse
 
-from src.database import get_async_session
-from src.repositories.workflow import WorkFlowRepository
-from src.schemas.workflow import WorkflowRead, WorkflowGet
+from src.access_counter import access_counter
+from src.config import settings
+from src.database import get_async_session, get_async_read_session, get_read_session_factory
+from src.graph.render_cache import ImageFormat
+from src.snapshot import MEDIA_TYPE
+from src.repositories.workflow import WorkFlowRepository, PathEngine, NeighbourhoodDirection
+from src.repositories.workflow_version import WorkflowVersionRepository
+from src.schemas.edge import EdgeRead
+from src.schemas.workflow import WorkflowRead, WorkflowGet, WorkflowStats, WorkflowReachability, WorkflowDecisionTable, \
+    DecisionTableEvaluate, WorkflowNeighbourhood, RenderJobRead, WorkflowVersionRead, WorkflowVersionGet, \
+    WorkflowDiff
 
 router = APIRouter(
     prefix="/workflow",
@@ -14,36 +24,224 @@ router = APIRouter(
 )
 
 
-@router.get("/list", response_model=List[WorkflowRead])
+@router.get("/list", response_model=List[WorkflowRead], response_class=ORJSONResponse)
 async def list_workflows(
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_async_read_session)
+):
+    rows = await WorkFlowRepository(session=session).list_rows(fields=WorkflowRead.model_fields)
+    return ORJSONResponse(rows)
+
+
+@router.get("/diff", response_model=WorkflowDiff, response_class=ORJSONResponse)
+async def diff_workflows(
+        a: str,
+        b: str,
+        session: AsyncSession = Depends(get_async_read_session)
 ):
-    return await WorkFlowRepository(session=session).list()
+    diff = await WorkflowVersionRepository(session=session).diff(a=a, b=b, edge_fields=EdgeRead.model_fields)
+    return ORJSONResponse(diff)
 
 
-@router.get("/{workflow_id}", response_model=WorkflowGet)
+@router.get("/{workflow_id}", response_model=WorkflowGet, response_class=ORJSONResponse)
 async def get_workflow(
         workflow_id: int,
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_async_read_session)
+):
+    document = await WorkFlowRepository(session=session).get_document(workflow_id=workflow_id)
+    return ORJSONResponse(document)
+
+
+async def _stream_workflow(session_factory: sessionmaker, header):
+    # The request's session is closed before the body is sent, so the stream owns its session
+    async with session_factory() as session:
+        async for chunk in WorkFlowRepository(session=session).stream_json(
+                header=header,
+                chunk_size=settings.stream_chunk_size
+        ):
+            yield chunk
+
+
+@router.get("/{workflow_id}/stream", response_model=WorkflowGet)
+async def stream_workflow(
+        workflow_id: int,
+        session: AsyncSession = Depends(get_async_read_session),
+        session_factory: sessionmaker = Depends(get_read_session_factory)
+):
+    header = await WorkFlowRepository(session=session).get_header(workflow_id=workflow_id)
+    return StreamingResponse(_stream_workflow(session_factory=session_factory, header=header), media_type="application/json")
+
+
+@router.get("/{workflow_id}/stats", response_model=WorkflowStats)
+async def get_workflow_stats(
+        workflow_id: int,
+        session: AsyncSession = Depends(get_async_read_session)
+):
+    return await WorkFlowRepository(session=session).get_stats(workflow_id=workflow_id)
+
+
+@router.get("/{workflow_id}/neighbourhood", response_model=WorkflowNeighbourhood, response_class=ORJSONResponse)
+async def get_neighbourhood(
+        workflow_id: int,
+        node_id: int,
+        hops: int = Query(1, ge=0, le=settings.neighbourhood_max_hops),
+        direction: NeighbourhoodDirection = NeighbourhoodDirection.BOTH,
+        session: AsyncSession = Depends(get_async_read_session)
+):
+    return await WorkFlowRepository(session=session).get_neighbourhood(
+        workflow_id=workflow_id,
+        node_id=node_id,
+        hops=hops,
+        direction=direction
+    )
+
+
+@router.get("/{workflow_id}/reachable", response_model=WorkflowReachability)
+async def is_reachable(
+        workflow_id: int,
+        from_node_id: int = Query(alias="from"),
+        to_node_id: int = Query(alias="to"),
+        session: AsyncSession = Depends(get_async_read_session)
+):
+    reachable = await WorkFlowRepository(session=session).is_reachable(
+        workflow_id=workflow_id,
+        from_node_id=from_node_id,
+        to_node_id=to_node_id
+    )
+    return WorkflowReachability(from_node_id=from_node_id, to_node_id=to_node_id, reachable=reachable)
+
+
+@router.get("/{workflow_id}/decision-table", response_model=WorkflowDecisionTable)
+async def get_decision_table(
+        workflow_id: int,
+        session: AsyncSession = Depends(get_async_read_session)
+):
+    version, table = await WorkFlowRepository(session=session).get_decision_table(workflow_id=workflow_id)
+    return WorkflowDecisionTable(
+        workflow_id=workflow_id,
+        version=version,
+        message_node_ids=table.message_node_ids,
+        outcomes=table.outcomes
+    )
+
+
+@router.post("/{workflow_id}/decision-table/evaluate")
+async def evaluate_decision_table(
+        workflow_id: int,
+        evaluate_in: DecisionTableEvaluate,
+        session: AsyncSession = Depends(get_async_read_session)
 ):
-    return await WorkFlowRepository(session=session).get(model_object_id=workflow_id)
+    return await WorkFlowRepository(session=session).evaluate_decision_table(
+        workflow_id=workflow_id,
+        statuses=evaluate_in.statuses
+    )
 
 
 @router.get("/{workflow_id}/path")
 async def start_workflow(
         workflow_id: int,
-        session: AsyncSession = Depends(get_async_session)
+        from_node_id: int = Query(None, alias="from"),
+        to_node_id: int = Query(None, alias="to"),
+        engine: PathEngine = PathEngine.AUTO,
+        session: AsyncSession = Depends(get_async_read_session)
 ):
-    return await WorkFlowRepository(session=session).get_path(workflow_id=workflow_id)
+    access_counter.record(workflow_id)
+    return await WorkFlowRepository(session=session).get_path(
+        workflow_id=workflow_id,
+        start_node=from_node_id,
+        end_node=to_node_id,
+        engine=engine
+    )
 
 
 @router.get("/{workflow_id}/path/image")
 async def start_workflow(
+        workflow_id: int,
+        image_format: ImageFormat = Query(ImageFormat.PNG, alias="format"),
+        width: int = Query(640, ge=100, le=4000),
+        height: int = Query(480, ge=100, le=4000),
+        session: AsyncSession = Depends(get_async_read_session)
+):
+    access_counter.record(workflow_id)
+    file = await WorkFlowRepository(session=session).get_path_image(
+        workflow_id=workflow_id,
+        image_format=image_format,
+        width=width,
+        height=height
+    )
+    return FileResponse(file, media_type=image_format.media_type)
+
+
+@router.post("/{workflow_id}/path/image/jobs", response_model=RenderJobRead, status_code=202)
+async def submit_path_image_job(
+        workflow_id: int,
+        image_format: ImageFormat = Query(ImageFormat.PNG, alias="format"),
+        width: int = Query(640, ge=100, le=4000),
+        height: int = Query(480, ge=100, le=4000),
+        session: AsyncSession = Depends(get_async_read_session)
+):
+    access_counter.record(workflow_id)
+    job = await WorkFlowRepository(session=session).submit_path_image_job(
+        workflow_id=workflow_id,
+        image_format=image_format,
+        width=width,
+        height=height
+    )
+    return RenderJobRead(job_id=job.job_id, status=job.status.value, detail=job.detail)
+
+
+@router.get("/{workflow_id}/path/image/jobs/{job_id}", response_model=RenderJobRead)
+async def get_path_image_job(workflow_id: int, job_id: str):
+    job = WorkFlowRepository.get_path_image_job(workflow_id=workflow_id, job_id=job_id)
+    return RenderJobRead(job_id=job.job_id, status=job.status.value, detail=job.detail)
+
+
+@router.get("/{workflow_id}/path/image/jobs/{job_id}/result")
+async def get_path_image_job_result(workflow_id: int, job_id: str):
+    job = WorkFlowRepository.get_path_image_job_result(workflow_id=workflow_id, job_id=job_id)
+    return FileResponse(job.file, media_type=job.image_format.media_type)
+
+
+@router.get("/{workflow_id}/snapshot")
+async def get_workflow_snapshot(
+        workflow_id: int,
+        session: AsyncSession = Depends(get_async_read_session)
+):
+    snapshot = await WorkFlowRepository(session=session).get_snapshot(workflow_id=workflow_id)
+    return Response(content=snapshot, media_type=MEDIA_TYPE)
+
+
+@router.post("/snapshot", response_model=WorkflowRead, status_code=201)
+async def import_workflow_snapshot(
+        request: Request,
+        session: AsyncSession = Depends(get_async_session)
+):
+    return await WorkFlowRepository(session=session).import_snapshot(data=await request.body())
+
+
+@router.post("/{workflow_id}/clone", response_model=WorkflowRead, status_code=201)
+async def clone_workflow(
         workflow_id: int,
         session: AsyncSession = Depends(get_async_session)
 ):
-    buf = await WorkFlowRepository(session=session).get_path_image(workflow_id=workflow_id)
-    return StreamingResponse(buf, media_type="image/png")
+    return await WorkFlowRepository(session=session).clone(workflow_id=workflow_id)
+
+
+@router.post("/{workflow_id}/versions", response_model=WorkflowVersionRead, status_code=201)
+async def save_workflow_version(
+        workflow_id: int,
+        session: AsyncSession = Depends(get_async_session)
+):
+    return await WorkflowVersionRepository(session=session).add(workflow_id=workflow_id)
+
+
+@router.get("/{workflow_id}/versions/{number}", response_model=WorkflowVersionGet, response_class=ORJSONResponse)
+async def get_workflow_version(
+        workflow_id: int,
+        number: int,
+        session: AsyncSession = Depends(get_async_read_session)
+):
+    document = await WorkflowVersionRepository(session=session).get_document(workflow_id=workflow_id, number=number)
+    return ORJSONResponse(document)
 
 
 @router.post("/create", status_code=201)
@@ -1,10 +1,64 @@
+import os
+import tempfile
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
 
 class Settings(BaseSettings):
     db_url: str = Field(..., json_schema_extra={"env": "DB_URL"})
+    # Read-only replica serving the GET endpoints, the primary serves them when not set
+    db_read_url: Optional[str] = Field(None, json_schema_extra={"env": "DB_READ_URL"})
     db_echo: bool = True
+    # Number of rows fetched from a server-side cursor per streamed chunk
+    stream_chunk_size: int = 1000
+    # Graphs with more nodes are built, evaluated and rendered in the graph executor
+    graph_executor_threshold: int = 1000
+    graph_executor_workers: int = 4
+    # Time the graph work of a request may take in total before it is stopped with a 504
+    graph_deadline_seconds: float = 30.0
+    # Larger workflows are rendered as their path and the nodes around it
+    focused_render_threshold: int = 200
+    # Number of hops around the path kept in the focused rendering
+    focused_render_halo: int = 1
+    # Directory of the rendered images shared by the workers of the host, and its size budget
+    render_cache_dir: str = os.path.join(tempfile.gettempdir(), "workflow-renders")
+    render_cache_max_bytes: int = 256 * 1024 * 1024
+    # Threads rendering images of the submitted jobs, and the number of jobs waiting for them
+    render_job_workers: int = 2
+    render_job_queue_depth: int = 16
+    # The path and the image of a workflow are prepared in the background once its edits pause for the delay
+    prewarm_enabled: bool = True
+    prewarm_debounce_seconds: float = 2.0
+    # Workers evict the caches of workflows changed by other workers, listening to a Postgres channel
+    cache_invalidation_enabled: bool = True
+    cache_invalidation_retry_seconds: float = 5.0
+    # Compiled graphs are published in the host's shared memory, so the workers map one copy instead of compiling their own
+    shared_graph_store_enabled: bool = True
+    shared_graph_dir: str = os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+                                         "workflow-graphs")
+    # Size budget of the published graphs, the least recently opened are evicted and compiled again when requested
+    shared_graph_max_bytes: int = 256 * 1024 * 1024
+    # Workers compile this many of the most requested and of the most recently changed workflows before serving
+    warmup_enabled: bool = False
+    warmup_workflows: int = 50
+    # Interval of adding the request counts of a worker to the persisted access counters
+    access_count_flush_seconds: float = 10.0
+    # Number of compiled workflows kept in memory by every worker
+    compiled_cache_size: int = 128
+    # Number of distinct workflow structures whose paths, decision tables and layouts are shared
+    structure_cache_size: int = 1024
+    # Larger workflows answer reachability queries by a graph search instead of a transitive closure
+    reachability_index_max_nodes: int = 10000
+    # Larger workflows that aren't compiled yet have their path found by a recursive query in the database
+    sql_path_engine_threshold: int = 5000
+    # Largest neighbourhood of a node served at once
+    neighbourhood_max_hops: int = 10
+    # Decision tables are not compiled for workflows with more possible outcomes
+    decision_table_max_outcomes: int = 4096
+    # Every this many saved versions of a workflow, one stores all the nodes and edges instead of the changes
+    version_checkpoint_interval: int = 16
 
 
 settings = Settings()
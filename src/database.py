@@ -1,3 +1,4 @@
+from fastapi import Depends, Header
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
@@ -8,9 +9,15 @@ from src.config import settings
 # Creating a connection to the database
 engine = create_async_engine(settings.db_url)
 
+# Creating a connection to the read replica, reads go to the primary when no replica is configured
+read_engine = create_async_engine(settings.db_read_url) if settings.db_read_url else engine
+
 # Creating a session factory for interacting with the database
 SessionLocal = sessionmaker(engine, class_=AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False)
 
+# Creating a session factory for read-only traffic
+ReadSessionLocal = sessionmaker(read_engine, class_=AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False)
+
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     """
@@ -21,3 +28,30 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     """
     async with SessionLocal() as session:
         yield session
+
+
+def get_read_session_factory(x_force_primary: bool = Header(False)) -> sessionmaker:
+    """
+    Function for providing the session factory of read-only traffic.
+    The X-Force-Primary header routes the request to the primary, so a client can read its own writes.
+
+    Params:
+        x_force_primary: Whether the primary should serve the request.
+
+    Returns:
+        sessionmaker: The session factory.
+    """
+    return SessionLocal if x_force_primary else ReadSessionLocal
+
+
+async def get_async_read_session(
+        session_factory: sessionmaker = Depends(get_read_session_factory)
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Function for providing an asynchronous session for read-only traffic.
+
+    Yields:
+        AsyncSession: An asynchronous session instance.
+    """
+    async with session_factory() as session:
+        yield session
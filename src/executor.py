@@ -0,0 +1,172 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Pool running the CPU-heavy graph work of large workflows away from the event loop
+graph_executor = ThreadPoolExecutor(max_workers=settings.graph_executor_workers, thread_name_prefix="graph")
+
+
+# Monotonic time by which the graph work of the current request must be done, one deadline for the whole request
+_graph_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("graph_deadline", default=None)
+
+
+@contextmanager
+def graph_deadline(seconds: float = None):
+    """
+    Starts the deadline shared by all the graph work done within the block.
+
+    Args:
+        seconds: Time allowed to the work, the configured graph deadline by default.
+    """
+    seconds = settings.graph_deadline_seconds if seconds is None else seconds
+    token = _graph_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _graph_deadline.reset(token)
+
+
+def _deadline_exceeded() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Graph processing exceeded the deadline")
+
+
+def check_deadline():
+    """
+    Stops the graph work once the deadline of its request has passed.
+    Called from the loops of the graph algorithms, so work given up by the request also frees its executor thread.
+
+    Raises:
+        HTTPException: If the deadline has passed.
+    """
+    deadline = _graph_deadline.get()
+    if deadline is not None and time.monotonic() > deadline:
+        raise _deadline_exceeded()
+
+
+async def run_graph_task(size: int, func, *args, **kwargs):
+    """
+    Runs CPU-heavy graph work.
+    Graphs up to the size threshold are processed inline, larger ones in the graph executor,
+    so a huge workflow does not freeze the other requests served by the worker.
+
+    The work gets the time left before the deadline of the request, or its own deadline outside a request.
+    A thread can't be killed, so the work running in the executor sees the deadline too and stops at
+    its next check_deadline(). Work without checks (layouts and rendering) keeps its thread until it finishes.
+    The threads share the GIL with the event loop: they keep the loop responsive between Python bytecodes,
+    but don't run graph work in parallel.
+
+    Args:
+        size: Number of nodes of the processed graph.
+        func: The function doing the work.
+        args: Positional arguments of the function.
+        kwargs: Keyword arguments of the function.
+
+    Returns:
+        The result of the function.
+
+    Raises:
+        HTTPException: If the work does not finish before the deadline.
+    """
+    context = contextvars.copy_context()
+    if context.get(_graph_deadline) is None:
+        context.run(_graph_deadline.set, time.monotonic() + settings.graph_deadline_seconds)
+    remaining = context.get(_graph_deadline) - time.monotonic()
+    if remaining <= 0:
+        raise _deadline_exceeded()
+
+    if size <= settings.graph_executor_threshold:
+        return context.run(func, *args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(graph_executor, functools.partial(context.run, func, *args, **kwargs)),
+            timeout=remaining
+        )
+    except asyncio.TimeoutError:
+        raise _deadline_exceeded()
+
+
+class Debouncer:
+    """
+    Runs a background task once a burst of calls for the same key has been quiet for the delay,
+    so a burst of edits costs one run instead of one per edit.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._timers = {}
+        # Running tasks, referenced until they finish so they aren't garbage collected
+        self._tasks = set()
+
+    def schedule(self, key, func):
+        """
+        Schedules the task, postponing the one already scheduled for the key.
+
+        Args:
+            key: Calls with the same key are coalesced.
+            func: The coroutine function run in the background.
+        """
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        self._timers[key] = asyncio.get_running_loop().call_later(self.delay, self._start, key, func)
+
+    def _start(self, key, func):
+        del self._timers[key]
+        task = asyncio.ensure_future(self._run(key, func))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _run(key, func):
+        try:
+            # The task outlives the request that scheduled it, so it gets a deadline of its own
+            with graph_deadline():
+                await func()
+        except Exception:
+            logger.exception("Background task for %s failed", key)
+
+
+class SingleFlight:
+    """
+    Shares one run of a computation between the concurrent callers asking for the same key.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, func):
+        """
+        Awaits the run in flight for the key, or starts it.
+        The run is shielded, so a caller going away doesn't cancel it for the others.
+
+        Args:
+            key: Calls with the same key share the run.
+            func: The coroutine function computing the result.
+
+        Returns:
+            The result of the run.
+        """
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(future)
+
+
+prewarm_debouncer = Debouncer(delay=settings.prewarm_debounce_seconds)
+# Path and image computations shared by identical concurrent requests
+single_flight = SingleFlight()
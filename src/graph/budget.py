@@ -0,0 +1,148 @@
+import fcntl
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Iterable, Optional
+
+# Eviction frees the directory down to this share of the budget, so it is scanned once per many stores
+EVICTION_LOW_WATERMARK = 0.9
+
+
+class BudgetedDirectory:
+    """
+    Directory of files shared by every worker of the host under a byte budget, least recently used evicted first.
+    Files are written atomically, the total size of the files is kept in the lock file of the directory
+    and the directory is only scanned to evict.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _store(self, file: str, data: bytes):
+        """
+        Stores the file, then evicts the least recently used files above the byte budget.
+        The file is written under a temporary name and renamed, so readers never see a partial file.
+        The stored file is the only one never evicted by its own store, even when it alone exceeds the budget.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            with self._lock() as lock:
+                try:
+                    replaced = os.stat(file).st_size
+                except FileNotFoundError:
+                    replaced = 0
+                os.replace(tmp, file)
+                total = self._read_total(lock)
+                if total is not None:
+                    total += len(data) - replaced
+                if total is None or total > self.max_bytes:
+                    total = self._evict(keep=file)
+                self._write_total(lock, total)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def _remove(self, files: Iterable[str]):
+        """
+        Deletes the files and takes their size off the total.
+        """
+        files = list(files)
+        if not files:
+            return
+        with self._lock() as lock:
+            total = self._read_total(lock)
+            for file in files:
+                try:
+                    size = os.stat(file).st_size
+                    os.unlink(file)
+                except FileNotFoundError:
+                    continue
+                if total is not None:
+                    total -= size
+            if total is not None:
+                self._write_total(lock, total)
+
+    def evict(self):
+        """
+        Deletes the least recently used files until the directory fits the byte budget.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock() as lock:
+            self._write_total(lock, self._evict())
+
+    @contextmanager
+    def _lock(self):
+        """
+        Holds the exclusive lock on the lock file of the directory, workers change the directory one at a time.
+
+        Yields:
+            The lock file, holding the total size of the stored files.
+        """
+        with open(os.path.join(self.directory, ".lock"), "a+") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield lock
+
+    @staticmethod
+    def _read_total(lock) -> Optional[int]:
+        lock.seek(0)
+        content = lock.read()
+        return int(content) if content else None
+
+    @staticmethod
+    def _write_total(lock, total: int):
+        lock.seek(0)
+        lock.truncate()
+        lock.write(str(total))
+        lock.flush()
+
+    def _eviction_order(self, now: float, mtime: float) -> tuple:
+        """
+        Sort key of a file for eviction, the files sorting first are deleted first.
+        """
+        return (mtime,)
+
+    def _evict(self, keep: str = None) -> int:
+        """
+        Scans the directory and deletes files down to the low watermark of the budget, in eviction order.
+
+        Args:
+            keep: The path of the file never deleted.
+
+        Returns:
+            int: The total size of the files left.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith("."):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return total
+        target = self.max_bytes * EVICTION_LOW_WATERMARK
+        now = time.time()
+
+        for mtime, size, file in sorted(entries, key=lambda entry: self._eviction_order(now, entry[0])):
+            if total <= target:
+                break
+            if file == keep:
+                continue
+            try:
+                os.unlink(file)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
@@ -0,0 +1,208 @@
+from collections import OrderedDict
+
+import networkx as nx
+
+from src.config import settings
+from src.executor import check_deadline
+
+
+class CompiledWorkflow:
+    """
+    Graph of one workflow version, compiled once and shared by all the queries on that version.
+    """
+
+    def __init__(self, workflow_id: int, version: int, graph, structure_hash: int = None):
+        self.workflow_id = workflow_id
+        self.version = version
+        self.structure_hash = structure_hash
+        # networkx DiGraph, or SharedGraph mapped from the shared graph store
+        self.graph = graph
+        self._networkx = graph if isinstance(graph, nx.DiGraph) else None
+        # Evaluated paths keyed by their (start node ID, end node ID)
+        self.paths = {}
+        # DecisionTables of the version keyed by the outcomes of its sub-flows, compiled on first use
+        self.decision_tables = {}
+        # StructureEntry shared with the versions of the same structure, attached when the hash is known
+        self.structure = None
+        self._order = sorted(graph.nodes, key=lambda node_id: graph.nodes[node_id]["topo_index"])
+        self._ranks = None
+        self._subflow_ids = None
+        self._position = {}
+        self._reach = None
+        self._indexed = False
+
+    def with_graph(self, graph) -> "CompiledWorkflow":
+        """
+        Returns the same compiled version over another copy of its graph, keeping everything computed so far.
+        """
+        compiled = CompiledWorkflow.__new__(CompiledWorkflow)
+        compiled.__dict__.update(self.__dict__)
+        compiled.graph = graph
+        compiled._networkx = graph if isinstance(graph, nx.DiGraph) else None
+        return compiled
+
+    def networkx(self) -> nx.DiGraph:
+        """
+        Returns the graph as a networkx graph, copied from the shared graph once when needed.
+        """
+        if self._networkx is None:
+            self._networkx = self.graph.to_networkx()
+        return self._networkx
+
+    @property
+    def order(self) -> list:
+        """
+        Node IDs in topological order, the node of rank i comes at index i.
+        """
+        return self._order
+
+    def ranks(self) -> dict:
+        """
+        Returns:
+            dict: Node IDs mapped to their rank in the topological order.
+        """
+        if self._ranks is None:
+            self._ranks = {node_id: rank for rank, node_id in enumerate(self._order)}
+        return self._ranks
+
+    def signature(self) -> tuple:
+        """
+        Describes the graph by node ranks instead of IDs: every node's type, status, condition value, sub-flow,
+        and its successors and predecessors in the order the path evaluation visits them.
+        Versions with equal signatures have the same paths, decision tables and layouts up to their node IDs.
+        """
+        ranks = self.ranks()
+        signature = []
+        for node_id in self._order:
+            data = self.graph.nodes[node_id]
+            successors = tuple(
+                (ranks[successor], self.graph.get_edge_data(node_id, successor)["edge_type"])
+                for successor in self.graph.successors(node_id)
+            )
+            predecessors = tuple(ranks[predecessor] for predecessor in self.graph.predecessors(node_id))
+            signature.append((data["type"], data.get("status"), data.get("status_condition"), data.get("subflow_id"),
+                              successors, predecessors))
+        return tuple(signature)
+
+    def subflow_ids(self) -> list:
+        """
+        Returns:
+            list: IDs of the workflows used as sub-flows by the nodes of the graph, without duplicates.
+        """
+        if self._subflow_ids is None:
+            self._subflow_ids = sorted({
+                data["subflow_id"] for _, data in self.graph.nodes(data=True) if data["type"] == "subflownode"
+            })
+        return self._subflow_ids
+
+    def layout(self) -> dict:
+        """
+        Lays the whole graph out for rendering, once for all the versions with the same structure.
+
+        Returns:
+            dict: Node IDs mapped to their positions.
+        """
+        if self.structure is None:
+            return nx.spring_layout(self.networkx(), seed=0)
+        if self.structure.layout is None:
+            positions = nx.spring_layout(self.networkx(), seed=0)
+            self.structure.layout = [positions[node_id] for node_id in self._order]
+        return dict(zip(self._order, self.structure.layout))
+
+    def build_reachability_index(self):
+        """
+        Computes the transitive closure of the graph as one bitset per node.
+        Nodes are numbered in reverse topological order, so every bitset only uses the bits below
+        its node's own position and is the union of the bitsets of the node's successors.
+
+        The index is skipped for graphs above the size limit and for graphs whose stored order is not
+        topological (cycles created before they were rejected), queries then search the compiled graph.
+        """
+        self._indexed = True
+        if self.graph.number_of_nodes() > settings.reachability_index_max_nodes:
+            return
+
+        position = {node_id: index for index, node_id in enumerate(reversed(self._order))}
+        if any(position[out_node_id] <= position[in_node_id] for out_node_id, in_node_id in self.graph.edges):
+            return
+
+        reach = {}
+        for node_id in reversed(self._order):
+            check_deadline()
+            bits = 1 << position[node_id]
+            for successor in self.graph.successors(node_id):
+                bits |= reach[successor]
+            reach[node_id] = bits
+
+        self._position = position
+        self._reach = reach
+
+    @property
+    def is_indexed(self) -> bool:
+        """
+        Whether the reachability index has been built, or skipped for the graph.
+        """
+        return self._indexed
+
+    def is_reachable(self, from_node_id: int, to_node_id: int) -> bool:
+        """
+        Checks whether any chain of edges leads from one node to the other, regardless of conditions.
+
+        Args:
+            from_node_id: The ID of the node the chain begins with.
+            to_node_id: The ID of the node the chain ends with.
+
+        Returns:
+            bool: Whether the node is reachable.
+        """
+        if self._reach is not None:
+            return bool(self._reach[from_node_id] >> self._position[to_node_id] & 1)
+        return nx.has_path(self.networkx(), from_node_id, to_node_id)
+
+
+class CompiledWorkflowCache:
+    """
+    LRU cache holding the latest compiled version of the most recently used workflows.
+    """
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, workflow_id: int, version: int):
+        """
+        Returns:
+            CompiledWorkflow: The compiled workflow, None if the version is not cached.
+        """
+        compiled = self._entries.get(workflow_id)
+        if compiled is None or compiled.version != version:
+            return None
+        self._entries.move_to_end(workflow_id)
+        return compiled
+
+    def put(self, compiled: CompiledWorkflow):
+        cached = self._entries.get(compiled.workflow_id)
+        # A lagging replica must not replace a newer version
+        if cached is not None and cached.version > compiled.version:
+            return
+        self._entries[compiled.workflow_id] = compiled
+        self._entries.move_to_end(compiled.workflow_id)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def evict(self, workflow_id: int):
+        self._entries.pop(workflow_id, None)
+
+    def evict_older(self, workflow_id: int, version: int):
+        """
+        Evicts the cached version of the workflow if it's older than the given one.
+        """
+        cached = self._entries.get(workflow_id)
+        if cached is not None and cached.version < version:
+            del self._entries[workflow_id]
+
+    def clear(self):
+        self._entries.clear()
+
+
+compiled_workflows = CompiledWorkflowCache(max_size=settings.compiled_cache_size)
@@ -0,0 +1,187 @@
+from fastapi import HTTPException, status
+import networkx as nx
+
+from src.config import settings
+from src.executor import check_deadline
+from src.models import Status
+
+
+class _Undecided(Exception):
+    """
+    Raised by the evaluation when it needs a message status the explored branch hasn't assumed yet.
+    """
+
+    def __init__(self, message_node_id: int, status_condition: Status):
+        super().__init__(message_node_id, status_condition)
+        self.message_node_id = message_node_id
+        self.status_condition = status_condition
+
+
+def _is_consistent(assumptions: dict, message_node_id: int) -> bool:
+    """
+    Checks that some status of the message node satisfies all the assumptions made about it.
+    """
+    return any(
+        all((value == status_condition) == answer
+            for (node_id, status_condition), answer in assumptions.items() if node_id == message_node_id)
+        for value in Status
+    )
+
+
+class DecisionTable:
+    """
+    Decision tree of a workflow version mapping the statuses of the message nodes that feed condition nodes
+    to the resulting path.
+    Inner nodes test whether a message node has a status, leaves hold the path or the error of the evaluation,
+    so a lookup costs one step per decision on the way.
+    """
+
+    def __init__(self, graph: nx.DiGraph, root: dict, outcomes: list, subgraphs: list = ()):
+        self._graph = graph
+        # Graphs of the sub-flows inlined in the paths, holding the current statuses of their message nodes
+        self._subgraphs = list(subgraphs)
+        self.root = root
+        # Leaves of the tree, each with the conditions leading to it
+        self.outcomes = outcomes
+
+    @property
+    def message_node_ids(self) -> list:
+        return sorted({condition["message_node_id"] for outcome in self.outcomes for condition in outcome["conditions"]})
+
+    @classmethod
+    def compile(cls, graph: nx.DiGraph, evaluate, subgraphs: list = ()) -> "DecisionTable":
+        """
+        Compiles the tree by running the evaluation with symbolic statuses.
+        Every time the evaluation needs a status it hasn't assumed, the branch forks on both answers,
+        answers contradicting earlier assumptions about the same message node are pruned.
+
+        Args:
+            graph: The graph of the workflow.
+            evaluate: Evaluates the path of the graph, taking the graph and the function deciding
+                whether a message node has a status.
+            subgraphs: The graphs of the sub-flows the evaluation inlines.
+
+        Returns:
+            DecisionTable: The compiled table.
+
+        Raises:
+            HTTPException: If the workflow has more outcomes than allowed, or the deadline of the request has passed.
+        """
+        root = {}
+        outcomes = []
+        pending = [({}, root)]
+
+        while pending:
+            check_deadline()
+            assumptions, tree_node = pending.pop()
+
+            def decide(message_node_id, status_condition):
+                key = (message_node_id, status_condition)
+                if key not in assumptions:
+                    raise _Undecided(message_node_id, status_condition)
+                return assumptions[key]
+
+            try:
+                path = evaluate(graph, decide)
+                tree_node.update(path=path, status_code=status.HTTP_200_OK, detail=None)
+            except _Undecided as undecided:
+                key = (undecided.message_node_id, undecided.status_condition)
+                tree_node.update(message_node_id=undecided.message_node_id, status=undecided.status_condition)
+                for branch, answer in (("yes", True), ("no", False)):
+                    extended = {**assumptions, key: answer}
+                    tree_node[branch] = None
+                    if _is_consistent(extended, undecided.message_node_id):
+                        tree_node[branch] = {}
+                        pending.append((extended, tree_node[branch]))
+                continue
+            except HTTPException as e:
+                # A timeout belongs to the request, not to an outcome of the workflow
+                if e.status_code == status.HTTP_504_GATEWAY_TIMEOUT:
+                    raise
+                tree_node.update(path=None, status_code=e.status_code, detail=e.detail)
+
+            tree_node["conditions"] = [
+                {"message_node_id": message_node_id, "status": status_condition, "equals": answer}
+                for (message_node_id, status_condition), answer in assumptions.items()
+            ]
+            outcomes.append(tree_node)
+            if len(outcomes) > settings.decision_table_max_outcomes:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail="Workflow has too many outcomes to compile a decision table")
+
+        return cls(graph=graph, root=root, outcomes=outcomes, subgraphs=subgraphs)
+
+    @property
+    def is_portable(self) -> bool:
+        """
+        Whether the table holds for other workflows with the same structure.
+        Validation errors name the offending nodes by ID and timeouts depend on the request,
+        tables holding them stay with their workflow.
+        """
+        return all(
+            outcome["status_code"] not in (status.HTTP_400_BAD_REQUEST, status.HTTP_504_GATEWAY_TIMEOUT)
+            for outcome in self.outcomes
+        )
+
+    def relabel(self, graph, node_ids) -> "DecisionTable":
+        """
+        Copies the table with its nodes renamed, for another workflow with the same structure.
+
+        Args:
+            graph: The graph the copy is looked up against.
+            node_ids: Maps the node IDs of the table to the node IDs of the copy.
+
+        Returns:
+            DecisionTable: The copy.
+        """
+        root = {}
+        leaves = {}
+        pending = [(self.root, root)]
+        while pending:
+            tree_node, copy = pending.pop()
+            if "message_node_id" in tree_node:
+                copy.update(message_node_id=node_ids[tree_node["message_node_id"]], status=tree_node["status"])
+                for branch in ("yes", "no"):
+                    copy[branch] = None if tree_node[branch] is None else {}
+                    if tree_node[branch] is not None:
+                        pending.append((tree_node[branch], copy[branch]))
+                continue
+
+            copy.update(
+                path=None if tree_node["path"] is None else [node_ids[node_id] for node_id in tree_node["path"]],
+                status_code=tree_node["status_code"],
+                detail=tree_node["detail"],
+                conditions=[
+                    {**condition, "message_node_id": node_ids[condition["message_node_id"]]}
+                    for condition in tree_node["conditions"]
+                ],
+            )
+            leaves[id(tree_node)] = copy
+
+        return DecisionTable(graph=graph, root=root, outcomes=[leaves[id(outcome)] for outcome in self.outcomes])
+
+    def lookup(self, statuses: dict) -> dict:
+        """
+        Finds the outcome for the statuses of the message nodes.
+
+        Args:
+            statuses: Message node IDs mapped to their statuses, the missing ones keep their current status.
+
+        Returns:
+            dict: The outcome leaf.
+        """
+        tree_node = self.root
+        while "message_node_id" in tree_node:
+            message_node_id = tree_node["message_node_id"]
+            value = statuses.get(message_node_id, self._status(message_node_id))
+            tree_node = tree_node["yes"] if value == tree_node["status"] else tree_node["no"]
+        return tree_node
+
+    def _status(self, message_node_id: int) -> Status:
+        """
+        Reads the current status of a message node of the workflow or of one of its sub-flows.
+        """
+        for graph in (self._graph, *self._subgraphs):
+            if message_node_id in graph:
+                return graph.nodes[message_node_id]["status"]
+        raise KeyError(message_node_id)
@@ -0,0 +1,86 @@
+import enum
+import hashlib
+import os
+from typing import Optional
+
+import networkx as nx
+
+from src.config import settings
+from src.graph.budget import BudgetedDirectory
+
+# Files served within this many seconds are evicted after all the others, a worker is likely about to send them
+EVICTION_GRACE_SECONDS = 60
+
+
+class ImageFormat(enum.Enum):
+    PNG = "png"
+    SVG = "svg"
+
+    @property
+    def media_type(self) -> str:
+        return {"png": "image/png", "svg": "image/svg+xml"}[self.value]
+
+
+class RenderCache(BudgetedDirectory):
+    """
+    Rendered images on local disk, addressed by the hash of everything the image depends on.
+    Files are written atomically and evicted least recently used first under a byte budget,
+    so every worker of the host can share the directory.
+    """
+
+    @staticmethod
+    def key(graph: nx.DiGraph, path: list, image_format: ImageFormat, width: int, height: int) -> str:
+        """
+        Hashes the graph structure, the node statuses, the highlighted path and the image options.
+
+        Returns:
+            str: The hex digest addressing the image.
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        for node, data in sorted(graph.nodes(data=True), key=lambda item: item[0]):
+            status = data.get("status") or data.get("status_condition")
+            digest.update(f"n{node}:{data['type']}:{status.value if status else ''};".encode())
+        for u, v, data in sorted(graph.edges(data=True), key=lambda item: item[2]["edge_id"]):
+            digest.update(f"e{data['edge_id']}:{u}:{v}:{data['edge_type'].value};".encode())
+        digest.update(f"p{path};{image_format.value};{width}x{height};".encode())
+        # The rendering of large workflows depends on these settings as well
+        digest.update(f"{settings.focused_render_threshold}:{settings.focused_render_halo}".encode())
+        return digest.hexdigest()
+
+    def _file(self, key: str, image_format: ImageFormat) -> str:
+        return os.path.join(self.directory, f"{key}.{image_format.value}")
+
+    def get(self, key: str, image_format: ImageFormat) -> Optional[str]:
+        """
+        Finds the cached image and marks it as recently used.
+
+        Returns:
+            str: The path of the file, None if the image is not cached.
+        """
+        file = self._file(key=key, image_format=image_format)
+        try:
+            os.utime(file)
+        except FileNotFoundError:
+            return None
+        return file
+
+    def put(self, key: str, image_format: ImageFormat, data: bytes) -> str:
+        """
+        Stores the image, then evicts the least recently used images above the byte budget.
+
+        Returns:
+            str: The path of the file.
+        """
+        file = self._file(key=key, image_format=image_format)
+        self._store(file, data)
+        return file
+
+    def _eviction_order(self, now: float, mtime: float) -> tuple:
+        """
+        Images outside the grace period go first, least recently used first, then the recently served ones:
+        the budget holds either way.
+        """
+        return now - mtime < EVICTION_GRACE_SECONDS, mtime
+
+
+render_cache = RenderCache(directory=settings.render_cache_dir, max_bytes=settings.render_cache_max_bytes)
@@ -0,0 +1,141 @@
+import enum
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from src.config import settings
+from src.graph.render_cache import ImageFormat, render_cache
+
+# Number of failed jobs remembered, so their error can still be polled
+FAILED_JOBS_KEPT = 1000
+# Number of done jobs remembered, so a job whose image was evicted since is told from an unknown one
+DONE_JOBS_KEPT = 1000
+
+
+class JobStatus(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class RenderJob:
+    def __init__(self, job_id: str, workflow_id: int, image_format: ImageFormat, file: str = None):
+        self.job_id = job_id
+        self.workflow_id = workflow_id
+        self.image_format = image_format
+        self.status = JobStatus.DONE if file else JobStatus.QUEUED
+        self.detail = None
+        # Rendered image in the render cache
+        self.file = file
+
+
+def job_id_for(workflow_id: int, key: str, image_format: ImageFormat) -> str:
+    """
+    Jobs are named after their workflow and the cached file they produce,
+    so any worker of the host can tell a finished job and the workflow it belongs to.
+    """
+    return f"{workflow_id}-{key}.{image_format.value}"
+
+
+class RenderJobQueue:
+    """
+    Renders images on a bounded pool of threads.
+    Jobs are refused once the pool is busy and the queue is full, instead of piling up.
+    """
+
+    def __init__(self, max_workers: int, max_depth: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="render")
+        self._capacity = max_workers + max_depth
+        self._lock = threading.Lock()
+        self._active = {}
+        self._failed = OrderedDict()
+        self._done = OrderedDict()
+
+    def submit(self, workflow_id: int, key: str, image_format: ImageFormat, render) -> RenderJob:
+        """
+        Queues the rendering of an image, unless it is cached or already queued.
+
+        Args:
+            workflow_id: The ID of the workflow whose image is rendered.
+            key: The render cache key of the image.
+            image_format: The format of the image.
+            render: Renders the image, stores it in the render cache and returns its file.
+
+        Returns:
+            RenderJob: The job.
+
+        Raises:
+            HTTPException: If the queue is full.
+        """
+        job_id = job_id_for(workflow_id=workflow_id, key=key, image_format=image_format)
+        with self._lock:
+            if job_id in self._active:
+                return self._active[job_id]
+            file = render_cache.get(key=key, image_format=image_format)
+            if file:
+                return RenderJob(job_id=job_id, workflow_id=workflow_id, image_format=image_format, file=file)
+            if len(self._active) >= self._capacity:
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                    detail="Render queue is full, try again later",
+                                    headers={"Retry-After": "5"})
+            job = RenderJob(job_id=job_id, workflow_id=workflow_id, image_format=image_format)
+            self._failed.pop(job_id, None)
+            self._active[job_id] = job
+
+        self._executor.submit(self._run, job, render)
+        return job
+
+    def _run(self, job: RenderJob, render):
+        job.status = JobStatus.RUNNING
+        try:
+            job.file = render()
+            job.status = JobStatus.DONE
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            job.detail = e.detail if isinstance(e, HTTPException) else "Rendering failed"
+        finally:
+            with self._lock:
+                del self._active[job.job_id]
+                if job.status == JobStatus.FAILED:
+                    self._failed[job.job_id] = job
+                    if len(self._failed) > FAILED_JOBS_KEPT:
+                        self._failed.popitem(last=False)
+                else:
+                    self._done[job.job_id] = job
+                    if len(self._done) > DONE_JOBS_KEPT:
+                        self._done.popitem(last=False)
+
+    def get(self, job_id: str) -> Optional[RenderJob]:
+        """
+        Finds the job, finished jobs are found in the render cache.
+        A job done by this worker is still found once its image is evicted, its file is then missing.
+
+        Returns:
+            RenderJob: The job, None if it is unknown.
+        """
+        with self._lock:
+            job = self._active.get(job_id) or self._failed.get(job_id)
+        if job:
+            return job
+
+        match = re.fullmatch(r"([0-9]+)-([0-9a-f]+)\.(\w+)", job_id)
+        if not match:
+            return None
+        workflow_id, key, extension = match.groups()
+        try:
+            image_format = ImageFormat(extension)
+        except ValueError:
+            return None
+        file = render_cache.get(key=key, image_format=image_format)
+        if not file:
+            with self._lock:
+                return self._done.get(job_id)
+        return RenderJob(job_id=job_id, workflow_id=int(workflow_id), image_format=image_format, file=file)
+
+
+render_jobs = RenderJobQueue(max_workers=settings.render_job_workers, max_depth=settings.render_job_queue_depth)
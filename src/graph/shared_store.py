@@ -0,0 +1,315 @@
+import bisect
+import glob
+import mmap
+import os
+import struct
+from array import array
+from typing import Optional
+
+import networkx as nx
+
+from src.config import settings
+from src.graph.budget import BudgetedDirectory
+from src.models import Status, EdgeType
+
+MAGIC = b"WFG3"
+# Magic, node count, edge count, workflow ID, version, structure hash (-1 if unknown),
+# padded to keep the sections 8-byte aligned
+HEADER = struct.Struct("<4sIIqqq4x")
+
+NODE_TYPES = ("startnode", "messagenode", "conditionnode", "endnode", "subflownode")
+STATUSES = tuple(Status)
+EDGE_TYPES = tuple(EdgeType)
+
+# Sections following the header: name, array typecode, length from the node and edge counts
+SECTIONS = (
+    ("node_ids", "q", lambda n, m: n),
+    ("topo_indexes", "q", lambda n, m: n),
+    ("edge_ids", "q", lambda n, m: m),
+    ("out_offsets", "i", lambda n, m: n + 1),
+    ("out_targets", "i", lambda n, m: m),
+    ("in_offsets", "i", lambda n, m: n + 1),
+    ("in_sources", "i", lambda n, m: m),
+    ("node_types", "b", lambda n, m: n),
+    ("statuses", "b", lambda n, m: n),
+    ("status_conditions", "b", lambda n, m: n),
+    ("edge_types", "b", lambda n, m: m),
+    # Workflows referenced by the sub-flow nodes, -1 for other nodes
+    ("subflow_ids", "q", lambda n, m: n),
+)
+
+
+def _code(values: tuple, value) -> int:
+    return -1 if value is None else values.index(value)
+
+
+def pack_graph(workflow_id: int, version: int, graph: nx.DiGraph, structure_hash: int = None) -> bytes:
+    """
+    Packs the graph into dense arrays: the nodes sorted by ID with their attributes as codes,
+    and the adjacency in both directions in compressed sparse row form.
+
+    Args:
+        workflow_id: The ID of the workflow.
+        version: The version of the workflow.
+        graph: The compiled graph.
+        structure_hash: The structure hash of the version.
+
+    Returns:
+        bytes: The packed graph.
+    """
+    node_ids = sorted(graph.nodes)
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    # Out edges of a node are contiguous and numbered in this order. Neighbours are kept in edge ID order,
+    # the order they're added to the networkx graph in, so both graphs are walked the same way
+    edges = sorted(graph.edges(data=True), key=lambda edge: (index[edge[0]], edge[2]["edge_id"]))
+
+    arrays = {name: array(typecode) for name, typecode, _ in SECTIONS}
+    for node_id in node_ids:
+        data = graph.nodes[node_id]
+        arrays["node_ids"].append(node_id)
+        arrays["topo_indexes"].append(data["topo_index"])
+        arrays["node_types"].append(NODE_TYPES.index(data["type"]))
+        arrays["statuses"].append(_code(STATUSES, data.get("status")))
+        arrays["status_conditions"].append(_code(STATUSES, data.get("status_condition")))
+        arrays["subflow_ids"].append(data.get("subflow_id", -1))
+
+    out_degrees = [0] * len(node_ids)
+    in_sources = [[] for _ in node_ids]
+    for out_node_id, in_node_id, data in sorted(edges, key=lambda edge: edge[2]["edge_id"]):
+        in_sources[index[in_node_id]].append(index[out_node_id])
+    for out_node_id, in_node_id, data in edges:
+        out_degrees[index[out_node_id]] += 1
+        arrays["out_targets"].append(index[in_node_id])
+        arrays["edge_ids"].append(data["edge_id"])
+        arrays["edge_types"].append(EDGE_TYPES.index(data["edge_type"]))
+
+    arrays["out_offsets"].append(0)
+    arrays["in_offsets"].append(0)
+    for out_degree, sources in zip(out_degrees, in_sources):
+        arrays["out_offsets"].append(arrays["out_offsets"][-1] + out_degree)
+        arrays["in_sources"].extend(sources)
+        arrays["in_offsets"].append(arrays["in_offsets"][-1] + len(sources))
+
+    structure_hash = -1 if structure_hash is None else structure_hash
+    chunks = [HEADER.pack(MAGIC, len(node_ids), len(edges), workflow_id, version, structure_hash)]
+    for name, _, _ in SECTIONS:
+        chunk = arrays[name].tobytes()
+        chunks.append(chunk + b"\0" * (-len(chunk) % 8))
+    return b"".join(chunks)
+
+
+class _NodeView:
+    """
+    Read-only counterpart of the networkx node view, attributes are decoded on access.
+    """
+
+    def __init__(self, graph: "SharedGraph"):
+        self._graph = graph
+
+    def __iter__(self):
+        return iter(self._graph._arrays["node_ids"])
+
+    def __len__(self):
+        return self._graph.number_of_nodes()
+
+    def __contains__(self, node_id):
+        return node_id in self._graph
+
+    def __getitem__(self, node_id) -> dict:
+        return self._graph._node_data(self._graph._index(node_id))
+
+    def __call__(self, data: bool = False):
+        if not data:
+            return iter(self)
+        return ((node_id, self._graph._node_data(i)) for i, node_id in enumerate(self._graph._arrays["node_ids"]))
+
+
+class _EdgeView:
+    """
+    Read-only counterpart of the networkx edge view.
+    """
+
+    def __init__(self, graph: "SharedGraph"):
+        self._graph = graph
+
+    def __iter__(self):
+        return ((u, v) for u, v, _ in self(data=True))
+
+    def __len__(self):
+        return self._graph.number_of_edges()
+
+    def __call__(self, data: bool = False):
+        if not data:
+            return iter(self)
+        return self._graph._edges()
+
+
+class SharedGraph:
+    """
+    Compiled graph read in place from a memory-mapped file, so all the workers of the host share its pages.
+    Implements the read-only part of the networkx DiGraph interface the path evaluation relies on,
+    nodes are found by a binary search over their sorted IDs instead of a per-worker dictionary.
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magic, self._node_count, self._edge_count, self.workflow_id, self.version, structure_hash = \
+            HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError("Not a packed workflow graph")
+        self.structure_hash = None if structure_hash < 0 else structure_hash
+
+        view = memoryview(buffer)
+        offset = HEADER.size
+        self._arrays = {}
+        for name, typecode, length in SECTIONS:
+            size = length(self._node_count, self._edge_count) * array(typecode).itemsize
+            self._arrays[name] = view[offset:offset + size].cast(typecode)
+            offset += size + (-size % 8)
+
+        self.nodes = _NodeView(self)
+        self.edges = _EdgeView(self)
+
+    def _index(self, node_id) -> int:
+        node_ids = self._arrays["node_ids"]
+        i = bisect.bisect_left(node_ids, node_id)
+        if i == len(node_ids) or node_ids[i] != node_id:
+            raise KeyError(node_id)
+        return i
+
+    def _node_data(self, i: int) -> dict:
+        data = {
+            "type": NODE_TYPES[self._arrays["node_types"][i]],
+            "topo_index": self._arrays["topo_indexes"][i],
+        }
+        if self._arrays["statuses"][i] >= 0:
+            data["status"] = STATUSES[self._arrays["statuses"][i]]
+        if self._arrays["status_conditions"][i] >= 0:
+            data["status_condition"] = STATUSES[self._arrays["status_conditions"][i]]
+        if self._arrays["subflow_ids"][i] >= 0:
+            data["subflow_id"] = self._arrays["subflow_ids"][i]
+        return data
+
+    def _edge_data(self, edge_index: int) -> dict:
+        return {
+            "edge_id": self._arrays["edge_ids"][edge_index],
+            "edge_type": EDGE_TYPES[self._arrays["edge_types"][edge_index]],
+        }
+
+    def _edges(self):
+        node_ids, offsets, targets = self._arrays["node_ids"], self._arrays["out_offsets"], self._arrays["out_targets"]
+        for i, node_id in enumerate(node_ids):
+            for edge_index in range(offsets[i], offsets[i + 1]):
+                yield node_id, node_ids[targets[edge_index]], self._edge_data(edge_index)
+
+    def __contains__(self, node_id) -> bool:
+        try:
+            self._index(node_id)
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def __len__(self):
+        return self._node_count
+
+    def number_of_nodes(self) -> int:
+        return self._node_count
+
+    def number_of_edges(self) -> int:
+        return self._edge_count
+
+    def successors(self, node_id):
+        i = self._index(node_id)
+        node_ids, targets = self._arrays["node_ids"], self._arrays["out_targets"]
+        offsets = self._arrays["out_offsets"]
+        return (node_ids[targets[edge_index]] for edge_index in range(offsets[i], offsets[i + 1]))
+
+    def predecessors(self, node_id):
+        i = self._index(node_id)
+        node_ids, sources = self._arrays["node_ids"], self._arrays["in_sources"]
+        offsets = self._arrays["in_offsets"]
+        return (node_ids[sources[edge_index]] for edge_index in range(offsets[i], offsets[i + 1]))
+
+    def get_edge_data(self, out_node_id, in_node_id, default=None):
+        i, j = self._index(out_node_id), self._index(in_node_id)
+        offsets, targets = self._arrays["out_offsets"], self._arrays["out_targets"]
+        for edge_index in range(offsets[i], offsets[i + 1]):
+            if targets[edge_index] == j:
+                return self._edge_data(edge_index)
+        return default
+
+    def to_networkx(self) -> nx.DiGraph:
+        """
+        Copies the graph into a networkx graph, for the work needing the full networkx API such as rendering.
+        """
+        graph = nx.DiGraph()
+        graph.add_nodes_from(self.nodes(data=True))
+        graph.add_edges_from(self._edges())
+        return graph
+
+
+class SharedGraphStore(BudgetedDirectory):
+    """
+    Packed graphs in a directory of the host's shared memory, one file per workflow version.
+    Files are written atomically and never modified, workers map them read-only.
+    The least recently opened graphs are evicted above the byte budget, shared memory is held in RAM.
+    """
+
+    def _file(self, workflow_id: int, version: int) -> str:
+        return os.path.join(self.directory, f"{workflow_id}-{version}.graph")
+
+    def _versions(self, workflow_id: int) -> list:
+        return glob.glob(os.path.join(self.directory, f"{workflow_id}-*.graph"))
+
+    def publish(self, workflow_id: int, version: int, graph: nx.DiGraph, structure_hash: int = None) -> SharedGraph:
+        """
+        Stores the graph of the workflow version and removes the files of its older versions.
+
+        Returns:
+            SharedGraph: The stored graph mapped from the file.
+        """
+        self._store(
+            self._file(workflow_id=workflow_id, version=version),
+            pack_graph(workflow_id=workflow_id, version=version, graph=graph, structure_hash=structure_hash),
+        )
+        self._remove(
+            file for file in self._versions(workflow_id)
+            if int(file.rsplit("-", 1)[1].split(".")[0]) < version
+        )
+        return self.open(workflow_id=workflow_id, version=version, structure_hash=structure_hash)
+
+    def open(self, workflow_id: int, version: int, structure_hash: int = None) -> Optional[SharedGraph]:
+        """
+        Maps the stored graph of the workflow version and marks it as recently used.
+
+        Args:
+            workflow_id: The ID of the workflow.
+            version: The version of the workflow.
+            structure_hash: The structure hash the version has in the database, if known.
+                A file with another hash was published for a version number since rolled back and reused.
+
+        Returns:
+            SharedGraph: The graph, None if no worker has published that version in the current format.
+        """
+        file = self._file(workflow_id=workflow_id, version=version)
+        try:
+            with open(file, "rb") as f:
+                # The mapping outlives the file descriptor and the file itself if it gets replaced or evicted
+                graph = SharedGraph(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            os.utime(file)
+        except (FileNotFoundError, ValueError):
+            # Files left by a previous release are recompiled and replaced
+            return None
+        if structure_hash is not None and graph.structure_hash != structure_hash:
+            # Recompiled and replaced as well
+            return None
+        return graph
+
+    def discard(self, workflow_id: int):
+        """
+        Removes the stored graphs of a deleted workflow.
+        """
+        self._remove(self._versions(workflow_id))
+
+
+shared_graphs = SharedGraphStore(directory=settings.shared_graph_dir, max_bytes=settings.shared_graph_max_bytes)
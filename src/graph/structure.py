@@ -0,0 +1,96 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from src.config import settings
+from src.models import Status, EdgeType
+
+# Structure hashes are sums of element hashes modulo this, so a hash plus any delta still fits a BIGINT
+STRUCTURE_HASH_MODULUS = 1 << 62
+
+
+def _element_hash(*parts: str) -> int:
+    digest = hashlib.blake2b("\x1f".join(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % STRUCTURE_HASH_MODULUS
+
+
+def node_hash(discriminator: str, status: Status = None) -> int:
+    """
+    Hashes a node by its type and its status or condition value, leaving out its ID and message.
+
+    Args:
+        discriminator: The type of the node.
+        status: The status of a message node or the condition value of a condition node.
+
+    Returns:
+        int: The hash added to the structure hash of the workflow.
+    """
+    return _element_hash("node", discriminator, Status(status).value if status else "")
+
+
+def edge_hash(edge_type: EdgeType, out_discriminator: str, in_discriminator: str) -> int:
+    """
+    Hashes an edge by its type and the types of its nodes, leaving out their IDs.
+
+    Returns:
+        int: The hash added to the structure hash of the workflow.
+    """
+    return _element_hash("edge", edge_type.value, out_discriminator, in_discriminator)
+
+
+class StructureEntry:
+    """
+    Computations shared by the workflow versions with the same structure.
+    Nodes are referred to by their rank in the topological order of the workflow instead of their IDs.
+    """
+
+    def __init__(self, signature: tuple):
+        self.signature = signature
+        # Paths keyed by the ranks of their start and end nodes and the outcomes of the sub-flows
+        self.paths = {}
+        # Decision tables keyed by the ranks of the start and end nodes and the outcomes of the sub-flows
+        self.decision_tables = {}
+        # Positions of the nodes in the image of the whole graph
+        self.layout = None
+
+
+class StructureCache:
+    """
+    LRU cache of the structure entries, keyed by the structure hash maintained on the workflow.
+    The hash only sums the nodes and edges, so different structures may share it:
+    the entries of a hash are told apart by their exact signatures.
+    """
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def attach(self, structure_hash: int, signature: tuple) -> StructureEntry:
+        """
+        Finds the entry of the structure, creating it for the first workflow version having it.
+
+        Args:
+            structure_hash: The structure hash of the workflow.
+            signature: The signature of the compiled graph.
+
+        Returns:
+            StructureEntry: The entry.
+        """
+        with self._lock:
+            bucket = self._buckets.setdefault(structure_hash, [])
+            self._buckets.move_to_end(structure_hash)
+            entry = next((entry for entry in bucket if entry.signature == signature), None)
+            if entry is None:
+                entry = StructureEntry(signature=signature)
+                bucket.append(entry)
+            while len(self._buckets) > self._max_size:
+                self._buckets.popitem(last=False)
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+structures = StructureCache(max_size=settings.structure_cache_size)
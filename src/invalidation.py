@@ -0,0 +1,100 @@
+import asyncio
+import logging
+
+from sqlalchemy import select, func, Select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.config import settings
+from src.graph.compiled import compiled_workflows
+from src.graph.shared_store import shared_graphs
+
+logger = logging.getLogger(__name__)
+
+# Channel every committed change of a workflow is announced on
+CHANNEL = "workflow_changes"
+
+
+def construct_notify_stmt(workflow_id: int, version: int = None) -> Select:
+    """
+    Builds the statement announcing the change of a workflow.
+    Notifications are only delivered when the transaction commits, a rolled back change is never announced.
+
+    Args:
+        workflow_id: The ID of the changed workflow.
+        version: The new version of the workflow, None when it's deleted.
+    """
+    payload = f"{workflow_id}:{'' if version is None else version}"
+    return select(func.pg_notify(CHANNEL, payload))
+
+
+def handle_notification(payload: str):
+    """
+    Evicts the cached entries a change announced by any worker made stale.
+
+    Args:
+        payload: The workflow ID and its new version, separated by a colon.
+    """
+    workflow_id, _, version = payload.partition(":")
+    if version:
+        compiled_workflows.evict_older(workflow_id=int(workflow_id), version=int(version))
+    else:
+        compiled_workflows.evict(workflow_id=int(workflow_id))
+        shared_graphs.discard(workflow_id=int(workflow_id))
+
+
+class WorkflowChangeListener:
+    """
+    Keeps a connection listening to the change channel and evicts what the changes make stale.
+    The connection is reopened when lost, the caches are cleared then since changes may have been missed.
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self._engine = engine
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._listen_forever())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen_forever(self):
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Listening to %s failed", CHANNEL)
+            compiled_workflows.clear()
+            await asyncio.sleep(settings.cache_invalidation_retry_seconds)
+
+    async def _listen(self):
+        async with self._engine.connect() as connection:
+            raw_connection = await connection.get_raw_connection()
+            driver_connection = raw_connection.driver_connection
+            lost = asyncio.Event()
+
+            def on_notification(connection, pid, channel, payload):
+                handle_notification(payload)
+
+            def on_termination(connection):
+                lost.set()
+
+            driver_connection.add_termination_listener(on_termination)
+            await driver_connection.add_listener(CHANNEL, on_notification)
+            try:
+                # Changes committed before the listener started are not announced anymore
+                compiled_workflows.clear()
+                await lost.wait()
+            finally:
+                # The connection goes back to the pool, it must stop delivering notifications
+                driver_connection.remove_termination_listener(on_termination)
+                if not driver_connection.is_closed():
+                    await driver_connection.remove_listener(CHANNEL, on_notification)
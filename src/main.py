@@ -1,14 +1,53 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from sqlalchemy import event
 
+from src.access_counter import access_counter
 from src.api_v1.routers import all_routers
-from src.models import Edge, MessageNode, StartNode, ConditionNode, EdgeType
+from src.config import settings
+from src.database import engine, SessionLocal, ReadSessionLocal
+from src.executor import graph_deadline
+from src.invalidation import WorkflowChangeListener
+from src.models import Edge, MessageNode, StartNode, ConditionNode, SubflowNode, EdgeType
+from src.repositories.workflow import WorkFlowRepository
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warms the caches up before the worker serves requests,
+    then listens to the changes committed by the other workers and flushes the access counts while it runs.
+    """
+    listener = WorkflowChangeListener(engine=engine)
+    if settings.cache_invalidation_enabled:
+        listener.start()
+    if settings.warmup_enabled:
+        async with ReadSessionLocal() as session:
+            await WorkFlowRepository(session=session).warm_up(limit=settings.warmup_workflows)
+    flusher = asyncio.create_task(access_counter.flush_periodically(session_factory=SessionLocal))
+    yield
+    flusher.cancel()
+    await access_counter.flush(session_factory=SessionLocal)
+    await listener.stop()
+
 
 app = FastAPI(
-    title="Workflow management"
+    title="Workflow management",
+    lifespan=lifespan
 )
 
 
+@app.middleware("http")
+async def start_graph_deadline(request: Request, call_next):
+    """
+    Starts the deadline shared by all the graph work of the request.
+    """
+    with graph_deadline():
+        return await call_next(request)
+
+
 for router in all_routers:
     app.include_router(router)
 
@@ -29,7 +68,7 @@ def update_edge_counts(mapper, connection, target):
     start_node = target.start_node
 
     if start_node:
-        if isinstance(start_node, MessageNode):
+        if isinstance(start_node, (MessageNode, SubflowNode)):
             connection.execute(
                 start_node.__table__.update()
                 .where(start_node.__table__.c.id == start_node.id)
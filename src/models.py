@@ -1,7 +1,9 @@
 from datetime import datetime
+from typing import Optional
 import enum
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Sequence, Integer, BigInteger, UniqueConstraint, func
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import DeclarativeBase, declared_attr, Mapped, mapped_column, relationship
 
 
@@ -28,17 +30,92 @@ class Base(DeclarativeBase):
 
 class WorkFlow(Base):
     created_at: Mapped[datetime] = mapped_column(default=datetime.now)
+    # Bumped by every change of the workflow's nodes or edges, keys everything computed from the graph
+    version: Mapped[int] = mapped_column(default=0, server_default="0")
+    # Time of the latest change of the workflow's nodes or edges
+    updated_at: Mapped[datetime] = mapped_column(default=datetime.now, server_default=func.now(), index=True)
+    # Path and image requests served, flushed in batches by the workers
+    access_count: Mapped[int] = mapped_column(default=0, server_default="0", index=True)
+    # Sum of the hashes of the nodes and edges, independent of their IDs, maintained on every change
+    structure_hash: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+
+    # Counters maintained by the node and edge repositories, so statistics never load collections
+    start_node_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    message_node_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    condition_node_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    end_node_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    subflow_node_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    default_edge_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    yes_edge_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    no_edge_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    start_out_edge_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    end_in_edge_count: Mapped[int] = mapped_column(default=0, server_default="0")
 
     start_nodes: Mapped[list["StartNode"]] = relationship(back_populates="start_node_workflow", cascade="all, delete-orphan")
     message_nodes: Mapped[list["MessageNode"]] = relationship(back_populates="message_node_workflow", cascade="all, delete-orphan")
     condition_nodes: Mapped[list["ConditionNode"]] = relationship(back_populates="condition_node_workflow", cascade="all, delete-orphan")
     end_nodes: Mapped[list["EndNode"]] = relationship(back_populates="end_node_workflow", cascade="all, delete-orphan")
+    subflow_nodes: Mapped[list["SubflowNode"]] = relationship(back_populates="subflow_node_workflow", cascade="all, delete-orphan",
+                                                              foreign_keys="SubflowNode.workflow_id")
     edges: Mapped[list["Edge"]] = relationship(back_populates="edge_workflow", cascade="all, delete-orphan")
 
     repr_cols_num = 2
     repr_cols = tuple()
 
 
+class WorkFlowPath(Base):
+    """
+    Start to end path of a workflow, refreshed in the transaction of every change of its nodes or edges.
+    """
+    workflow_id: Mapped[int] = mapped_column(ForeignKey("workflow.id", ondelete="CASCADE"), unique=True)
+    version: Mapped[int]
+    # Node IDs of the path, empty when the path can't be built
+    path: Mapped[Optional[list[int]]] = mapped_column(ARRAY(Integer))
+    # Status code and detail of the error raised when the path can't be built
+    status_code: Mapped[int]
+    detail: Mapped[Optional[str]]
+
+    repr_cols_num = 3
+    repr_cols = tuple()
+
+
+class WorkFlowVersion(Base):
+    """
+    Saved version of a workflow. Checkpoints hold all the nodes and edges of the version,
+    the other versions only the ones changed since their parent version.
+    """
+    workflow_id: Mapped[int] = mapped_column(ForeignKey("workflow.id", ondelete="CASCADE"))
+    # Numbered from 1 within the workflow, the parent of a version is the one numbered before it
+    number: Mapped[int]
+    parent_number: Mapped[Optional[int]]
+    is_checkpoint: Mapped[bool]
+    # Value of the workflow's change counter when the version was saved
+    workflow_version: Mapped[int]
+    created_at: Mapped[datetime] = mapped_column(default=datetime.now)
+
+    __table_args__ = (UniqueConstraint("workflow_id", "number"),)
+
+    repr_cols_num = 3
+    repr_cols = tuple()
+
+
+class WorkFlowVersionElement(Base):
+    """
+    Node or edge stored by a saved version.
+    """
+    version_id: Mapped[int] = mapped_column(ForeignKey("workflowversion.id", ondelete="CASCADE"))
+    # Workflow collection of the element, such as message_nodes or edges
+    collection: Mapped[str]
+    element_id: Mapped[int]
+    # Columns of the element, None when the version removed it
+    data: Mapped[Optional[dict]] = mapped_column(JSONB)
+
+    __table_args__ = (UniqueConstraint("version_id", "collection", "element_id"),)
+
+    repr_cols_num = 4
+    repr_cols = tuple()
+
+
 class EdgeType(enum.Enum):
     DEFAULT = "default"
     YES = "yes"
@@ -46,9 +123,9 @@ class EdgeType(enum.Enum):
 
 
 class Edge(Base):
-    start_node_id: Mapped[int] = mapped_column(ForeignKey("nodeinterface.id", ondelete="CASCADE"))
-    end_node_id: Mapped[int] = mapped_column(ForeignKey("nodeinterface.id", ondelete="CASCADE"))
-    workflow_id: Mapped[int] = mapped_column(ForeignKey("workflow.id", ondelete="CASCADE"))
+    start_node_id: Mapped[int] = mapped_column(ForeignKey("nodeinterface.id", ondelete="CASCADE"), index=True)
+    end_node_id: Mapped[int] = mapped_column(ForeignKey("nodeinterface.id", ondelete="CASCADE"), index=True)
+    workflow_id: Mapped[int] = mapped_column(ForeignKey("workflow.id", ondelete="CASCADE"), index=True)
     edge_type: Mapped[EdgeType]
 
     start_node = relationship('NodeInterface', foreign_keys=[start_node_id])
@@ -59,9 +136,15 @@ class Edge(Base):
     repr_cols = tuple()
 
 
+topo_index_seq = Sequence("nodeinterface_topo_index_seq")
+
+
 class NodeInterface(Base):
     id: Mapped[int] = mapped_column(primary_key=True, index=True, autoincrement=True)
     discriminator: Mapped[str] = mapped_column()
+    # Position of the node in the topological order of its workflow, new nodes go last.
+    # Values are unique, only their relative order within a workflow matters.
+    topo_index: Mapped[int] = mapped_column(topo_index_seq, server_default=topo_index_seq.next_value(), index=True)
 
     repr_cols_num = 3
     repr_cols = tuple()
@@ -131,3 +214,19 @@ class EndNode(NodeInterface):
     end_node_workflow = relationship('WorkFlow', back_populates='end_nodes')
 
     __mapper_args__ = {"polymorphic_identity": "endnode", "inherit_condition": (id == NodeInterface.id)}
+
+
+# Node standing for a whole other workflow, a path goes through it when the sub-flow has a path
+class SubflowNode(NodeInterface):
+    id: Mapped[int] = mapped_column(ForeignKey("nodeinterface.id"), primary_key=True, index=True)
+    # Workflows used as sub-flows can't be deleted
+    subflow_id: Mapped[int] = mapped_column(ForeignKey("workflow.id", ondelete="RESTRICT"), index=True)
+    has_out_edge: Mapped[bool] = mapped_column(default=False)
+    workflow_id: Mapped[int] = mapped_column(ForeignKey("workflow.id", ondelete="CASCADE"))
+
+    repr_cols_num = 3
+    repr_cols = tuple()
+
+    subflow_node_workflow = relationship('WorkFlow', back_populates='subflow_nodes', foreign_keys=[workflow_id])
+
+    __mapper_args__ = {"polymorphic_identity": "subflownode", "inherit_condition": (id == NodeInterface.id)}
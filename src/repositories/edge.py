@@ -1,9 +1,14 @@
+from collections import Counter, defaultdict
+
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
-from src.models import Edge, NodeInterface, StartNode, MessageNode, ConditionNode, EdgeType, WorkFlow
+from src.models import Edge, NodeInterface, StartNode, MessageNode, ConditionNode, SubflowNode, EdgeType, \
+    WorkFlow
 from src.repositories.repository_base import BaseRepository
+from src.repositories.workflow import WorkFlowRepository, edge_counter_deltas
 
 
 class EdgeRepository(BaseRepository):
@@ -79,8 +84,143 @@ class EdgeRepository(BaseRepository):
         elif in_node.discriminator == "startnode":
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Start node can't have input edges")
 
+    @staticmethod
+    def _reach(node_id: int, adjacency: dict) -> set:
+        """
+        Collects the nodes reachable from the node.
+
+        Args:
+            node_id: The ID of the node the search starts from.
+            adjacency: Node IDs mapped to the IDs of their neighbours.
+
+        Returns:
+            set: IDs of the reached nodes, including the initial one.
+        """
+        reached = {node_id}
+        stack = [node_id]
+        while stack:
+            for neighbour in adjacency[stack.pop()]:
+                if neighbour not in reached:
+                    reached.add(neighbour)
+                    stack.append(neighbour)
+        return reached
+
+    async def maintain_topological_order(self, workflow_id: int, start_node_id: int, end_node_id: int):
+        """
+        Keeps the workflow's topological order valid for a new edge (Pearce-Kelly algorithm).
+        Only the nodes ordered between the edge's end and start nodes are searched and reordered,
+        so the cost depends on the affected region rather than the whole graph.
+
+        Args:
+            workflow_id: The ID of the workflow.
+            start_node_id: The ID of the node from which the edge begins.
+            end_node_id: The ID of the node where the edge ends.
+
+        Raises:
+            HTTPException: If the edge would create a cycle.
+        """
+        query = select(NodeInterface.id, NodeInterface.topo_index).where(NodeInterface.id.in_([start_node_id, end_node_id]))
+        result = await self._session.execute(query)
+        order = dict(result.all())
+        lower, upper = order[end_node_id], order[start_node_id]
+        if lower > upper:
+            return
+
+        out_node = aliased(NodeInterface)
+        in_node = aliased(NodeInterface)
+        query = (
+            select(self._model.start_node_id, self._model.end_node_id, out_node.topo_index, in_node.topo_index)
+            .join(out_node, self._model.start_node_id == out_node.id)
+            .join(in_node, self._model.end_node_id == in_node.id)
+            .where(
+                self._model.workflow_id == workflow_id,
+                out_node.topo_index.between(lower, upper),
+                in_node.topo_index.between(lower, upper),
+            )
+        )
+        result = await self._session.execute(query)
+
+        successors = defaultdict(list)
+        predecessors = defaultdict(list)
+        for out_node_id, in_node_id, out_index, in_index in result.all():
+            order[out_node_id] = out_index
+            order[in_node_id] = in_index
+            successors[out_node_id].append(in_node_id)
+            predecessors[in_node_id].append(out_node_id)
+
+        forward = self._reach(end_node_id, successors)
+        if start_node_id in forward:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cannot create an edge that closes a cycle"
+            )
+        backward = self._reach(start_node_id, predecessors)
+
+        # The nodes reaching the start node move before the nodes reachable from the end node,
+        # both groups reuse the positions they occupied and keep their inner order
+        reordered = sorted(backward, key=order.get) + sorted(forward, key=order.get)
+        positions = sorted(order[node_id] for node_id in reordered)
+        await self._session.execute(
+            update(NodeInterface),
+            [{"id": node_id, "topo_index": position} for node_id, position in zip(reordered, positions)]
+        )
+
+    async def collect_counter_deltas(self, *where_clauses, sign: int) -> Counter:
+        """
+        Sums the workflow counter deltas of the edges matching the where clauses.
+
+        Args:
+            where_clauses: Conditions selecting the edges.
+            sign: 1 for added edges, -1 for removed ones.
+
+        Returns:
+            Counter: Counter names mapped to their deltas.
+        """
+        out_node = aliased(NodeInterface)
+        in_node = aliased(NodeInterface)
+        query = (
+            select(self._model.edge_type, out_node.discriminator, in_node.discriminator)
+            .join(out_node, self._model.start_node_id == out_node.id)
+            .join(in_node, self._model.end_node_id == in_node.id)
+            .where(*where_clauses)
+        )
+        result = await self._session.execute(query)
+
+        deltas = Counter()
+        for edge_type, out_discriminator, in_discriminator in result.all():
+            deltas.update(edge_counter_deltas(edge_type, out_discriminator, in_discriminator, sign=sign))
+        return deltas
+
+    async def update(self, values: dict, model_object_id: int):
+        edge = await self.get(model_object_id=model_object_id)
+        endpoints = (edge.start_node_id, edge.end_node_id)
+
+        deltas = await self.collect_counter_deltas(self._model.id == edge.id, sign=-1)
+        self.apply_values(obj=edge, values=values)
+        await self._session.flush()
+        if (edge.start_node_id, edge.end_node_id) != endpoints:
+            await self._session.execute(select(WorkFlow.id).where(WorkFlow.id == edge.workflow_id).with_for_update())
+            await self.maintain_topological_order(
+                workflow_id=edge.workflow_id,
+                start_node_id=edge.start_node_id,
+                end_node_id=edge.end_node_id
+            )
+        deltas.update(await self.collect_counter_deltas(self._model.id == edge.id, sign=1))
+
+        await WorkFlowRepository(session=self._session).commit_change(workflow_id=edge.workflow_id, **deltas)
+        return edge
+
+    async def delete(self, model_object_id: int):
+        edge = await self.get(model_object_id=model_object_id)
+
+        deltas = await self.collect_counter_deltas(self._model.id == edge.id, sign=-1)
+
+        await self._session.delete(edge)
+        await WorkFlowRepository(session=self._session).commit_change(workflow_id=edge.workflow_id, **deltas)
+
     async def add(self, values: dict):
-        query = select(WorkFlow).where(WorkFlow.id == values["workflow_id"])
+        # Locking the workflow serializes the structural changes of its graph
+        query = select(WorkFlow).where(WorkFlow.id == values["workflow_id"]).with_for_update()
         result = await self._session.execute(query)
         workflow = result.scalar_one_or_none()
         if not workflow:
@@ -119,6 +259,16 @@ class EdgeRepository(BaseRepository):
                 )
             edge_start_node.has_out_edge = True
 
+        elif out_node.discriminator == "subflownode":
+            query = select(SubflowNode).where(SubflowNode.id == values["start_node_id"], SubflowNode.workflow_id == values["workflow_id"])
+            edge_start_node = await self.get_edge_start_node(query=query)
+            if edge_start_node.has_out_edge:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Out node (Sub-flow node) already has output edge"
+                )
+            edge_start_node.has_out_edge = True
+
         elif out_node.discriminator == "conditionnode":
             query = select(ConditionNode).where(ConditionNode.id == values["start_node_id"], ConditionNode.workflow_id == values["workflow_id"])
             edge_start_node = await self.get_edge_start_node(query=query)
@@ -151,7 +301,18 @@ class EdgeRepository(BaseRepository):
 
         await self.validate_in_node(in_node)
 
+        await self.maintain_topological_order(
+            workflow_id=values["workflow_id"],
+            start_node_id=values["start_node_id"],
+            end_node_id=values["end_node_id"]
+        )
+
         stmt = self.construct_add_stmt(values)
         result = await self._session.execute(stmt)
-        await self._session.commit()
-        return result.scalar_one()
+        edge = result.scalar_one()
+
+        await WorkFlowRepository(session=self._session).commit_change(
+            workflow_id=values["workflow_id"],
+            **edge_counter_deltas(edge_type, out_node.discriminator, in_node.discriminator)
+        )
+        return edge
@@ -1,20 +1,63 @@
+from collections import Counter
+
 from fastapi import HTTPException, status
 
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_
 
+from src.models import Edge
+from src.repositories.edge import EdgeRepository
 from src.repositories.repository_base import BaseRepository
+from src.repositories.workflow import WorkFlowRepository, node_counter_deltas
 
 
 class NodeRepository(BaseRepository):
     def __init__(self, session: AsyncSession, model):
         super().__init__(session=session, model=model)
 
+    @staticmethod
+    def _node_status(node):
+        """
+        Returns:
+            Status: The status of a message node, the condition value of a condition node, None for other nodes.
+        """
+        return getattr(node, "status", None) or getattr(node, "status_condition", None)
+
     async def add(self, values: dict):
         try:
             node = self._model(**values)
             self._session.add(node)
-            await self._session.commit()
+            await WorkFlowRepository(session=self._session).commit_change(
+                workflow_id=values["workflow_id"],
+                **node_counter_deltas(self._model.__mapper__.polymorphic_identity, self._node_status(node))
+            )
             return node
         except IntegrityError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Specified workflow ID doesn't exist")
+
+    async def update(self, values: dict, model_object_id: int):
+        node = await self.get(model_object_id=model_object_id)
+        # A changed status or condition value changes the node's share of the structure hash
+        deltas = Counter(node_counter_deltas(node.discriminator, self._node_status(node), sign=-1))
+        self.apply_values(obj=node, values=values)
+        deltas.update(node_counter_deltas(node.discriminator, self._node_status(node)))
+
+        await WorkFlowRepository(session=self._session).commit_change(workflow_id=node.workflow_id, **deltas)
+        return node
+
+    async def delete(self, model_object_id: int):
+        result = await self._session.execute(self.construct_get_stmt(id=model_object_id))
+        node = result.scalar_one_or_none()
+        if not node:
+            raise HTTPException(status_code=404, detail=f"{self._model.__name__} with the specified id was not found")
+
+        # The node's edges are removed by the cascade, so their counters go together with the node's one
+        deltas = Counter(node_counter_deltas(node.discriminator, self._node_status(node), sign=-1))
+        deltas.update(await EdgeRepository(session=self._session).collect_counter_deltas(
+            or_(Edge.start_node_id == node.id, Edge.end_node_id == node.id),
+            sign=-1
+        ))
+
+        await self._session.delete(node)
+        await WorkFlowRepository(session=self._session).commit_change(workflow_id=node.workflow_id, **deltas)
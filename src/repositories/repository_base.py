@@ -26,8 +26,8 @@ class BaseRepository:
             raise HTTPException(status_code=404, detail=f"{self._model.__name__} with the specified id was not found")
         return model_object
 
-    def construct_list_stmt(self, filters) -> Select:
-        stmt = select(self._model)
+    def construct_list_stmt(self, filters, columns=None) -> Select:
+        stmt = select(self._model) if columns is None else select(*columns)
         where_clauses = []
         for c, v in filters.items():
             if not hasattr(self._model, c):
@@ -47,6 +47,23 @@ class BaseRepository:
         result = await self._session.execute(query)
         return result.scalars().all()
 
+    async def list_rows(self, fields, **filters):
+        """
+        Lists the rows as plain mappings of the given fields.
+        No ORM objects are built, so the rows can be encoded straight into a response.
+
+        Args:
+            fields: Names of the columns to read.
+            filters: Column names mapped to the values to filter by.
+
+        Returns:
+            List[dict]: The matching rows.
+        """
+        columns = [self._model.__table__.c[field] for field in fields]
+        query = self.construct_list_stmt(filters, columns=columns)
+        result = await self._session.execute(query)
+        return [dict(row) for row in result.mappings()]
+
     def construct_add_stmt(self, values: dict) -> Insert:
         stmt = insert(self._model).values(**values).returning(self._model)
         return stmt
@@ -66,15 +83,18 @@ class BaseRepository:
         obj = result.scalar_one_or_none()
         if not obj:
             raise HTTPException(status_code=404, detail=f"{self._model.__name__} with the specified id was not found")
+        self.apply_values(obj=obj, values=values)
+
+        await self._session.commit()
+        return obj
+
+    def apply_values(self, obj, values: dict):
         for c, v in values.items():
             if not hasattr(self._model, c):
                 raise ValueError(f"Invalid column name {c}")
             if v is not None:
                 setattr(obj, c, v)
 
-        await self._session.commit()
-        return obj
-
     def construct_delete_stmt(self, id: int):
         stmt = delete(self._model).where(self._model.id == id)
         return stmt
@@ -0,0 +1,43 @@
+from fastapi import HTTPException, status
+from sqlalchemy import select, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import SubflowNode, WorkFlow
+from src.repositories.node import NodeRepository
+
+
+class SubflowNodeRepository(NodeRepository):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session=session, model=SubflowNode)
+
+    async def validate_subflow(self, workflow_id: int, subflow_id: int):
+        """
+        Validates the workflow used as a sub-flow.
+
+        Raises:
+            HTTPException: If the sub-flow is not found. If it is the workflow itself or uses it as a sub-flow,
+                directly or through other sub-flows.
+        """
+        result = await self._session.execute(select(WorkFlow.id).where(WorkFlow.id == subflow_id))
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sub-flow workflow not found")
+
+        # Workflows the sub-flow uses, directly or through their own sub-flows
+        used = select(self._model.subflow_id).where(self._model.workflow_id == subflow_id).cte("used", recursive=True)
+        used = used.union(
+            select(self._model.subflow_id).join(used, self._model.workflow_id == used.c.subflow_id)
+        )
+        result = await self._session.execute(select(exists().where(used.c.subflow_id == workflow_id)))
+        if subflow_id == workflow_id or result.scalar():
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Sub-flows can't use the workflow they belong to")
+
+    async def add(self, values: dict):
+        await self.validate_subflow(workflow_id=values["workflow_id"], subflow_id=values["subflow_id"])
+        return await super().add(values=values)
+
+    async def update(self, values: dict, model_object_id: int):
+        if values.get("subflow_id") is not None:
+            node = await self.get(model_object_id=model_object_id)
+            await self.validate_subflow(workflow_id=node.workflow_id, subflow_id=values["subflow_id"])
+        return await super().update(values=values, model_object_id=model_object_id)
@@ -1,17 +1,132 @@
 import io
-from typing import List
+import json
+import os
+from collections import Counter
+from datetime import datetime
+from enum import Enum
+from typing import List, AsyncIterator, Tuple
 
 from fastapi import HTTPException, status
-from matplotlib import pyplot as plt
-from sqlalchemy import Insert, insert, Select, select
+from matplotlib.figure import Figure
+from sqlalchemy import Insert, insert, Select, select, update, delete, func, literal, case, and_, or_, all_, Integer, \
+    bindparam, union, union_all, Sequence
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert, array, aggregate_order_by, ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, with_polymorphic
 
 import networkx as nx
 
-from src.models import WorkFlow, EdgeType
+from src.config import settings
+from src.executor import run_graph_task, check_deadline, prewarm_debouncer, single_flight
+from src.graph.compiled import CompiledWorkflow, compiled_workflows
+from src.graph.decision_table import DecisionTable
+from src.graph.render_cache import ImageFormat, render_cache
+from src.graph.render_jobs import RenderJob, JobStatus, render_jobs
+from src.graph.shared_store import SharedGraph, shared_graphs
+from src.graph.structure import STRUCTURE_HASH_MODULUS, node_hash, edge_hash, structures
+from src.invalidation import construct_notify_stmt
+from src.snapshot import WorkflowSnapshot, pack_snapshot
+from src.models import WorkFlow, WorkFlowPath, EdgeType, StartNode, MessageNode, ConditionNode, EndNode, Edge, \
+    SubflowNode, NodeInterface, Status, topo_index_seq
 from src.repositories.repository_base import BaseRepository
 
+# Workflow counter maintained for every node type
+NODE_COUNTERS = {
+    "startnode": "start_node_count",
+    "messagenode": "message_node_count",
+    "conditionnode": "condition_node_count",
+    "endnode": "end_node_count",
+    "subflownode": "subflow_node_count",
+}
+
+# Workflow counter maintained for every edge type
+EDGE_COUNTERS = {
+    EdgeType.DEFAULT: "default_edge_count",
+    EdgeType.YES: "yes_edge_count",
+    EdgeType.NO: "no_edge_count",
+}
+
+
+class PathEngine(Enum):
+    """
+    Evaluator finding the path of a workflow.
+    """
+    # Picks the SQL engine for workflows too large to load, unless they are already compiled
+    AUTO = "auto"
+    # Walks the compiled graph
+    PYTHON = "python"
+    # Walks the workflow inside the database, only the path is returned
+    SQL = "sql"
+
+
+class NeighbourhoodDirection(Enum):
+    """
+    Edges followed when collecting the neighbourhood of a node.
+    """
+    OUT = "out"
+    IN = "in"
+    BOTH = "both"
+
+
+# Sequence behind the serial IDs of the nodes
+node_id_seq = Sequence("nodeinterface_id_seq")
+
+# Workflow collections in the order they are streamed
+STREAMED_COLLECTIONS = (
+    ("start_nodes", StartNode),
+    ("message_nodes", MessageNode),
+    ("condition_nodes", ConditionNode),
+    ("end_nodes", EndNode),
+    ("subflow_nodes", SubflowNode),
+    ("edges", Edge),
+)
+
+
+def _json_default(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def edge_counter_deltas(edge_type: EdgeType, out_discriminator: str, in_discriminator: str, sign: int = 1) -> dict:
+    """
+    Defines how the workflow counters change when an edge is added or removed.
+
+    Args:
+        edge_type: The type of the edge.
+        out_discriminator: The discriminator of the node from which the edge begins.
+        in_discriminator: The discriminator of the node where the edge ends.
+        sign: 1 for an added edge, -1 for a removed one.
+
+    Returns:
+        dict: Counter names mapped to their deltas.
+    """
+    deltas = {EDGE_COUNTERS[edge_type]: sign}
+    if out_discriminator == "startnode":
+        deltas["start_out_edge_count"] = sign
+    if in_discriminator == "endnode":
+        deltas["end_in_edge_count"] = sign
+    deltas["structure_hash"] = sign * edge_hash(edge_type, out_discriminator, in_discriminator)
+    return deltas
+
+
+def node_counter_deltas(discriminator: str, status: Status = None, sign: int = 1) -> dict:
+    """
+    Defines how the workflow counters change when a node is added or removed.
+
+    Args:
+        discriminator: The discriminator of the node.
+        status: The status of a message node or the condition value of a condition node.
+        sign: 1 for an added node, -1 for a removed one.
+
+    Returns:
+        dict: Counter names mapped to their deltas.
+    """
+    return {NODE_COUNTERS[discriminator]: sign, "structure_hash": sign * node_hash(discriminator, status)}
+
 
 class WorkFlowRepository(BaseRepository):
     def __init__(self, session: AsyncSession):
@@ -21,10 +136,19 @@ class WorkFlowRepository(BaseRepository):
         stmt = insert(self._model).returning(self._model)
         return stmt
 
+    async def delete(self, model_object_id: int):
+        await self._session.execute(construct_notify_stmt(workflow_id=model_object_id))
+        try:
+            await super().delete(model_object_id=model_object_id)
+        except IntegrityError:
+            await self._session.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Workflow is used as a sub-flow")
+
     def construct_get_stmt(self, id: int) -> Select:
         stmt = select(self._model).where(self._model.id == id).options(selectinload(self._model.start_nodes)).options(
             selectinload(self._model.message_nodes)).options(selectinload(self._model.condition_nodes)).options(
-            selectinload(self._model.end_nodes)).options(selectinload(self._model.edges))
+            selectinload(self._model.end_nodes)).options(selectinload(self._model.subflow_nodes)).options(
+            selectinload(self._model.edges))
         return stmt
 
     @staticmethod
@@ -36,10 +160,11 @@ class WorkFlowRepository(BaseRepository):
             workflow: The workflow that contains the nodes.
             graph: The graph where nodes will be added.
         """
-        nodes = workflow.start_nodes + workflow.message_nodes + workflow.condition_nodes + workflow.end_nodes
+        nodes = workflow.start_nodes + workflow.message_nodes + workflow.condition_nodes + workflow.end_nodes + \
+            workflow.subflow_nodes
         for node in nodes:
             node_data = {col.name: getattr(node, col.name) for col in node.__table__.columns}
-            graph.add_node(node.id, type=node.discriminator, **node_data)
+            graph.add_node(node.id, type=node.discriminator, topo_index=node.topo_index, **node_data)
 
     @staticmethod
     def _add_edges_to_graph(workflow: WorkFlow, graph: nx.DiGraph):
@@ -95,35 +220,112 @@ class WorkFlowRepository(BaseRepository):
             return ['gray'] * len(graph.edges())
 
     @staticmethod
-    def _save_graph_image(graph: nx.DiGraph, path: List):
+    def _build_focused_graph(graph: nx.DiGraph, path: List, halo: int) -> nx.DiGraph:
+        """
+        Cuts the path and the nodes within the halo around it out of the graph.
+        Every kept node with neighbours left out gets a "+N more" placeholder connected to it.
+
+        Args:
+            graph: The graph of the workflow.
+            path: Path from start node to end node.
+            halo: The number of hops around the path to keep.
+
+        Returns:
+            nx.DiGraph: The focused graph.
+        """
+        kept = set(path)
+        frontier = set(path)
+        for _ in range(halo):
+            frontier = {
+                neighbour
+                for node in frontier
+                for neighbour in (*graph.predecessors(node), *graph.successors(node))
+                if neighbour not in kept
+            }
+            kept |= frontier
+
+        focused = graph.subgraph(kept).copy()
+        for node in kept:
+            hidden = sum(1 for neighbour in nx.all_neighbors(graph, node) if neighbour not in kept)
+            if hidden:
+                placeholder = f"more-{node}"
+                focused.add_node(placeholder, type="more", label=f"+{hidden} more")
+                focused.add_edge(node, placeholder)
+        return focused
+
+    @staticmethod
+    def _render_path_image(graph: nx.DiGraph, path: List, image_format: ImageFormat = ImageFormat.PNG,
+                           width: int = 640, height: int = 480, layout=None):
+        """
+        Renders the graph, or only the part around the path when the graph is too large to be readable.
+
+        Args:
+            path: Path from start node to end node.
+            graph: The graph of the workflow.
+            image_format: The format of the image.
+            width: The width of the image in pixels.
+            height: The height of the image in pixels.
+            layout: Lays the whole graph out, a spring layout by default.
+        """
+        options = {"image_format": image_format, "width": width, "height": height}
+        # The nodes of the inlined sub-flows aren't part of the drawn graph
+        path = [node for node in path if node in graph]
+        if graph.number_of_nodes() > settings.focused_render_threshold:
+            graph = WorkFlowRepository._build_focused_graph(graph=graph, path=path, halo=settings.focused_render_halo)
+            # Lays the path out left to right and lets the halo settle around it
+            pos = nx.spring_layout(
+                graph,
+                pos={node: (index, 0) for index, node in enumerate(path)},
+                fixed=path,
+                seed=0
+            )
+            return WorkFlowRepository._save_graph_image(graph=graph, path=path, pos=pos, **options)
+        return WorkFlowRepository._save_graph_image(graph=graph, path=path, pos=layout() if layout else None, **options)
+
+    @staticmethod
+    def _save_graph_image(graph: nx.DiGraph, path: List, pos: dict = None, image_format: ImageFormat = ImageFormat.PNG,
+                          width: int = 640, height: int = 480):
         """
         Illustration of the graph.
 
         Args:
             path: Path from start node to end node.
             graph: The graph where nodes will be added.
+            pos: Positions of the nodes, a spring layout by default.
+            image_format: The format of the image.
+            width: The width of the image in pixels.
+            height: The height of the image in pixels.
         """
         abbreviation = {
             "startnode": "st",
             "messagenode": "msg",
             "conditionnode": "cond",
             "endnode": "end",
+            "subflownode": "sub",
         }
 
-        pos = nx.spring_layout(graph)
-        plt.figure()
+        if pos is None:
+            pos = nx.spring_layout(graph)
+        # The object-oriented API keeps no global state, so images can be rendered concurrently in the executor
+        figure = Figure(figsize=(width / 100, height / 100), dpi=100)
+        ax = figure.subplots()
 
         nx.draw(
             graph,
             pos,
+            ax=ax,
             with_labels=True,
-            labels={node: f"{node}: {abbreviation[data['type']]}" for node, data in graph.nodes(data=True)},
+            labels={
+                node: data["label"] if data["type"] == "more" else f"{node}: {abbreviation[data['type']]}"
+                for node, data in graph.nodes(data=True)
+            },
             edgecolors=WorkFlowRepository._define_node_edge_color(graph=graph, path=path)
         )
 
         nx.draw_networkx_edges(
             graph,
             pos,
+            ax=ax,
             edgelist=graph.edges(),
             edge_color=WorkFlowRepository._define_edge_color(graph=graph, path=path)
         )
@@ -131,16 +333,16 @@ class WorkFlowRepository(BaseRepository):
         nx.draw_networkx_edge_labels(
             graph,
             pos,
+            ax=ax,
             edge_labels={
                 (u, v): f"{d['edge_id']}" if d["edge_type"].value == "default" else f"{d['edge_id']}: {d['edge_type'].value}"
-                for u, v, d in graph.edges(data=True)
+                for u, v, d in graph.edges(data=True) if "edge_id" in d
             }
         )
 
         buf = io.BytesIO()
-        plt.savefig(buf, format='png')
+        figure.savefig(buf, format=image_format.value)
         buf.seek(0)
-        plt.close()
         return buf
 
     @staticmethod
@@ -160,7 +362,7 @@ class WorkFlowRepository(BaseRepository):
         return start_node, end_node
 
     @staticmethod
-    def _process_condition_node(graph: nx.DiGraph, current_node, edge_type, stack, successor, current_path):
+    def _process_condition_node(graph: nx.DiGraph, current_node, edge_type, stack, successor, current_path, decide=None):
         """
         Processes a condition node and updates the stack with the next nodes to visit.
         Checks if message node exists before condition node.
@@ -172,6 +374,7 @@ class WorkFlowRepository(BaseRepository):
             stack: The stack of nodes to visit.
             successor: The ID of the successor node.
             current_path: The current path of node IDs.
+            decide: Answers whether the message node has the status instead of the graph, if given.
 
         Raises:
             HTTPException: If the condition node has no predecessor or has an invalid predecessor.
@@ -181,17 +384,25 @@ class WorkFlowRepository(BaseRepository):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                                 detail=f"Condition node (ID: {current_node}) has no predecessor")
 
-        message_status = None
+        message_node = None
         for predecessor in predecessors:
             if graph.nodes[predecessor]['type'] == 'messagenode':
-                message_status = graph.nodes[predecessor]['status']
+                message_node = predecessor
             elif graph.nodes[predecessor]['type'] == 'conditionnode':
                 continue
             else:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                                     detail=f"Condition node (ID: {current_node}) should have Message node before it")
 
-        if message_status == graph.nodes[current_node]['status_condition']:
+        status_condition = graph.nodes[current_node]['status_condition']
+        if message_node is None:
+            matches = False
+        elif decide:
+            matches = decide(message_node, status_condition)
+        else:
+            matches = graph.nodes[message_node]['status'] == status_condition
+
+        if matches:
             if edge_type == EdgeType.YES:
                 stack.append((successor, current_path))
         else:
@@ -199,12 +410,31 @@ class WorkFlowRepository(BaseRepository):
                 stack.append((successor, current_path))
 
     @staticmethod
-    def _build_condition_based_path(graph: nx.DiGraph):
+    def _validate_graph_node(graph: nx.DiGraph, node_id: int):
+        """
+        Checks that the node belongs to the graph.
+
+        Raises:
+            HTTPException: If the node is not in the graph.
+        """
+        if node_id not in graph:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"Node (ID: {node_id}) not found in workflow")
+
+    @staticmethod
+    def _build_condition_based_path(graph: nx.DiGraph, start_node: int = None, end_node: int = None, decide=None,
+                                    subflows: dict = None):
         """
         Builds a path through the graph.
 
         Args:
             graph: The graph containing the nodes and edges.
+            start_node: The ID of the node the path begins with, the start node by default.
+            end_node: The ID of the node the path ends with, the end node by default.
+            decide: Answers whether a message node has a status instead of the graph, if given.
+            subflows: IDs of the workflows used as sub-flows mapped to their compiled versions.
+                The path through the sub-flow follows its sub-flow node,
+                the path can't continue past a sub-flow node whose sub-flow has none.
 
         Returns:
             List: A list of node IDs representing the path from start to end node.
@@ -212,11 +442,18 @@ class WorkFlowRepository(BaseRepository):
         Raises:
             HTTPException: If no path is found between the start and end nodes.
         """
-        start_node, end_node = WorkFlowRepository._get_start_and_end_node(graph=graph)
+        if start_node is None or end_node is None:
+            default_start_node, default_end_node = WorkFlowRepository._get_start_and_end_node(graph=graph)
+            start_node = default_start_node if start_node is None else start_node
+            end_node = default_end_node if end_node is None else end_node
+        WorkFlowRepository._validate_graph_node(graph=graph, node_id=start_node)
+        WorkFlowRepository._validate_graph_node(graph=graph, node_id=end_node)
+
         stack = [(start_node, [])]
         visited = set()
 
         while stack:
+            check_deadline()
             current_node, current_path = stack.pop()
             if current_node in visited:
                 continue
@@ -227,6 +464,15 @@ class WorkFlowRepository(BaseRepository):
             if current_node == end_node:
                 return current_path
 
+            node_data = graph.nodes[current_node]
+            if node_data['type'] == 'subflownode':
+                subflow_path = WorkFlowRepository._build_subflow_path(
+                    subflow_id=node_data['subflow_id'], decide=decide, subflows=subflows
+                )
+                if subflow_path is None:
+                    continue
+                current_path = current_path + subflow_path
+
             for successor in graph.successors(current_node):
                 edge_data = graph.get_edge_data(current_node, successor)
                 edge_type = edge_data['edge_type']
@@ -239,26 +485,88 @@ class WorkFlowRepository(BaseRepository):
                         current_path=current_path,
                         stack=stack,
                         edge_type=edge_type,
-                        successor=successor
+                        successor=successor,
+                        decide=decide
                     )
                 else:
                     stack.append((successor, current_path))
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No path found between start and end nodes")
-    
-    async def _build_graph_and_path(self, workflow_id: int):
+
+    @staticmethod
+    def _build_subflow_path(subflow_id: int, decide=None, subflows: dict = None):
         """
-        Builds the graph and finds the path for the given workflow ID.
+        Finds the path through a sub-flow from its start node to its end node, on its cached compiled version.
+        Without a decide function the path is memoised with the sub-flow's version.
+
+        Returns:
+            List: The node IDs of the sub-flow's path, None if the sub-flow has none.
+
+        Raises:
+            HTTPException: If the deadline of the request has passed.
+        """
+        subflow = (subflows or {}).get(subflow_id)
+        if subflow is None:
+            return None
+        try:
+            if decide is None:
+                return WorkFlowRepository._evaluate_path(compiled=subflow, subflows=subflows)
+            return WorkFlowRepository._build_condition_based_path(graph=subflow.graph, decide=decide,
+                                                                  subflows=subflows)
+        except HTTPException as e:
+            if e.status_code == status.HTTP_504_GATEWAY_TIMEOUT:
+                raise
+            return None
+
+    @staticmethod
+    def _subflow_versions(subflows: dict = None) -> tuple:
+        """
+        Keys the results depending on the sub-flows by the versions they were computed for.
+        """
+        return tuple(sorted((subflow_id, subflow.version) for subflow_id, subflow in (subflows or {}).items()))
+
+    async def get_version(self, workflow_id: int) -> int:
+        """
+        Reads the current version of the workflow.
+
+        Raises:
+            HTTPException: If the workflow is not found.
+        """
+        result = await self._session.execute(select(self._model.version).where(self._model.id == workflow_id))
+        version = result.scalar_one_or_none()
+        if version is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workflow not found")
+        return version
+
+    async def get_compiled(self, workflow_id: int) -> CompiledWorkflow:
+        """
+        Returns the compiled graph of the workflow's current version.
+        The workflow is only loaded and compiled when that version is not cached yet.
 
         Args:
             workflow_id: The ID of the workflow.
 
         Returns:
-            nx.DiGraph, List[int]: The constructed graph and the path as a list of node IDs.
+            CompiledWorkflow: The compiled workflow.
 
         Raises:
             HTTPException: If the workflow is not found.
         """
-        graph = nx.DiGraph()
+        query = select(self._model.version, self._model.structure_hash).where(self._model.id == workflow_id)
+        row = (await self._session.execute(query)).one_or_none()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workflow not found")
+        version, structure_hash = row
+        compiled = compiled_workflows.get(workflow_id=workflow_id, version=version)
+        # A version number rolled back and reused by another change has another structure
+        if compiled and compiled.structure_hash == structure_hash:
+            return compiled
+
+        graph = shared_graphs.open(workflow_id=workflow_id, version=version, structure_hash=structure_hash) \
+            if settings.shared_graph_store_enabled else None
+        if graph:
+            compiled = await run_graph_task(graph.number_of_nodes(), self._compile_shared_graph, graph=graph)
+            compiled_workflows.put(compiled)
+            return compiled
 
         result = await self._session.execute(self.construct_get_stmt(id=workflow_id))
         workflow = result.scalar_one_or_none()
@@ -266,18 +574,1160 @@ class WorkFlowRepository(BaseRepository):
         if not workflow:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workflow not found")
 
-        self._add_nodes_to_graph(workflow=workflow, graph=graph)
-        self._add_edges_to_graph(workflow=workflow, graph=graph)
+        size = len(workflow.start_nodes) + len(workflow.message_nodes) + len(workflow.condition_nodes) + \
+            len(workflow.end_nodes) + len(workflow.subflow_nodes)
+        compiled = await run_graph_task(size, self._compile_workflow, workflow=workflow)
+        compiled = await self._share(compiled)
+        compiled_workflows.put(compiled)
+        return compiled
+
+    @staticmethod
+    def _compile_shared_graph(graph: SharedGraph) -> CompiledWorkflow:
+        """
+        Compiles the graph another worker published in the shared graph store.
+        The reachability index is left to the first reachability query, so only the workers answering them build it.
+        """
+        compiled = CompiledWorkflow(workflow_id=graph.workflow_id, version=graph.version, graph=graph,
+                                    structure_hash=graph.structure_hash)
+        WorkFlowRepository._attach_structure(compiled=compiled)
+        return compiled
+
+    @staticmethod
+    async def _share(compiled: CompiledWorkflow) -> CompiledWorkflow:
+        """
+        Publishes the committed version in the shared graph store and switches to the shared copy of its graph,
+        so the worker's own copy is released.
+
+        Returns:
+            CompiledWorkflow: The compiled workflow over the shared graph.
+        """
+        if not settings.shared_graph_store_enabled:
+            return compiled
+        graph = await run_graph_task(
+            compiled.graph.number_of_nodes(),
+            shared_graphs.publish,
+            workflow_id=compiled.workflow_id,
+            version=compiled.version,
+            graph=compiled.graph,
+            structure_hash=compiled.structure_hash
+        )
+        return compiled.with_graph(graph)
+
+    @staticmethod
+    def _compile_workflow(workflow: WorkFlow) -> CompiledWorkflow:
+        """
+        Builds the graph of the loaded workflow and attaches the computations shared by the same structure.
+        The reachability index is left to the first reachability query.
+
+        Args:
+            workflow: The workflow with its nodes and edges loaded.
+
+        Returns:
+            CompiledWorkflow: The compiled workflow.
+        """
+        compiled = WorkFlowRepository._build_workflow_graph(workflow=workflow)
+        WorkFlowRepository._attach_structure(compiled=compiled)
+        return compiled
+
+    @staticmethod
+    def _build_workflow_graph(workflow: WorkFlow) -> CompiledWorkflow:
+        """
+        Builds the graph of the loaded workflow, enough to evaluate its paths.
+        """
+        graph = nx.DiGraph()
+
+        WorkFlowRepository._add_nodes_to_graph(workflow=workflow, graph=graph)
+        WorkFlowRepository._add_edges_to_graph(workflow=workflow, graph=graph)
+
+        return CompiledWorkflow(workflow_id=workflow.id, version=workflow.version, graph=graph,
+                                structure_hash=workflow.structure_hash)
+
+    @staticmethod
+    def _attach_structure(compiled: CompiledWorkflow):
+        """
+        Attaches the computations shared by the versions with the same structure, such as the clones of a workflow.
+        """
+        if compiled.structure_hash is not None:
+            compiled.structure = structures.attach(structure_hash=compiled.structure_hash,
+                                                   signature=compiled.signature())
+
+    @staticmethod
+    def _evaluate_path(compiled: CompiledWorkflow, start_node: int = None, end_node: int = None,
+                       subflows: dict = None):
+        """
+        Finds the path through the compiled workflow, memoised per workflow version
+        and per version of its sub-flows.
+
+        Args:
+            compiled: The compiled workflow.
+            start_node: The ID of the node the path begins with, the start node by default.
+            end_node: The ID of the node the path ends with, the end node by default.
+            subflows: IDs of the workflows used as sub-flows mapped to their compiled versions.
+
+        Returns:
+            List: A list of node IDs representing the path.
+
+        Raises:
+            HTTPException: If no path is found, or the deadline of the request has passed.
+        """
+        key = (start_node, end_node, *WorkFlowRepository._subflow_versions(subflows))
+        if key not in compiled.paths:
+            try:
+                compiled.paths[key] = WorkFlowRepository._build_structure_path(
+                    compiled=compiled,
+                    start_node=start_node,
+                    end_node=end_node,
+                    subflows=subflows
+                )
+            except HTTPException as e:
+                # A timeout belongs to the request, not to the version
+                if e.status_code == status.HTTP_504_GATEWAY_TIMEOUT:
+                    raise
+                compiled.paths[key] = e
+
+        path = compiled.paths[key]
+        if isinstance(path, HTTPException):
+            raise HTTPException(status_code=path.status_code, detail=path.detail)
+        return path
+
+    @staticmethod
+    def _build_structure_path(compiled: CompiledWorkflow, start_node: int = None, end_node: int = None,
+                              subflows: dict = None):
+        """
+        Finds the path through the compiled workflow, reusing the path found for another version
+        with the same structure. Only found paths are shared, errors name nodes by their IDs.
+        Paths through sub-flows hold the sub-flows' own node IDs, which the ranks don't cover, so they aren't shared.
+
+        Returns:
+            List: A list of node IDs representing the path.
+
+        Raises:
+            HTTPException: If no path is found.
+        """
+        if compiled.structure is None or compiled.subflow_ids():
+            return WorkFlowRepository._build_condition_based_path(
+                graph=compiled.graph, start_node=start_node, end_node=end_node, subflows=subflows
+            )
+
+        if start_node is None or end_node is None:
+            default_start_node, default_end_node = WorkFlowRepository._get_start_and_end_node(graph=compiled.graph)
+            start_node = default_start_node if start_node is None else start_node
+            end_node = default_end_node if end_node is None else end_node
+        ranks = compiled.ranks()
+        if start_node not in ranks or end_node not in ranks:
+            return WorkFlowRepository._build_condition_based_path(
+                graph=compiled.graph, start_node=start_node, end_node=end_node, subflows=subflows
+            )
+
+        key = (ranks[start_node], ranks[end_node])
+        shared = compiled.structure.paths.get(key)
+        if shared is not None:
+            return [compiled.order[rank] for rank in shared]
+        path = WorkFlowRepository._build_condition_based_path(
+            graph=compiled.graph, start_node=start_node, end_node=end_node, subflows=subflows
+        )
+        compiled.structure.paths[key] = [ranks[node_id] for node_id in path]
+        return path
+
+    async def _resolve_subflows(self, compiled: CompiledWorkflow, visiting: tuple = ()) -> dict:
+        """
+        Finds the cached compiled versions of the sub-flows of the compiled workflow and of their own sub-flows,
+        so paths inline the sub-flows' graphs and a change to a sub-flow is seen without recompiling
+        the workflows using it.
+
+        Args:
+            compiled: The compiled workflow.
+            visiting: IDs of the workflows whose sub-flows are being resolved, outermost first.
+
+        Returns:
+            dict: IDs of the workflows used as sub-flows, directly or by other sub-flows,
+                mapped to their compiled versions.
+
+        Raises:
+            HTTPException: If the sub-flows use each other in a cycle.
+        """
+        visiting = (*visiting, compiled.workflow_id)
+        subflows = {}
+        for subflow_id in compiled.subflow_ids():
+            if subflow_id in visiting:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail=f"Sub-flow (ID: {subflow_id}) uses itself")
+            subflow = await self.get_compiled(workflow_id=subflow_id)
+            subflows[subflow_id] = subflow
+            subflows.update(await self._resolve_subflows(compiled=subflow, visiting=visiting))
+        return subflows
+
+    async def _build_graph_and_path(self, workflow_id: int, start_node: int = None, end_node: int = None):
+        """
+        Builds the graph and finds the path for the given workflow ID.
+
+        Args:
+            workflow_id: The ID of the workflow.
+            start_node: The ID of the node the path begins with, the start node by default.
+            end_node: The ID of the node the path ends with, the end node by default.
+
+        Returns:
+            nx.DiGraph, List[int], Callable: The constructed graph, the path as a list of node IDs
+                and the function laying the whole graph out, shared by the versions with the same structure.
+
+        Raises:
+            HTTPException: If the workflow is not found.
+        """
+        compiled = await self.get_compiled(workflow_id=workflow_id)
+        path = await run_graph_task(
+            compiled.graph.number_of_nodes(),
+            self._evaluate_path,
+            compiled=compiled,
+            start_node=start_node,
+            end_node=end_node,
+            subflows=await self._resolve_subflows(compiled=compiled)
+        )
+        graph = await run_graph_task(compiled.graph.number_of_nodes(), compiled.networkx)
+        return graph, path, compiled.layout
+
+    @staticmethod
+    def construct_path_stmt(workflow_id: int, start_node: int, end_node: int) -> Select:
+        """
+        Builds the query walking the workflow from the start node with a recursive CTE.
+        Condition nodes only follow the edge chosen by the status of their message node, the walk is breadth-first
+        and keeps one path per node and depth, so the shortest path is found.
+
+        Args:
+            workflow_id: The ID of the workflow.
+            start_node: The ID of the node the path begins with.
+            end_node: The ID of the node the path ends with.
+
+        Returns:
+            Select: The query returning the path to the end node, or the first invalid condition node found before it.
+        """
+        edge = Edge.__table__
+        node = NodeInterface.__table__
+        message = MessageNode.__table__
+        condition = ConditionNode.__table__
+
+        # Edge followed by every condition node, the last message node before it decides
+        is_message = node.c.discriminator == "messagenode"
+        message_status = func.array_agg(aggregate_order_by(message.c.status, edge.c.id.desc())).filter(is_message)
+        decision = (
+            select(
+                condition.c.id.label("node_id"),
+                case(
+                    (func.coalesce(message_status[1] == condition.c.status_condition, False),
+                     literal(EdgeType.YES, edge.c.edge_type.type)),
+                    else_=literal(EdgeType.NO, edge.c.edge_type.type)
+                ).label("edge_type"),
+                case(
+                    (func.count(edge.c.id) == 0,
+                     func.format("Condition node (ID: %s) has no predecessor", condition.c.id)),
+                    (func.count(edge.c.id).filter(node.c.discriminator.not_in(("messagenode", "conditionnode"))) > 0,
+                     func.format("Condition node (ID: %s) should have Message node before it", condition.c.id)),
+                ).label("error"),
+            )
+            .select_from(condition)
+            .outerjoin(edge, edge.c.end_node_id == condition.c.id)
+            .outerjoin(node, node.c.id == edge.c.start_node_id)
+            .outerjoin(message, message.c.id == node.c.id)
+            .where(condition.c.workflow_id == workflow_id)
+            .group_by(condition.c.id)
+            .cte("decision")
+        )
+
+        walk = select(
+            literal(start_node).label("node_id"),
+            array([literal(start_node)]).label("path"),
+            literal(1).label("depth"),
+        ).cte("walk", recursive=True)
+
+        step = (
+            select(
+                edge.c.end_node_id.label("node_id"),
+                walk.c.path.op("||", return_type=ARRAY(Integer))(edge.c.end_node_id).label("path"),
+                (walk.c.depth + 1).label("depth"),
+                func.row_number().over(partition_by=edge.c.end_node_id, order_by=walk.c.path).label("rank"),
+            )
+            .select_from(walk)
+            .join(edge, and_(edge.c.start_node_id == walk.c.node_id, edge.c.workflow_id == workflow_id))
+            .outerjoin(decision, decision.c.node_id == walk.c.node_id)
+            .where(
+                walk.c.node_id != end_node,
+                edge.c.end_node_id != all_(walk.c.path),
+                or_(
+                    decision.c.node_id.is_(None),
+                    and_(decision.c.error.is_(None), edge.c.edge_type == decision.c.edge_type)
+                )
+            )
+            .subquery()
+        )
+        walk = walk.union_all(select(step.c.node_id, step.c.path, step.c.depth).where(step.c.rank == 1))
+
+        reached_end = walk.c.node_id == end_node
+        return (
+            select(walk.c.node_id, walk.c.path, decision.c.error)
+            .select_from(walk)
+            .outerjoin(decision, decision.c.node_id == walk.c.node_id)
+            .where(or_(reached_end, decision.c.error.is_not(None)))
+            .order_by(walk.c.depth, reached_end.desc())
+            .limit(1)
+        )
+
+    async def _build_path_in_database(self, workflow_id: int, start_node: int = None, end_node: int = None):
+        """
+        Finds the path of the workflow inside the database, without loading the workflow.
+
+        Args:
+            workflow_id: The ID of the workflow.
+            start_node: The ID of the node the path begins with, the start node by default.
+            end_node: The ID of the node the path ends with, the end node by default.
+
+        Returns:
+            List: A list of node IDs representing the path.
+
+        Raises:
+            HTTPException: If the workflow or the nodes are not found, the workflow has sub-flow nodes,
+                or no path is found.
+        """
+        result = await self._session.execute(
+            select(self._model.subflow_node_count).where(self._model.id == workflow_id)
+        )
+        subflow_node_count = result.scalar_one_or_none()
+        if subflow_node_count is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workflow not found")
+        if subflow_node_count:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="The SQL engine doesn't evaluate sub-flows")
+
+        for node_id in (start_node, end_node):
+            if node_id is not None:
+                await self._validate_workflow_node(workflow_id=workflow_id, node_id=node_id)
+        if start_node is None or end_node is None:
+            query = select(
+                select(func.min(StartNode.id)).where(StartNode.workflow_id == workflow_id).scalar_subquery(),
+                select(func.min(EndNode.id)).where(EndNode.workflow_id == workflow_id).scalar_subquery(),
+            )
+            default_start_node, default_end_node = (await self._session.execute(query)).one()
+            if default_start_node is None:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No start node in workflow")
+            if default_end_node is None:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No end node in workflow")
+            start_node = default_start_node if start_node is None else start_node
+            end_node = default_end_node if end_node is None else end_node
 
-        path = self._build_condition_based_path(graph=graph)
+        result = await self._session.execute(
+            self.construct_path_stmt(workflow_id=workflow_id, start_node=start_node, end_node=end_node)
+        )
+        row = result.one_or_none()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No path found between start and end nodes")
+        if row.node_id != end_node:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=row.error)
+        return row.path
+
+    async def _validate_workflow_node(self, workflow_id: int, node_id: int):
+        """
+        Checks that the node belongs to the workflow, without loading the workflow.
+
+        Raises:
+            HTTPException: If the node is not in the workflow.
+        """
+        any_node = with_polymorphic(NodeInterface, "*")
+        node = (await self._session.execute(select(any_node).where(any_node.id == node_id))).scalar_one_or_none()
+        if node is None or node.workflow_id != workflow_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"Node (ID: {node_id}) not found in workflow")
+
+    async def _choose_path_engine(self, workflow_id: int) -> PathEngine:
+        """
+        Picks the SQL engine for workflows larger than the threshold whose current version is not compiled yet.
+        Workflows with sub-flow nodes always use the Python engine.
 
-        return graph, path
+        Raises:
+            HTTPException: If the workflow is not found.
+        """
+        counters = [getattr(self._model, name) for name in NODE_COUNTERS.values()]
+        query = select(
+            self._model.version, sum(counters[1:], counters[0]), self._model.subflow_node_count
+        ).where(self._model.id == workflow_id)
+        row = (await self._session.execute(query)).one_or_none()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workflow not found")
+        version, size, subflow_node_count = row
+        if subflow_node_count:
+            return PathEngine.PYTHON
+        if size > settings.sql_path_engine_threshold and not compiled_workflows.get(workflow_id, version):
+            return PathEngine.SQL
+        return PathEngine.PYTHON
+
+    async def get_decision_table(self, workflow_id: int) -> Tuple[int, DecisionTable]:
+        """
+        Returns the decision table of the workflow's current version, compiled on first use.
+        The conditions of the sub-flows inlined in the paths are decided like the workflow's own.
+
+        Returns:
+            Tuple[int, DecisionTable]: The version the table was compiled for, and the table.
+
+        Raises:
+            HTTPException: If the workflow is not found or has too many outcomes.
+        """
+        compiled = await self.get_compiled(workflow_id=workflow_id)
+        subflows = await self._resolve_subflows(compiled=compiled)
+        key = self._subflow_versions(subflows)
+        if key not in compiled.decision_tables:
+            compiled.decision_tables[key] = await run_graph_task(
+                compiled.graph.number_of_nodes(),
+                self._compile_decision_table,
+                compiled=compiled,
+                subflows=subflows
+            )
+        return compiled.version, compiled.decision_tables[key]
+
+    @staticmethod
+    def _compile_decision_table(compiled: CompiledWorkflow, subflows: dict = None) -> DecisionTable:
+        """
+        Compiles the decision table of the version, or relabels the one compiled for another version
+        with the same structure. Tables of workflows with sub-flows aren't shared, like their paths.
+        """
+        def compile_table():
+            return DecisionTable.compile(
+                graph=compiled.graph,
+                evaluate=lambda graph, decide: WorkFlowRepository._build_condition_based_path(
+                    graph=graph, decide=decide, subflows=subflows
+                ),
+                subgraphs=[subflow.graph for subflow in (subflows or {}).values()]
+            )
+
+        if compiled.structure is None or compiled.subflow_ids():
+            return compile_table()
+        try:
+            start_node, end_node = WorkFlowRepository._get_start_and_end_node(graph=compiled.graph)
+        except HTTPException:
+            return compile_table()
+
+        ranks = compiled.ranks()
+        key = (ranks[start_node], ranks[end_node])
+        shared = compiled.structure.decision_tables.get(key)
+        if shared is not None:
+            return shared.relabel(graph=compiled.graph, node_ids=compiled.order)
+        table = compile_table()
+        if table.is_portable:
+            compiled.structure.decision_tables[key] = table.relabel(graph=None, node_ids=ranks)
+        return table
+
+    async def evaluate_decision_table(self, workflow_id: int, statuses: dict):
+        """
+        Finds the path the workflow would take with the given message statuses.
+
+        Args:
+            workflow_id: The ID of the workflow.
+            statuses: Message node IDs mapped to their statuses, the missing ones keep their current status.
+
+        Returns:
+            List: A list of node IDs representing the path from start to end node.
+
+        Raises:
+            HTTPException: If the workflow is not found or no path is found with these statuses.
+        """
+        _, table = await self.get_decision_table(workflow_id=workflow_id)
+        outcome = table.lookup(statuses=statuses)
+        if outcome["path"] is None:
+            raise HTTPException(status_code=outcome["status_code"], detail=outcome["detail"])
+        return outcome["path"]
+
+    async def is_reachable(self, workflow_id: int, from_node_id: int, to_node_id: int) -> bool:
+        """
+        Checks whether any chain of edges leads from one node of the workflow to the other, regardless of conditions.
+
+        Raises:
+            HTTPException: If the workflow or one of the nodes is not found.
+        """
+        compiled = await self.get_compiled(workflow_id=workflow_id)
+        self._validate_graph_node(graph=compiled.graph, node_id=from_node_id)
+        self._validate_graph_node(graph=compiled.graph, node_id=to_node_id)
+        if not compiled.is_indexed:
+            await run_graph_task(compiled.graph.number_of_nodes(), compiled.build_reachability_index)
+        return compiled.is_reachable(from_node_id=from_node_id, to_node_id=to_node_id)
+
+    async def get_header(self, workflow_id: int):
+        """
+        Reads the workflow's own columns without loading its collections.
+
+        Args:
+            workflow_id: The ID of the workflow.
+
+        Returns:
+            RowMapping: The ID and the creation date of the workflow.
+
+        Raises:
+            HTTPException: If the workflow is not found.
+        """
+        query = select(self._model.id, self._model.created_at).where(self._model.id == workflow_id)
+        result = await self._session.execute(query)
+        header = result.mappings().one_or_none()
+        if not header:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workflow not found")
+        return header
+
+    async def get_document(self, workflow_id: int) -> dict:
+        """
+        Reads the workflow and its collections as plain mappings of the WorkflowGet shape,
+        without building ORM objects.
+
+        Args:
+            workflow_id: The ID of the workflow.
+
+        Returns:
+            dict: The workflow document.
+
+        Raises:
+            HTTPException: If the workflow is not found.
+        """
+        document = dict(await self.get_header(workflow_id=workflow_id))
+        for name, model in STREAMED_COLLECTIONS:
+            table = model.__table__
+            result = await self._session.execute(select(table).where(table.c.workflow_id == workflow_id))
+            document[name] = [dict(row) for row in result.mappings()]
+        return document
+
+    @staticmethod
+    def construct_neighbourhood_stmt(workflow_id: int, node_id: int, hops: int,
+                                     direction: NeighbourhoodDirection) -> Select:
+        """
+        Builds the recursive query collecting the IDs of the nodes within the given number of hops of a node.
+        Every hop is an index lookup on the edge endpoints.
+
+        Args:
+            workflow_id: The ID of the workflow.
+            node_id: The ID of the node in the centre.
+            hops: The maximum number of edges between the centre and a collected node.
+            direction: The edges followed from the centre.
+
+        Returns:
+            Select: The query returning the node IDs.
+        """
+        edge = Edge.__table__
+        hood = select(literal(node_id).label("node_id"), literal(0).label("depth")).cte("hood", recursive=True)
+
+        if direction == NeighbourhoodDirection.OUT:
+            joined, neighbour = edge.c.start_node_id == hood.c.node_id, edge.c.end_node_id
+        elif direction == NeighbourhoodDirection.IN:
+            joined, neighbour = edge.c.end_node_id == hood.c.node_id, edge.c.start_node_id
+        else:
+            joined = or_(edge.c.start_node_id == hood.c.node_id, edge.c.end_node_id == hood.c.node_id)
+            neighbour = case((edge.c.start_node_id == hood.c.node_id, edge.c.end_node_id), else_=edge.c.start_node_id)
+
+        hood = hood.union(
+            select(neighbour, hood.c.depth + 1)
+            .select_from(hood)
+            .join(edge, and_(joined, edge.c.workflow_id == workflow_id))
+            .where(hood.c.depth < hops)
+        )
+        return select(hood.c.node_id).distinct()
+
+    async def get_neighbourhood(self, workflow_id: int, node_id: int, hops: int,
+                                direction: NeighbourhoodDirection) -> dict:
+        """
+        Reads the nodes within the given number of hops of a node and the edges between them,
+        as plain mappings of the WorkflowGet collections.
+
+        Args:
+            workflow_id: The ID of the workflow.
+            node_id: The ID of the node in the centre.
+            hops: The maximum number of edges between the centre and a returned node.
+            direction: The edges followed from the centre.
+
+        Returns:
+            dict: The neighbourhood document.
+
+        Raises:
+            HTTPException: If the workflow or the node is not found.
+        """
+        await self.get_header(workflow_id=workflow_id)
+        await self._validate_workflow_node(workflow_id=workflow_id, node_id=node_id)
+
+        query = self.construct_neighbourhood_stmt(
+            workflow_id=workflow_id,
+            node_id=node_id,
+            hops=hops,
+            direction=direction
+        )
+        node_ids = list((await self._session.execute(query)).scalars())
+
+        document = {"workflow_id": workflow_id, "node_id": node_id, "hops": hops, "direction": direction.value}
+        for name, model in STREAMED_COLLECTIONS:
+            table = model.__table__
+            if model is Edge:
+                where = and_(table.c.start_node_id == func.any(node_ids), table.c.end_node_id == func.any(node_ids))
+            else:
+                where = table.c.id == func.any(node_ids)
+            result = await self._session.execute(select(table).where(where).order_by(table.c.id))
+            document[name] = [dict(row) for row in result.mappings()]
+        return document
+
+    async def get_snapshot(self, workflow_id: int) -> bytes:
+        """
+        Packs the workflow into the binary snapshot format.
+
+        Args:
+            workflow_id: The ID of the workflow.
+
+        Returns:
+            bytes: The snapshot.
+
+        Raises:
+            HTTPException: If the workflow is not found.
+        """
+        header = await self.get_header(workflow_id=workflow_id)
+        node_table = NodeInterface.__table__
+        nodes = []
+        for _, model in STREAMED_COLLECTIONS:
+            if model is Edge:
+                continue
+            table = model.__table__
+            query = (
+                select(table, node_table.c.discriminator, node_table.c.topo_index)
+                .join(node_table, node_table.c.id == table.c.id)
+                .where(table.c.workflow_id == workflow_id)
+            )
+            nodes += [dict(row) for row in (await self._session.execute(query)).mappings()]
+
+        edge_table = Edge.__table__
+        result = await self._session.execute(select(edge_table).where(edge_table.c.workflow_id == workflow_id))
+        edges = [dict(row) for row in result.mappings()]
+        return await run_graph_task(len(nodes), pack_snapshot, workflow=dict(header), nodes=nodes, edges=edges)
+
+    async def import_snapshot(self, data: bytes) -> dict:
+        """
+        Creates a new workflow from a snapshot, with new IDs for the workflow, its nodes and edges.
+        Nodes are inserted in their topological order, so their topo_index keeps it.
+
+        Args:
+            data: The snapshot.
+
+        Returns:
+            dict: The ID and the creation time of the new workflow.
+
+        Raises:
+            HTTPException: If the snapshot is invalid or uses a sub-flow workflow that doesn't exist.
+        """
+        snapshot = await run_graph_task(len(data) // 64, WorkflowSnapshot, data)
+        subflow_ids = {subflow_id for subflow_id in snapshot.arrays["subflow_ids"] if subflow_id >= 0}
+        if subflow_ids:
+            result = await self._session.execute(select(self._model.id).where(self._model.id.in_(subflow_ids)))
+            missing = subflow_ids - set(result.scalars().all())
+            if missing:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail=f"Invalid snapshot: sub-flow workflow (ID: {min(missing)}) not found")
+        workflow = (await self._session.execute(
+            insert(self._model).returning(self._model.id, self._model.created_at)
+        )).mappings().one()
+        workflow_id = workflow["id"]
+
+        order = sorted(range(snapshot.node_count), key=lambda i: snapshot.arrays["topo_ranks"][i])
+        nodes = [snapshot.node(i) for i in order]
+        new_ids = {}
+        if nodes:
+            stmt = insert(NodeInterface.__table__).returning(NodeInterface.__table__.c.id, sort_by_parameter_order=True)
+            result = await self._session.execute(stmt, [{"discriminator": node["discriminator"]} for node in nodes])
+            new_ids = dict(zip(order, result.scalars().all()))
+
+        deltas = Counter()
+        models = {"startnode": StartNode, "messagenode": MessageNode, "conditionnode": ConditionNode, "endnode": EndNode,
+                  "subflownode": SubflowNode}
+        for node_type, model in models.items():
+            rows = [
+                {**{key: value for key, value in node.items() if key != "discriminator"},
+                 "id": new_ids[i], "workflow_id": workflow_id}
+                for i, node in zip(order, nodes) if node["discriminator"] == node_type
+            ]
+            if rows:
+                try:
+                    await self._session.execute(insert(model.__table__), rows)
+                except IntegrityError:
+                    await self._session.rollback()
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                        detail="Invalid snapshot: sub-flow workflow not found")
+        for node in nodes:
+            deltas.update(node_counter_deltas(node["discriminator"], node.get("status") or node.get("status_condition")))
+
+        edges = [snapshot.edge(i) for i in range(snapshot.edge_count)]
+        if edges:
+            await self._session.execute(insert(Edge.__table__), [
+                {"start_node_id": new_ids[edge["start"]], "end_node_id": new_ids[edge["end"]],
+                 "workflow_id": workflow_id, "edge_type": edge["edge_type"]}
+                for edge in edges
+            ])
+        for edge in edges:
+            deltas.update(edge_counter_deltas(
+                edge_type=edge["edge_type"],
+                out_discriminator=snapshot.node(edge["start"])["discriminator"],
+                in_discriminator=snapshot.node(edge["end"])["discriminator"]
+            ))
+
+        await self.commit_change(workflow_id=workflow_id, **deltas)
+        return dict(workflow)
+
+    @staticmethod
+    def construct_clone_stmt(workflow_id: int, clone_id: int) -> Insert:
+        """
+        Builds the single statement copying the nodes and edges of a workflow into another one.
+        The mapping CTE draws the new node IDs and topological indexes from their sequences in the original
+        topological order, the inserts into the node tables and the edges are joined to it.
+
+        Args:
+            workflow_id: The ID of the copied workflow.
+            clone_id: The ID of the workflow receiving the copy.
+
+        Returns:
+            Insert: The statement inserting the edges, with the node inserts attached as CTEs.
+        """
+        node_table = NodeInterface.__table__
+        node_ids = union_all(*(
+            select(model.__table__.c.id).where(model.__table__.c.workflow_id == workflow_id)
+            for _, model in STREAMED_COLLECTIONS if model is not Edge
+        )).subquery()
+        ordered = (
+            select(node_table.c.id, node_table.c.discriminator)
+            .where(node_table.c.id.in_(select(node_ids.c.id)))
+            .order_by(node_table.c.topo_index)
+            .subquery()
+        )
+        mapping = select(
+            ordered.c.id.label("old_id"),
+            node_id_seq.next_value().label("new_id"),
+            topo_index_seq.next_value().label("topo_index"),
+            ordered.c.discriminator,
+        ).cte("mapping").prefix_with("MATERIALIZED")
+
+        ctes = [
+            insert(node_table)
+            .from_select(["id", "topo_index", "discriminator"],
+                         select(mapping.c.new_id, mapping.c.topo_index, mapping.c.discriminator))
+            .cte("nodeinterface_clone")
+        ]
+        for _, model in STREAMED_COLLECTIONS:
+            if model is Edge:
+                continue
+            table = model.__table__
+            columns = [column.name for column in table.c if column.name not in ("id", "workflow_id")]
+            ctes.append(
+                insert(table)
+                .from_select(
+                    ["id", "workflow_id", *columns],
+                    select(mapping.c.new_id, literal(clone_id), *(table.c[name] for name in columns))
+                    .select_from(table)
+                    .join(mapping, mapping.c.old_id == table.c.id)
+                )
+                .cte(f"{table.name}_clone")
+            )
+
+        edge = Edge.__table__
+        start, end = mapping.alias("start_mapping"), mapping.alias("end_mapping")
+        edges = (
+            select(start.c.new_id, end.c.new_id, literal(clone_id), edge.c.edge_type)
+            .select_from(edge)
+            .join(start, start.c.old_id == edge.c.start_node_id)
+            .join(end, end.c.old_id == edge.c.end_node_id)
+            .where(edge.c.workflow_id == workflow_id)
+            # New edge IDs follow the original ones, so both workflows are walked the same way
+            .order_by(edge.c.id)
+        )
+        return (
+            insert(edge)
+            .from_select(["start_node_id", "end_node_id", "workflow_id", "edge_type"], edges)
+            .add_cte(*ctes)
+        )
+
+    async def clone(self, workflow_id: int) -> dict:
+        """
+        Copies the workflow with its nodes and edges inside the database, no row is loaded.
+
+        Args:
+            workflow_id: The ID of the copied workflow.
+
+        Returns:
+            dict: The ID and the creation time of the copy.
+
+        Raises:
+            HTTPException: If the workflow is not found.
+        """
+        counters = [self._model.__table__.c[name] for name in (*NODE_COUNTERS.values(), *EDGE_COUNTERS.values(),
+                                                               "start_out_edge_count", "end_in_edge_count",
+                                                               "structure_hash")]
+        stmt = (
+            insert(self._model)
+            .from_select([column.name for column in counters],
+                         select(*counters).where(self._model.id == workflow_id))
+            .returning(self._model.id, self._model.created_at)
+        )
+        clone = (await self._session.execute(stmt)).mappings().one_or_none()
+        if not clone:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workflow not found")
+
+        await self._session.execute(self.construct_clone_stmt(workflow_id=workflow_id, clone_id=clone["id"]))
+        await self.commit_change(workflow_id=clone["id"])
+        return dict(clone)
+
+    async def stream_json(self, header, chunk_size: int) -> AsyncIterator[bytes]:
+        """
+        Streams the workflow as a JSON document of the WorkflowGet shape.
+        Rows are read from server-side cursors, so memory is bounded by the chunk size
+        regardless of the workflow size.
+
+        Args:
+            header: The workflow's own columns, as returned by get_header.
+            chunk_size: Number of rows fetched and emitted at once.
+
+        Yields:
+            bytes: Consecutive parts of the JSON document.
+        """
+        yield json.dumps(dict(header), default=_json_default)[:-1].encode()
+
+        for name, model in STREAMED_COLLECTIONS:
+            yield f', "{name}": ['.encode()
+
+            table = model.__table__
+            query = select(table).where(table.c.workflow_id == header["id"]).order_by(table.c.id)
+            result = await self._session.stream(query.execution_options(yield_per=chunk_size))
+
+            separator = ""
+            async for rows in result.mappings().partitions():
+                chunk = ", ".join(json.dumps(dict(row), default=_json_default) for row in rows)
+                yield f"{separator}{chunk}".encode()
+                separator = ", "
+
+            yield b"]"
+
+        yield b"}"
+
+    async def commit_change(self, workflow_id: int, **deltas: int):
+        """
+        Commits the change of the workflow's nodes or edges made in the session.
+        The same transaction bumps the workflow version, shifts the maintained counters
+        and refreshes the materialised path.
+
+        Args:
+            workflow_id: The ID of the workflow.
+            deltas: Counter names mapped to their deltas.
+        """
+        await self._session.flush()
+
+        values = {name: getattr(self._model, name) + delta for name, delta in deltas.items() if delta}
+        if "structure_hash" in values:
+            # Negative deltas are shifted into the modulus, the sum never exceeds two moduli
+            delta = deltas["structure_hash"] % STRUCTURE_HASH_MODULUS
+            values["structure_hash"] = (self._model.structure_hash + delta) % STRUCTURE_HASH_MODULUS
+        values["version"] = self._model.version + 1
+        values["updated_at"] = datetime.now()
+        stmt = update(self._model).where(self._model.id == workflow_id).values(**values).returning(self._model.version)
+        version = (await self._session.execute(stmt)).scalar_one_or_none()
+        compiled = await self.refresh_path(workflow_id=workflow_id)
+        if version is not None:
+            await self._session.execute(construct_notify_stmt(workflow_id=workflow_id, version=version))
+
+        await self._session.commit()
+        # The version is only cached once it's committed, a rolled back one gets reused. The reachability index
+        # and the shared graph store are left to the first queries needing them, so a write costs its path alone
+        if compiled:
+            await run_graph_task(compiled.graph.number_of_nodes(), self._attach_structure, compiled=compiled)
+            compiled_workflows.put(compiled)
+        if settings.prewarm_enabled:
+            bind = self._session.bind
+            prewarm_debouncer.schedule(workflow_id, lambda: self.prewarm(bind=bind, workflow_id=workflow_id))
+
+    @staticmethod
+    async def prewarm(bind, workflow_id: int):
+        """
+        Computes the path of the workflow's current version and renders its image into the render cache,
+        so the first requests after an edit session find them ready.
+
+        Args:
+            bind: The engine the session of the task is opened on.
+            workflow_id: The ID of the workflow.
+        """
+        async with AsyncSession(bind=bind, expire_on_commit=False) as session:
+            repository = WorkFlowRepository(session=session)
+            try:
+                await repository.submit_path_image_job(workflow_id=workflow_id)
+            except HTTPException:
+                # Deleted workflow, no path, or a full render queue: nothing to prepare
+                pass
+
+    async def refresh_path(self, workflow_id: int):
+        """
+        Recomputes the start to end path of the workflow and stores it in the materialised path table.
+        Only the graph and the path are built, the structure is left to the caller.
+
+        Args:
+            workflow_id: The ID of the workflow.
+
+        Returns:
+            CompiledWorkflow: The workflow's graph with its evaluated path, None if the workflow is not found.
+        """
+        query = self.construct_get_stmt(id=workflow_id).execution_options(populate_existing=True)
+        result = await self._session.execute(query)
+        workflow = result.scalar_one_or_none()
+        if not workflow:
+            return None
+
+        size = len(workflow.start_nodes) + len(workflow.message_nodes) + len(workflow.condition_nodes) + \
+            len(workflow.end_nodes) + len(workflow.subflow_nodes)
+        try:
+            compiled = await run_graph_task(size, self._build_workflow_graph, workflow=workflow)
+            if compiled.subflow_ids():
+                # The path changes with the sub-flows, which don't refresh the workflows using them
+                await self._session.execute(delete(WorkFlowPath).where(WorkFlowPath.workflow_id == workflow_id))
+                return compiled
+            path = await run_graph_task(size, self._evaluate_path, compiled=compiled)
+            values = {"path": path, "status_code": status.HTTP_200_OK, "detail": None}
+        except HTTPException as e:
+            if e.status_code == status.HTTP_504_GATEWAY_TIMEOUT:
+                # Readers compute the path themselves until a later change refreshes it
+                await self._session.execute(delete(WorkFlowPath).where(WorkFlowPath.workflow_id == workflow_id))
+                return None
+            values = {"path": None, "status_code": e.status_code, "detail": e.detail}
+
+        stmt = pg_insert(WorkFlowPath).values(workflow_id=workflow_id, version=workflow.version, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[WorkFlowPath.workflow_id],
+            set_={"version": workflow.version, **values}
+        )
+        await self._session.execute(stmt)
+        return compiled
+
+    async def add_access_counts(self, counts: dict):
+        """
+        Adds the numbers of requests served to the persisted access counters.
+
+        Args:
+            counts: Workflow IDs mapped to the numbers of requests.
+        """
+        table = self._model.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("workflow_id"))
+            .values(access_count=table.c.access_count + bindparam("count"))
+        )
+        await self._session.execute(
+            stmt,
+            [{"workflow_id": workflow_id, "count": count} for workflow_id, count in counts.items()]
+        )
+        await self._session.commit()
+
+    async def warm_up(self, limit: int) -> list:
+        """
+        Compiles the most requested and the most recently changed workflows and evaluates their paths,
+        so the worker starts with warm caches.
+
+        Args:
+            limit: The number of workflows taken from each ranking.
+
+        Returns:
+            list: The IDs of the warmed workflows.
+        """
+        most_requested = select(self._model.id).order_by(self._model.access_count.desc()).limit(limit)
+        most_recent = select(self._model.id).order_by(self._model.updated_at.desc()).limit(limit)
+        workflow_ids = (await self._session.execute(union(most_requested, most_recent))).scalars().all()
+
+        warmed = []
+        for workflow_id in workflow_ids:
+            try:
+                compiled = await self.get_compiled(workflow_id=workflow_id)
+            except HTTPException:
+                # Deleted meanwhile
+                continue
+            try:
+                await run_graph_task(compiled.graph.number_of_nodes(), self._evaluate_path, compiled=compiled,
+                                     subflows=await self._resolve_subflows(compiled=compiled))
+            except HTTPException:
+                # A workflow without a path, its error is memoised as well
+                pass
+            warmed.append(workflow_id)
+        return warmed
+
+    async def get_stats(self, workflow_id: int):
+        """
+        Reads the workflow statistics from the maintained counters.
+
+        Args:
+            workflow_id: The ID of the workflow.
+
+        Returns:
+            dict: Node counts per type, edge counts per type and start/end connectivity.
+
+        Raises:
+            HTTPException: If the workflow is not found.
+        """
+        counters = list(NODE_COUNTERS.values()) + list(EDGE_COUNTERS.values())
+        query = select(
+            self._model.id,
+            *[getattr(self._model, name) for name in counters],
+            self._model.start_out_edge_count,
+            self._model.end_in_edge_count,
+        ).where(self._model.id == workflow_id)
+        result = await self._session.execute(query)
+        row = result.mappings().one_or_none()
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workflow not found")
+
+        return {
+            "id": row["id"],
+            **{name: row[name] for name in counters},
+            "has_start_node": row["start_node_count"] > 0,
+            "has_end_node": row["end_node_count"] > 0,
+            "start_node_connected": row["start_out_edge_count"] > 0,
+            "end_node_connected": row["end_in_edge_count"] > 0,
+        }
+
+    @staticmethod
+    def _render_cached_path_image(graph: nx.DiGraph, path: List, image_format: ImageFormat, width: int, height: int,
+                                  layout=None):
+        """
+        Returns the cached image of the path, rendering and caching it first when no worker has rendered it yet.
+
+        Returns:
+            str: The path of the image file.
+        """
+        key = render_cache.key(graph=graph, path=path, image_format=image_format, width=width, height=height)
+        file = render_cache.get(key=key, image_format=image_format)
+        if file is None:
+            buf = WorkFlowRepository._render_path_image(
+                graph=graph,
+                path=path,
+                image_format=image_format,
+                width=width,
+                height=height,
+                layout=layout
+            )
+            file = render_cache.put(key=key, image_format=image_format, data=buf.getvalue())
+        return file
+
+    async def _coalesce(self, key: tuple, func, **kwargs):
+        """
+        Runs the repository method once for all the concurrent requests with the same key.
+        The shared run opens its own session, so it doesn't depend on the request that started it.
+
+        Args:
+            key: The workflow ID, its version, the endpoint and the request parameters.
+            func: The repository method.
+            kwargs: Keyword arguments of the method.
+
+        Returns:
+            The result of the method.
+        """
+        bind = self._session.bind
+
+        async def run():
+            async with AsyncSession(bind=bind, expire_on_commit=False) as session:
+                return await func(WorkFlowRepository(session=session), **kwargs)
+
+        return await single_flight.do(key, run)
+
+    async def get_path_image(self, workflow_id: int, image_format: ImageFormat = ImageFormat.PNG,
+                             width: int = 640, height: int = 480):
+        version = await self.get_version(workflow_id=workflow_id)
+        return await self._coalesce(
+            ("path/image", workflow_id, version, image_format, width, height),
+            WorkFlowRepository._get_path_image,
+            workflow_id=workflow_id,
+            image_format=image_format,
+            width=width,
+            height=height
+        )
+
+    async def _get_path_image(self, workflow_id: int, image_format: ImageFormat, width: int, height: int):
+        graph, path, layout = await self._build_graph_and_path(workflow_id=workflow_id)
+        return await run_graph_task(
+            graph.number_of_nodes(),
+            self._render_cached_path_image,
+            graph=graph,
+            path=path,
+            layout=layout,
+            image_format=image_format,
+            width=width,
+            height=height
+        )
+
+    async def submit_path_image_job(self, workflow_id: int, image_format: ImageFormat = ImageFormat.PNG,
+                                    width: int = 640, height: int = 480) -> RenderJob:
+        """
+        Queues the rendering of the path image in the render job pool.
+        Only the graph and the path are read in the request, so no connection is held while the image is drawn.
+
+        Args:
+            workflow_id: The ID of the workflow.
+            image_format: The format of the image.
+            width: The width of the image in pixels.
+            height: The height of the image in pixels.
+
+        Returns:
+            RenderJob: The job rendering the image.
+
+        Raises:
+            HTTPException: If the workflow is not found, has no path, or the queue is full.
+        """
+        graph, path, layout = await self._build_graph_and_path(workflow_id=workflow_id)
+        options = {"image_format": image_format, "width": width, "height": height}
+        return render_jobs.submit(
+            workflow_id=workflow_id,
+            key=render_cache.key(graph=graph, path=path, **options),
+            image_format=image_format,
+            render=lambda: self._render_cached_path_image(graph=graph, path=path, layout=layout, **options)
+        )
+
+    @staticmethod
+    def get_path_image_job(workflow_id: int, job_id: str) -> RenderJob:
+        """
+        Raises:
+            HTTPException: If the job is not found in the workflow.
+        """
+        job = render_jobs.get(job_id=job_id)
+        if job is None or job.workflow_id != workflow_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+        return job
+
+    @staticmethod
+    def get_path_image_job_result(workflow_id: int, job_id: str) -> RenderJob:
+        """
+        Finds the done job whose image is still in the render cache, and marks the image as recently used.
+
+        Raises:
+            HTTPException: If the job is not found in the workflow, is not done, or its image was evicted.
+        """
+        job = WorkFlowRepository.get_path_image_job(workflow_id=workflow_id, job_id=job_id)
+        if job.status != JobStatus.DONE:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job is {job.status.value}")
+        try:
+            os.utime(job.file)
+        except FileNotFoundError:
+            raise HTTPException(status_code=status.HTTP_410_GONE,
+                                detail="Rendered image was evicted, submit the job again")
+        return job
+
+    async def get_path(self, workflow_id: int, start_node: int = None, end_node: int = None,
+                       engine: PathEngine = PathEngine.AUTO):
+        if engine == PathEngine.AUTO and start_node is None and end_node is None:
+            result = await self._session.execute(select(WorkFlowPath).where(WorkFlowPath.workflow_id == workflow_id))
+            materialised = result.scalar_one_or_none()
+            if materialised:
+                if materialised.path is None:
+                    raise HTTPException(status_code=materialised.status_code, detail=materialised.detail)
+                return materialised.path
+
+        if engine == PathEngine.AUTO:
+            engine = await self._choose_path_engine(workflow_id=workflow_id)
+        version = await self.get_version(workflow_id=workflow_id)
+        return await self._coalesce(
+            ("path", workflow_id, version, start_node, end_node, engine),
+            WorkFlowRepository._find_path,
+            workflow_id=workflow_id,
+            start_node=start_node,
+            end_node=end_node,
+            engine=engine
+        )
 
-    async def get_path_image(self, workflow_id: int):
-        graph, path = await self._build_graph_and_path(workflow_id=workflow_id)
-        return self._save_graph_image(graph=graph, path=path)
+    async def _find_path(self, workflow_id: int, start_node: int, end_node: int, engine: PathEngine):
+        if engine == PathEngine.SQL:
+            return await self._build_path_in_database(workflow_id=workflow_id, start_node=start_node, end_node=end_node)
 
-    async def get_path(self, workflow_id: int):
-        _,  path = await self._build_graph_and_path(workflow_id=workflow_id)
+        _, path, _ = await self._build_graph_and_path(workflow_id=workflow_id, start_node=start_node, end_node=end_node)
         return path
     
\ No newline at end of file
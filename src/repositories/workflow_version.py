@@ -0,0 +1,404 @@
+from fastapi import HTTPException, status
+from typing import AsyncIterator
+
+from sqlalchemy import Select, select, insert, func, literal, union_all, and_, case, cast, Integer, BigInteger, \
+    Text, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models import WorkFlow, WorkFlowVersion, WorkFlowVersionElement, NodeInterface, Edge, EdgeType
+from src.repositories.repository_base import BaseRepository
+from src.repositories.workflow import STREAMED_COLLECTIONS
+
+COLLECTION_TABLES = {name: model.__table__ for name, model in STREAMED_COLLECTIONS}
+
+# Columns of a node that don't count as a change when two nodes are compared
+UNCOMPARED_COLUMNS = ("id", "topo_index")
+
+
+def _decode_element(collection: str, data: dict, workflow_id: int) -> dict:
+    """
+    Turns the stored columns of an element back into the row of its collection, leaving out the topological
+    position of a node. Enum columns are stored by their names, as the database stores them.
+    """
+    row = {"workflow_id": workflow_id}
+    for name, value in data.items():
+        column = COLLECTION_TABLES[collection].c.get(name)
+        if column is None:
+            continue
+        if isinstance(column.type, SQLEnum) and column.type.enum_class is not None:
+            value = column.type.enum_class[value]
+        row[name] = value
+    return row
+
+
+def _parse_operand(operand: str) -> tuple:
+    """
+    Parses a diff operand: a workflow ID for its current state, or a workflow ID and a version number
+    separated by a colon for a saved version.
+
+    Returns:
+        tuple: The workflow ID and the version number, None for the current state.
+
+    Raises:
+        HTTPException: If the operand is malformed.
+    """
+    workflow_id, _, number = operand.partition(":")
+    try:
+        return int(workflow_id), int(number) if number else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Invalid diff operand {operand!r}, expected <workflow ID>[:<version number>]")
+
+
+async def _merge(a: AsyncIterator, b: AsyncIterator, key) -> AsyncIterator[tuple]:
+    """
+    Walks two streams sorted by the key in one pass, pairing the rows with equal keys.
+
+    Yields:
+        tuple: The row of each stream, None for the stream without a row of that key.
+    """
+    row_a, row_b = await anext(a, None), await anext(b, None)
+    while row_a is not None or row_b is not None:
+        if row_b is None or row_a is not None and key(row_a) < key(row_b):
+            yield row_a, None
+            row_a = await anext(a, None)
+        elif row_a is None or key(row_b) < key(row_a):
+            yield None, row_b
+            row_b = await anext(b, None)
+        else:
+            yield row_a, row_b
+            row_a, row_b = await anext(a, None), await anext(b, None)
+
+
+class WorkflowVersionRepository(BaseRepository):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session=session, model=WorkFlowVersion)
+
+    @staticmethod
+    def construct_state_stmt(workflow_id: int) -> Select:
+        """
+        Builds the query listing the current nodes and edges of the workflow as (collection, element_id, data) rows,
+        data holding the columns of the element except its workflow, and the topological position of a node.
+        """
+        node_table = NodeInterface.__table__
+        selects = []
+        for name, table in COLLECTION_TABLES.items():
+            columns = [column for column in table.c if column.name != "workflow_id"]
+            if table is not Edge.__table__:
+                columns.append(node_table.c.topo_index)
+            data = func.jsonb_build_object(
+                *[part for column in columns for part in (literal(column.name), column)], type_=JSONB
+            )
+            query = (
+                select(literal(name).label("collection"), table.c.id.label("element_id"), data.label("data"))
+                .where(table.c.workflow_id == workflow_id)
+            )
+            if table is not Edge.__table__:
+                query = query.join(node_table, node_table.c.id == table.c.id)
+            selects.append(query)
+        return union_all(*selects)
+
+    def construct_reconstruct_stmt(self, workflow_id: int, checkpoint: int, number: int) -> Select:
+        """
+        Builds the query reconstructing a saved version from the checkpoint it follows: every element is taken
+        from the latest version of the chain storing it, and left out if that version removed it.
+
+        Args:
+            workflow_id: The ID of the workflow.
+            checkpoint: The number of the checkpoint the version follows, the version itself if it's one.
+            number: The number of the version.
+        """
+        element = WorkFlowVersionElement.__table__
+        version = self._model.__table__
+        latest = (
+            select(element.c.collection, element.c.element_id, element.c.data)
+            .join(version, version.c.id == element.c.version_id)
+            .where(version.c.workflow_id == workflow_id, version.c.number.between(checkpoint, number))
+            .order_by(element.c.collection, element.c.element_id, version.c.number.desc())
+            .distinct(element.c.collection, element.c.element_id)
+            .subquery("latest")
+        )
+        return select(latest).where(latest.c.data.is_not(None)).order_by(latest.c.collection, latest.c.element_id)
+
+    def construct_delta_stmt(self, workflow_id: int, parent_number: int) -> Select:
+        """
+        Builds the query listing the elements the current state of the workflow changed since the parent version:
+        added and changed elements with their new columns, removed ones with no columns.
+        """
+        current = self.construct_state_stmt(workflow_id=workflow_id).subquery("current")
+        checkpoint = self.construct_checkpoint_stmt(workflow_id=workflow_id, number=parent_number).scalar_subquery()
+        parent = self.construct_reconstruct_stmt(
+            workflow_id=workflow_id, checkpoint=checkpoint, number=parent_number
+        ).subquery("parent")
+        return (
+            select(
+                func.coalesce(current.c.collection, parent.c.collection).label("collection"),
+                func.coalesce(current.c.element_id, parent.c.element_id).label("element_id"),
+                current.c.data,
+            )
+            .select_from(current)
+            .outerjoin(
+                parent,
+                and_(current.c.collection == parent.c.collection, current.c.element_id == parent.c.element_id),
+                full=True
+            )
+            .where(current.c.data.is_distinct_from(parent.c.data))
+        )
+
+    def construct_checkpoint_stmt(self, workflow_id: int, number: int) -> Select:
+        """
+        Builds the query finding the number of the checkpoint the version follows.
+        """
+        return select(func.max(self._model.number)).where(
+            self._model.workflow_id == workflow_id,
+            self._model.number <= number,
+            self._model.is_checkpoint
+        )
+
+    async def add(self, workflow_id: int) -> WorkFlowVersion:
+        """
+        Saves the current state of the workflow as its next version. Every few versions a checkpoint stores
+        all the nodes and edges, the others only the ones changed since their parent version,
+        so a version is reconstructed from at most that many versions.
+
+        Args:
+            workflow_id: The ID of the workflow.
+
+        Returns:
+            WorkFlowVersion: The saved version.
+
+        Raises:
+            HTTPException: If the workflow is not found.
+        """
+        # Locking the workflow serializes the saved versions and keeps the workflow unchanged while it's read
+        query = select(WorkFlow.version).where(WorkFlow.id == workflow_id).with_for_update()
+        workflow_version = (await self._session.execute(query)).scalar_one_or_none()
+        if workflow_version is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workflow not found")
+
+        query = select(func.max(self._model.number)).where(self._model.workflow_id == workflow_id)
+        parent_number = (await self._session.execute(query)).scalar_one_or_none()
+        number = 1 if parent_number is None else parent_number + 1
+        version = self._model(
+            workflow_id=workflow_id,
+            number=number,
+            parent_number=parent_number,
+            is_checkpoint=(number - 1) % settings.version_checkpoint_interval == 0,
+            workflow_version=workflow_version
+        )
+        self._session.add(version)
+        await self._session.flush()
+
+        if version.is_checkpoint:
+            elements = self.construct_state_stmt(workflow_id=workflow_id).subquery("elements")
+        else:
+            elements = self.construct_delta_stmt(workflow_id=workflow_id, parent_number=parent_number).subquery("elements")
+        await self._session.execute(
+            insert(WorkFlowVersionElement).from_select(
+                ["version_id", "collection", "element_id", "data"],
+                select(literal(version.id), elements.c.collection, elements.c.element_id, elements.c.data)
+            )
+        )
+        await self._session.commit()
+        return version
+
+    async def get_version(self, workflow_id: int, number: int) -> WorkFlowVersion:
+        """
+        Raises:
+            HTTPException: If the version is not found.
+        """
+        query = select(self._model).where(self._model.workflow_id == workflow_id, self._model.number == number)
+        version = (await self._session.execute(query)).scalar_one_or_none()
+        if not version:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workflow version not found")
+        return version
+
+    async def get_document(self, workflow_id: int, number: int) -> dict:
+        """
+        Reconstructs the saved version as plain mappings of the WorkflowVersionGet shape.
+
+        Args:
+            workflow_id: The ID of the workflow.
+            number: The number of the version.
+
+        Returns:
+            dict: The version document.
+
+        Raises:
+            HTTPException: If the version is not found.
+        """
+        version = await self.get_version(workflow_id=workflow_id, number=number)
+        checkpoint = (await self._session.execute(
+            self.construct_checkpoint_stmt(workflow_id=workflow_id, number=number)
+        )).scalar_one()
+
+        document = {column.name: getattr(version, column.name) for column in self._model.__table__.c}
+        document.update({name: [] for name in COLLECTION_TABLES})
+        result = await self._session.execute(
+            self.construct_reconstruct_stmt(workflow_id=workflow_id, checkpoint=checkpoint, number=number)
+        )
+        for row in result:
+            document[row.collection].append(_decode_element(row.collection, row.data, workflow_id))
+        return document
+
+    async def construct_elements_stmt(self, workflow_id: int, number: int = None) -> Select:
+        """
+        Builds the query listing the elements of the current state of the workflow, or of a saved version.
+
+        Raises:
+            HTTPException: If the workflow or the version is not found.
+        """
+        if number is None:
+            result = await self._session.execute(select(WorkFlow.id).where(WorkFlow.id == workflow_id))
+            if result.scalar_one_or_none() is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workflow not found")
+            return self.construct_state_stmt(workflow_id=workflow_id)
+
+        await self.get_version(workflow_id=workflow_id, number=number)
+        checkpoint = (await self._session.execute(
+            self.construct_checkpoint_stmt(workflow_id=workflow_id, number=number)
+        )).scalar_one()
+        return self.construct_reconstruct_stmt(workflow_id=workflow_id, checkpoint=checkpoint, number=number)
+
+    @staticmethod
+    def construct_diff_stmts(elements: Select, by_id: bool) -> tuple:
+        """
+        Builds the queries streaming the nodes and the edges sorted by their structural identity.
+        A node is identified by its ID, or when different workflows are compared, by its signature (its collection,
+        status or condition value and sub-flow, as in the structure hash) and its occurrence among the nodes
+        of the same signature in the topological order. Matching survives the nodes of other signatures being
+        added or removed, a node whose signature changed counts as removed and added.
+        An edge is identified by the identities of its nodes and its type.
+
+        Args:
+            elements: The query listing the elements.
+            by_id: Whether nodes are identified by their IDs.
+
+        Returns:
+            tuple: The node query and the edge query.
+        """
+        elements = elements.cte("elements")
+        signature = func.coalesce(
+            elements.c.data["status"].astext,
+            elements.c.data["status_condition"].astext,
+            elements.c.data["subflow_id"].astext,
+            ""
+        )
+        nodes = (
+            select(
+                elements.c.collection,
+                elements.c.element_id,
+                elements.c.data,
+                case({name: i for i, name in enumerate(COLLECTION_TABLES)}, value=elements.c.collection).label("ordinal"),
+                signature.label("signature"),
+                func.row_number().over(
+                    partition_by=(elements.c.collection, signature),
+                    order_by=(elements.c.data["topo_index"].astext.cast(BigInteger), elements.c.element_id)
+                ).label("occurrence"),
+            )
+            .where(elements.c.collection != "edges")
+            .cte("nodes")
+        )
+
+        def identity(node):
+            if by_id:
+                return node.c.element_id
+            # Compared in code point order, as the merge compares them
+            return func.concat_ws(
+                ":", node.c.ordinal, node.c.signature, func.lpad(cast(node.c.occurrence, Text), 10, "0")
+            ).collate("C")
+
+        node_identity = identity(nodes)
+        node_stmt = (
+            select(node_identity.label("identity"), nodes.c.ordinal, nodes.c.collection, nodes.c.data)
+            .order_by(node_identity, nodes.c.ordinal)
+        )
+
+        edges = select(elements.c.data).where(elements.c.collection == "edges").subquery("edges")
+        start_node, end_node = nodes.alias("start_node"), nodes.alias("end_node")
+        start_identity, end_identity = identity(start_node), identity(end_node)
+        edge_type = case({edge_type.name: i for i, edge_type in enumerate(EdgeType)},
+                         value=edges.c.data["edge_type"].astext)
+        edge_stmt = (
+            select(
+                start_identity.label("start_identity"),
+                end_identity.label("end_identity"),
+                edge_type.label("edge_type"),
+                edges.c.data,
+            )
+            .join(start_node, start_node.c.element_id == edges.c.data["start_node_id"].astext.cast(Integer))
+            .join(end_node, end_node.c.element_id == edges.c.data["end_node_id"].astext.cast(Integer))
+            .order_by(start_identity, end_identity, edge_type)
+        )
+        return node_stmt, edge_stmt
+
+    async def _merge_streams(self, a: Select, b: Select, key) -> AsyncIterator[tuple]:
+        chunk_size = settings.stream_chunk_size
+        result_a = await self._session.stream(a.execution_options(yield_per=chunk_size))
+        result_b = await self._session.stream(b.execution_options(yield_per=chunk_size))
+        try:
+            async for pair in _merge(aiter(result_a.mappings()), aiter(result_b.mappings()), key=key):
+                yield pair
+        finally:
+            await result_a.close()
+            await result_b.close()
+
+    async def diff(self, a: str, b: str, edge_fields) -> dict:
+        """
+        Compares two workflows, or versions of workflows, in one merge pass over their nodes and edges
+        streamed in the order of their structural identity, so memory is bounded by the differences
+        rather than by the workflows.
+
+        Args:
+            a: The workflow ID, or the workflow ID and the version number separated by a colon, compared from.
+            b: The workflow ID, or the workflow ID and the version number separated by a colon, compared to.
+            edge_fields: Names of the edge columns listed.
+
+        Returns:
+            dict: The added, removed and changed nodes and the added and removed edges.
+
+        Raises:
+            HTTPException: If an operand is malformed, or a workflow or a version is not found.
+        """
+        (a_workflow_id, a_number), (b_workflow_id, b_number) = _parse_operand(a), _parse_operand(b)
+        by_id = a_workflow_id == b_workflow_id
+        a_nodes, a_edges = self.construct_diff_stmts(
+            await self.construct_elements_stmt(workflow_id=a_workflow_id, number=a_number), by_id=by_id
+        )
+        b_nodes, b_edges = self.construct_diff_stmts(
+            await self.construct_elements_stmt(workflow_id=b_workflow_id, number=b_number), by_id=by_id
+        )
+
+        def node(row, workflow_id):
+            return {"collection": row["collection"], **_decode_element(row["collection"], row["data"], workflow_id)}
+
+        def edge(row, workflow_id):
+            decoded = _decode_element("edges", row["data"], workflow_id)
+            return {name: decoded[name] for name in edge_fields}
+
+        def compared(row):
+            return {name: value for name, value in row["data"].items() if name not in UNCOMPARED_COLUMNS}
+
+        nodes = {"added": [], "removed": [], "changed": []}
+        pairs = self._merge_streams(a_nodes, b_nodes, key=lambda row: (row["identity"], row["ordinal"]))
+        async for before, after in pairs:
+            if after is None:
+                nodes["removed"].append(node(before, a_workflow_id))
+            elif before is None:
+                nodes["added"].append(node(after, b_workflow_id))
+            elif compared(before) != compared(after):
+                nodes["changed"].append({"before": node(before, a_workflow_id), "after": node(after, b_workflow_id)})
+
+        edges = {"added": [], "removed": []}
+        pairs = self._merge_streams(
+            a_edges, b_edges, key=lambda row: (row["start_identity"], row["end_identity"], row["edge_type"])
+        )
+        async for before, after in pairs:
+            if after is None:
+                edges["removed"].append(edge(before, a_workflow_id))
+            elif before is None:
+                edges["added"].append(edge(after, b_workflow_id))
+
+        return {"a": a, "b": b, "nodes": nodes, "edges": edges}
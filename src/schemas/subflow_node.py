@@ -0,0 +1,25 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class SubflowNodeKwargs(BaseModel):
+    workflow_id: Optional[int] = None
+    subflow_id: Optional[int] = None
+    has_out_edge: Optional[bool] = None
+
+
+class SubflowNodeUpdate(BaseModel):
+    subflow_id: Optional[int] = None
+
+
+class SubflowNodeCreate(BaseModel):
+    subflow_id: int
+    workflow_id: int
+
+
+class SubflowNodeRead(BaseModel):
+    id: int
+    subflow_id: int
+    workflow_id: int
+    has_out_edge: bool
@@ -1,12 +1,16 @@
 from datetime import datetime
+from typing import Optional
 
 from pydantic import BaseModel
 
+from src.models import Status
+
 from src.schemas.condition_node import ConditionNodeRead
 from src.schemas.edge import EdgeRead
 from src.schemas.end_node import EndNodeRead
 from src.schemas.message_node import MessageNodeRead
 from src.schemas.start_node import StartNodeRead
+from src.schemas.subflow_node import SubflowNodeRead
 
 
 class WorkflowRead(BaseModel):
@@ -21,4 +25,113 @@ class WorkflowGet(BaseModel):
     message_nodes: list[MessageNodeRead]
     condition_nodes: list[ConditionNodeRead]
     end_nodes: list[EndNodeRead]
+    subflow_nodes: list[SubflowNodeRead]
+    edges: list[EdgeRead]
+
+
+class WorkflowVersionRead(BaseModel):
+    id: int
+    workflow_id: int
+    number: int
+    parent_number: Optional[int]
+    is_checkpoint: bool
+    workflow_version: int
+    created_at: datetime
+
+
+class WorkflowVersionGet(WorkflowVersionRead):
+    start_nodes: list[StartNodeRead]
+    message_nodes: list[MessageNodeRead]
+    condition_nodes: list[ConditionNodeRead]
+    end_nodes: list[EndNodeRead]
+    subflow_nodes: list[SubflowNodeRead]
+    edges: list[EdgeRead]
+
+
+class WorkflowNodeChange(BaseModel):
+    before: dict
+    after: dict
+
+
+class WorkflowNodeDiff(BaseModel):
+    # Nodes with the name of their collection, such as message_nodes
+    added: list[dict]
+    removed: list[dict]
+    changed: list[WorkflowNodeChange]
+
+
+class WorkflowEdgeDiff(BaseModel):
+    added: list[EdgeRead]
+    removed: list[EdgeRead]
+
+
+class WorkflowDiff(BaseModel):
+    a: str
+    b: str
+    nodes: WorkflowNodeDiff
+    edges: WorkflowEdgeDiff
+
+
+class WorkflowNeighbourhood(BaseModel):
+    workflow_id: int
+    node_id: int
+    hops: int
+    direction: str
+    start_nodes: list[StartNodeRead]
+    message_nodes: list[MessageNodeRead]
+    condition_nodes: list[ConditionNodeRead]
+    end_nodes: list[EndNodeRead]
+    subflow_nodes: list[SubflowNodeRead]
     edges: list[EdgeRead]
+
+
+class WorkflowStats(BaseModel):
+    id: int
+    start_node_count: int
+    message_node_count: int
+    condition_node_count: int
+    end_node_count: int
+    subflow_node_count: int
+    default_edge_count: int
+    yes_edge_count: int
+    no_edge_count: int
+    has_start_node: bool
+    has_end_node: bool
+    start_node_connected: bool
+    end_node_connected: bool
+
+
+class WorkflowReachability(BaseModel):
+    from_node_id: int
+    to_node_id: int
+    reachable: bool
+
+
+class DecisionCondition(BaseModel):
+    message_node_id: int
+    status: Status
+    equals: bool
+
+
+class DecisionOutcome(BaseModel):
+    conditions: list[DecisionCondition]
+    path: Optional[list[int]]
+    status_code: int
+    detail: Optional[str]
+
+
+class WorkflowDecisionTable(BaseModel):
+    workflow_id: int
+    version: int
+    message_node_ids: list[int]
+    outcomes: list[DecisionOutcome]
+
+
+class DecisionTableEvaluate(BaseModel):
+    statuses: dict[int, Status] = {}
+
+
+class RenderJobRead(BaseModel):
+    job_id: str
+    status: str
+    detail: Optional[str] = None
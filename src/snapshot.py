@@ -0,0 +1,224 @@
+import struct
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, status
+
+from src.graph.shared_store import NODE_TYPES, STATUSES, EDGE_TYPES
+from src.models import EdgeType
+
+MAGIC = b"WFSN"
+# Version 2 added the sub-flow nodes
+FORMAT_VERSION = 2
+MEDIA_TYPE = "application/vnd.workflow-snapshot"
+# Magic, format version, node count, edge count, string table size, workflow ID, creation time in microseconds,
+# padded to keep the sections 8-byte aligned
+HEADER = struct.Struct("<4sHxxIIIqq4x")
+
+# Bits of the node flags, written for the readers of the format, the import derives them from the edges
+HAS_OUT_EDGE = 1
+HAS_YES_EDGE = 2
+HAS_NO_EDGE = 4
+
+# Sections following the header: name, array typecode, length from the node and edge counts
+SECTIONS = (
+    ("node_ids", "q", lambda n, m: n),
+    ("edge_ids", "q", lambda n, m: m),
+    # Rank of the node in the topological order of the workflow
+    ("topo_ranks", "i", lambda n, m: n),
+    # Messages are the [offset, next offset) ranges of the string table
+    ("message_offsets", "I", lambda n, m: n + 1),
+    # Endpoints of the edges as node positions
+    ("edge_starts", "i", lambda n, m: m),
+    ("edge_ends", "i", lambda n, m: m),
+    ("node_types", "b", lambda n, m: n),
+    ("statuses", "b", lambda n, m: n),
+    ("status_conditions", "b", lambda n, m: n),
+    ("node_flags", "B", lambda n, m: n),
+    ("edge_types", "b", lambda n, m: m),
+    # Workflows referenced by the sub-flow nodes, -1 for other nodes
+    ("subflow_ids", "q", lambda n, m: n),
+)
+# Sections of the snapshots of each format version still read
+SECTIONS_BY_VERSION = {
+    1: SECTIONS[:-1],
+    FORMAT_VERSION: SECTIONS,
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _invalid(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid snapshot: {detail}")
+
+
+def pack_snapshot(workflow: dict, nodes: list, edges: list) -> bytes:
+    """
+    Packs a workflow into the snapshot format.
+
+    Args:
+        workflow: The workflow row, with its ID and creation time.
+        nodes: The node rows with their discriminator and topo_index, in any order.
+        edges: The edge rows.
+
+    Returns:
+        bytes: The snapshot.
+    """
+    nodes = sorted(nodes, key=lambda node: node["id"])
+    position = {node["id"]: i for i, node in enumerate(nodes)}
+    ranks = {node["id"]: rank for rank, node in enumerate(sorted(nodes, key=lambda node: node["topo_index"]))}
+    edges = sorted(edges, key=lambda edge: edge["id"])
+
+    arrays = {name: array(typecode) for name, typecode, _ in SECTIONS}
+    strings = bytearray()
+    arrays["message_offsets"].append(0)
+    for node in nodes:
+        arrays["node_ids"].append(node["id"])
+        arrays["topo_ranks"].append(ranks[node["id"]])
+        arrays["node_types"].append(NODE_TYPES.index(node["discriminator"]))
+        arrays["statuses"].append(STATUSES.index(node["status"]) if node.get("status") else -1)
+        arrays["status_conditions"].append(
+            STATUSES.index(node["status_condition"]) if node.get("status_condition") else -1
+        )
+        arrays["node_flags"].append(
+            (HAS_OUT_EDGE if node.get("has_out_edge") else 0)
+            | (HAS_YES_EDGE if node.get("yes_edge_count") else 0)
+            | (HAS_NO_EDGE if node.get("no_edge_count") else 0)
+        )
+        arrays["subflow_ids"].append(node.get("subflow_id", -1))
+        strings += (node.get("message") or "").encode()
+        arrays["message_offsets"].append(len(strings))
+
+    for edge in edges:
+        arrays["edge_ids"].append(edge["id"])
+        arrays["edge_starts"].append(position[edge["start_node_id"]])
+        arrays["edge_ends"].append(position[edge["end_node_id"]])
+        arrays["edge_types"].append(EDGE_TYPES.index(edge["edge_type"]))
+
+    created_at = (workflow["created_at"] - EPOCH) // timedelta(microseconds=1)
+    chunks = [HEADER.pack(MAGIC, FORMAT_VERSION, len(nodes), len(edges), len(strings), workflow["id"], created_at)]
+    for name, _, _ in SECTIONS:
+        chunk = arrays[name].tobytes()
+        chunks.append(chunk + b"\0" * (-len(chunk) % 8))
+    chunks.append(bytes(strings))
+    return b"".join(chunks)
+
+
+class WorkflowSnapshot:
+    """
+    Snapshot read in place from a buffer, such as a memory-mapped file: the arrays are views of the buffer
+    and messages are only decoded when read.
+    """
+
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        if len(view) < HEADER.size:
+            raise _invalid("truncated header")
+        magic, version, self.node_count, self.edge_count, strings_size, self.workflow_id, created_at = \
+            HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise _invalid("not a workflow snapshot")
+        if version not in SECTIONS_BY_VERSION:
+            raise _invalid(f"unsupported format version {version}")
+        self.created_at = EPOCH + timedelta(microseconds=created_at)
+
+        offset = HEADER.size
+        self.arrays = {}
+        for name, typecode, length in SECTIONS_BY_VERSION[version]:
+            size = length(self.node_count, self.edge_count) * array(typecode).itemsize
+            if offset + size > len(view):
+                raise _invalid("truncated sections")
+            self.arrays[name] = view[offset:offset + size].cast(typecode)
+            offset += size + (-size % 8)
+        if offset + strings_size != len(view):
+            raise _invalid("string table size mismatch")
+        # Snapshots written before the sub-flow nodes have none
+        self.arrays.setdefault("subflow_ids", array("q", [-1] * self.node_count))
+        self._strings = view[offset:]
+        self._validate()
+
+    def _validate(self):
+        offsets = self.arrays["message_offsets"]
+        if offsets[0] != 0 or offsets[-1] != len(self._strings) or \
+                any(offsets[i] > offsets[i + 1] for i in range(self.node_count)):
+            raise _invalid("message offsets out of order")
+        if any(not 0 <= code < len(NODE_TYPES) for code in self.arrays["node_types"]):
+            raise _invalid("unknown node type")
+        for name in ("statuses", "status_conditions"):
+            if any(not -1 <= code < len(STATUSES) for code in self.arrays[name]):
+                raise _invalid("unknown status")
+        if any(not 0 <= code < len(EDGE_TYPES) for code in self.arrays["edge_types"]):
+            raise _invalid("unknown edge type")
+        for node_type, node_status, status_condition in zip(
+                self.arrays["node_types"], self.arrays["statuses"], self.arrays["status_conditions"]):
+            if NODE_TYPES[node_type] == "messagenode" and node_status < 0 or \
+                    NODE_TYPES[node_type] == "conditionnode" and status_condition < 0:
+                raise _invalid("missing status")
+        for node_type, subflow_id in zip(self.arrays["node_types"], self.arrays["subflow_ids"]):
+            if (NODE_TYPES[node_type] == "subflownode") != (subflow_id >= 0):
+                raise _invalid("sub-flow reference mismatch")
+        for name in ("edge_starts", "edge_ends"):
+            if any(not 0 <= i < self.node_count for i in self.arrays[name]):
+                raise _invalid("edge endpoint out of range")
+        ranks = self.arrays["topo_ranks"]
+        if any(ranks[start] >= ranks[end] for start, end in zip(self.arrays["edge_starts"], self.arrays["edge_ends"])):
+            raise _invalid("edges don't follow the topological order")
+        if sorted(self.arrays["topo_ranks"]) != list(range(self.node_count)):
+            raise _invalid("topological ranks are not a permutation")
+        self._validate_edges()
+
+    def _validate_edges(self):
+        """
+        Applies the rules the edge repository enforces on created edges: end nodes have no out edges,
+        start nodes no in edges, only condition nodes have yes and no edges, one of each,
+        and the other nodes have a single default out edge.
+        """
+        node_types = self.arrays["node_types"]
+        # Numbers of out edges keyed by the node position and the edge type
+        self._out_edges = Counter()
+        for start, end, edge_type in zip(self.arrays["edge_starts"], self.arrays["edge_ends"],
+                                         self.arrays["edge_types"]):
+            out_type = NODE_TYPES[node_types[start]]
+            edge_type = EDGE_TYPES[edge_type]
+            if out_type == "endnode":
+                raise _invalid("end node with an out edge")
+            if NODE_TYPES[node_types[end]] == "startnode":
+                raise _invalid("start node with an in edge")
+            if (out_type == "conditionnode") != (edge_type != EdgeType.DEFAULT):
+                raise _invalid(f"{edge_type.value} edge out of a {out_type}")
+            self._out_edges[start, edge_type] += 1
+        if any(count > 1 for count in self._out_edges.values()):
+            raise _invalid("node with more than one out edge of a type")
+
+    def message(self, i: int) -> str:
+        offsets = self.arrays["message_offsets"]
+        return bytes(self._strings[offsets[i]:offsets[i + 1]]).decode()
+
+    def node(self, i: int) -> dict:
+        """
+        Decodes the node at the position, with the columns of its node table.
+        The out edge flags are derived from the edges of the snapshot.
+        """
+        node_type = NODE_TYPES[self.arrays["node_types"][i]]
+        node = {"id": self.arrays["node_ids"][i], "discriminator": node_type}
+        if node_type in ("startnode", "messagenode", "subflownode"):
+            node["has_out_edge"] = bool(self._out_edges[i, EdgeType.DEFAULT])
+        if node_type == "subflownode":
+            node["subflow_id"] = self.arrays["subflow_ids"][i]
+        if node_type == "messagenode":
+            node["status"] = STATUSES[self.arrays["statuses"][i]]
+            node["message"] = self.message(i)
+        if node_type == "conditionnode":
+            node["status_condition"] = STATUSES[self.arrays["status_conditions"][i]]
+            node["yes_edge_count"] = bool(self._out_edges[i, EdgeType.YES])
+            node["no_edge_count"] = bool(self._out_edges[i, EdgeType.NO])
+        return node
+
+    def edge(self, i: int) -> dict:
+        return {
+            "id": self.arrays["edge_ids"][i],
+            "start": self.arrays["edge_starts"][i],
+            "end": self.arrays["edge_ends"][i],
+            "edge_type": EDGE_TYPES[self.arrays["edge_types"][i]],
+        }
@@ -1,5 +1,6 @@
 from typing import AsyncGenerator
 import asyncio
+import tempfile
 from httpx import AsyncClient
 import pytest
 from sqlalchemy import NullPool, select, insert, and_
@@ -8,7 +9,9 @@ from sqlalchemy.orm import sessionmaker
 from starlette.testclient import TestClient
 
 from src.config import settings
-from src.database import get_async_session
+from src.database import get_async_session, get_read_session_factory
+from src.graph.render_cache import render_cache
+from src.graph.shared_store import shared_graphs
 from src.main import app
 from src.models import Base, WorkFlow, StartNode, MessageNode, ConditionNode, EndNode, Status
 
@@ -32,6 +35,14 @@ async def override_get_async_session() -> AsyncGenerator[AsyncSession, None]:
 
 # overrides the dependency get_async_session in the app object with the asynchronous function.
 app.dependency_overrides[get_async_session] = override_get_async_session
+# overrides the dependency get_read_session_factory in the app object, so reads are served by the test database.
+app.dependency_overrides[get_read_session_factory] = lambda: test_SessionLocal
+# renders images of the test run into a directory of its own.
+render_cache.directory = tempfile.mkdtemp(prefix="workflow-renders-")
+# publishes compiled graphs into a directory of its own as well.
+shared_graphs.directory = tempfile.mkdtemp(prefix="workflow-graphs-")
+# tests warm caches explicitly, edits don't schedule background work.
+settings.prewarm_enabled = False
 
 
 @pytest.fixture(autouse=True, scope="session")
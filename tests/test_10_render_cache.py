@@ -0,0 +1,93 @@
+import os
+
+import networkx as nx
+
+from src.graph import render_cache as render_cache_module
+from src.graph.render_cache import RenderCache, ImageFormat
+from src.models import Status, EdgeType
+
+
+def make_graph(message_status: Status) -> nx.DiGraph:
+    graph = nx.DiGraph()
+    graph.add_node(1, type="startnode")
+    graph.add_node(2, type="messagenode", status=message_status)
+    graph.add_node(3, type="endnode")
+    graph.add_edge(1, 2, edge_id=10, edge_type=EdgeType.DEFAULT)
+    graph.add_edge(2, 3, edge_id=11, edge_type=EdgeType.DEFAULT)
+    return graph
+
+
+class TestRenderCache:
+    def test_key_depends_on_statuses_and_options(self):
+        graph = make_graph(Status.SENT)
+        key = RenderCache.key(graph=graph, path=[1, 2, 3], image_format=ImageFormat.PNG, width=640, height=480)
+
+        assert key == RenderCache.key(graph=make_graph(Status.SENT), path=[1, 2, 3], image_format=ImageFormat.PNG,
+                                      width=640, height=480)
+        assert key != RenderCache.key(graph=make_graph(Status.PENDING), path=[1, 2, 3],
+                                      image_format=ImageFormat.PNG, width=640, height=480)
+        assert key != RenderCache.key(graph=graph, path=[1, 2, 3], image_format=ImageFormat.SVG,
+                                      width=640, height=480)
+        assert key != RenderCache.key(graph=graph, path=[1, 2, 3], image_format=ImageFormat.PNG,
+                                      width=800, height=480)
+
+    def test_put_and_get(self, tmp_path):
+        cache = RenderCache(directory=str(tmp_path), max_bytes=1024)
+
+        assert cache.get(key="a", image_format=ImageFormat.PNG) is None
+
+        file = cache.put(key="a", image_format=ImageFormat.PNG, data=b"image")
+
+        assert cache.get(key="a", image_format=ImageFormat.PNG) == file
+        with open(file, "rb") as f:
+            assert f.read() == b"image"
+        assert not [name for name in os.listdir(tmp_path) if name.startswith(".tmp-")]
+
+    def test_evicts_least_recently_used(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(render_cache_module, "EVICTION_GRACE_SECONDS", 0)
+        cache = RenderCache(directory=str(tmp_path), max_bytes=12)
+
+        first = cache.put(key="a", image_format=ImageFormat.PNG, data=b"12345")
+        second = cache.put(key="b", image_format=ImageFormat.PNG, data=b"12345")
+        os.utime(first, (1, 1))
+        os.utime(second, (2, 2))
+        # Reading "a" makes "b" the least recently used
+        cache.get(key="a", image_format=ImageFormat.PNG)
+        cache.put(key="c", image_format=ImageFormat.PNG, data=b"12345")
+
+        assert cache.get(key="a", image_format=ImageFormat.PNG) is not None
+        assert cache.get(key="b", image_format=ImageFormat.PNG) is None
+        assert cache.get(key="c", image_format=ImageFormat.PNG) is not None
+
+    def test_evicts_recently_served_files_last(self, tmp_path):
+        cache = RenderCache(directory=str(tmp_path), max_bytes=12)
+
+        first = cache.put(key="a", image_format=ImageFormat.PNG, data=b"12345")
+        second = cache.put(key="b", image_format=ImageFormat.PNG, data=b"12345")
+        os.utime(second, (2, 2))
+        cache.put(key="c", image_format=ImageFormat.PNG, data=b"12345")
+
+        # "a" is in the grace period and "b" isn't, even though "b" is older
+        assert cache.get(key="a", image_format=ImageFormat.PNG) == first
+        assert cache.get(key="b", image_format=ImageFormat.PNG) is None
+
+        cache.put(key="d", image_format=ImageFormat.PNG, data=b"1234567890")
+
+        # The budget holds over the grace period
+        assert cache.get(key="a", image_format=ImageFormat.PNG) is None
+        assert cache.get(key="c", image_format=ImageFormat.PNG) is None
+        assert cache.get(key="d", image_format=ImageFormat.PNG) is not None
+
+    def test_keeps_running_total(self, tmp_path, monkeypatch):
+        cache = RenderCache(directory=str(tmp_path), max_bytes=1024)
+        scans = []
+        scandir = os.scandir
+        monkeypatch.setattr(os, "scandir", lambda path: scans.append(path) or scandir(path))
+
+        for key in ("a", "b", "a"):
+            cache.put(key=key, image_format=ImageFormat.PNG, data=b"12345")
+
+        # Only the first put scans the directory, replacing "a" doesn't count it twice
+        assert len(scans) == 1
+        with open(os.path.join(tmp_path, ".lock")) as lock:
+            assert lock.read() == "10"
@@ -0,0 +1,66 @@
+import os
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from src.graph.render_cache import ImageFormat, render_cache
+from src.graph.render_jobs import RenderJobQueue, JobStatus
+
+
+def wait_for(queue: RenderJobQueue, job_id: str, statuses) -> JobStatus:
+    for _ in range(500):
+        job = queue.get(job_id=job_id)
+        if job and job.status in statuses:
+            return job.status
+        threading.Event().wait(0.01)
+    raise AssertionError("Job did not finish")
+
+
+class TestRenderJobQueue:
+    def test_job_runs_and_is_found_in_render_cache(self):
+        queue = RenderJobQueue(max_workers=1, max_depth=0)
+
+        job = queue.submit(workflow_id=1, key="aa01", image_format=ImageFormat.PNG, render=lambda: render_cache.put(
+            key="aa01", image_format=ImageFormat.PNG, data=b"image"
+        ))
+
+        assert wait_for(queue, job.job_id, (JobStatus.DONE, JobStatus.FAILED)) == JobStatus.DONE
+        # Another worker finds the finished job in the shared render cache
+        other_worker_job = RenderJobQueue(max_workers=1, max_depth=0).get(job_id=job.job_id)
+        assert other_worker_job.status == JobStatus.DONE
+        assert other_worker_job.file == render_cache.get(key="aa01", image_format=ImageFormat.PNG)
+        assert other_worker_job.workflow_id == 1
+
+        # The worker that ran the job still knows it once the image is evicted, the others don't
+        os.unlink(job.file)
+        assert queue.get(job_id=job.job_id).status == JobStatus.DONE
+        assert RenderJobQueue(max_workers=1, max_depth=0).get(job_id=job.job_id) is None
+
+    def test_full_queue_is_refused(self):
+        queue = RenderJobQueue(max_workers=1, max_depth=1)
+        release = threading.Event()
+
+        def render():
+            release.wait(5)
+            raise HTTPException(status_code=404, detail="No path found between start and end nodes")
+
+        first = queue.submit(workflow_id=1, key="bb01", image_format=ImageFormat.PNG, render=render)
+        queue.submit(workflow_id=1, key="bb02", image_format=ImageFormat.PNG, render=render)
+        # The same image joins the queued job
+        assert queue.submit(workflow_id=1, key="bb01", image_format=ImageFormat.PNG, render=render) is first
+
+        with pytest.raises(HTTPException) as exc_info:
+            queue.submit(workflow_id=1, key="bb03", image_format=ImageFormat.PNG, render=render)
+        assert exc_info.value.status_code == 503
+
+        release.set()
+        assert wait_for(queue, first.job_id, (JobStatus.FAILED,)) == JobStatus.FAILED
+        assert queue.get(job_id=first.job_id).detail == "No path found between start and end nodes"
+
+    def test_unknown_job(self):
+        queue = RenderJobQueue(max_workers=1, max_depth=0)
+
+        assert queue.get(job_id="1-cc01.png") is None
+        assert queue.get(job_id="cc01.png") is None
+        assert queue.get(job_id="1-../cc01.png") is None
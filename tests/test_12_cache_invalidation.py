@@ -0,0 +1,56 @@
+import asyncio
+
+import networkx as nx
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.graph.compiled import CompiledWorkflow, compiled_workflows
+from src.invalidation import WorkflowChangeListener, handle_notification
+from src.repositories.start_node import StartNodeRepository
+
+
+async def wait_for_eviction(workflow_id: int) -> bool:
+    for _ in range(200):
+        if workflow_id not in compiled_workflows._entries:
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+class TestCacheInvalidation:
+    def test_newer_cached_version_is_kept(self):
+        compiled_workflows.put(CompiledWorkflow(workflow_id=-1, version=5, graph=nx.DiGraph()))
+
+        handle_notification("-1:4")
+        assert compiled_workflows.get(workflow_id=-1, version=5) is not None
+
+        handle_notification("-1:6")
+        assert compiled_workflows.get(workflow_id=-1, version=5) is None
+
+    async def test_committed_changes_evict_other_workers_caches(
+            self,
+            ac: AsyncClient,
+            session: AsyncSession,
+            get_or_create_workflow_id: int,
+            monkeypatch,
+    ):
+        listener = WorkflowChangeListener(engine=session.bind)
+        listener.start()
+        try:
+            await asyncio.sleep(0.2)
+            response = await ac.post("/workflow/create")
+            workflow_id = response.json()["id"]
+
+            # Another worker's edit, this worker still holds the previous version
+            compiled_workflows.put(CompiledWorkflow(workflow_id=workflow_id, version=0, graph=nx.DiGraph()))
+            with monkeypatch.context() as m:
+                m.setattr(compiled_workflows, "put", lambda compiled: None)
+                await StartNodeRepository(session=session).add({"workflow_id": workflow_id})
+            assert await wait_for_eviction(workflow_id)
+
+            compiled_workflows.put(CompiledWorkflow(workflow_id=workflow_id, version=1, graph=nx.DiGraph()))
+            response = await ac.delete(f"/workflow/delete/{workflow_id}")
+            assert response.status_code == 204
+            assert await wait_for_eviction(workflow_id)
+        finally:
+            await listener.stop()
@@ -0,0 +1,114 @@
+import os
+
+import networkx as nx
+
+from src.graph.shared_store import SharedGraphStore, SharedGraph, pack_graph
+from src.models import Status, EdgeType
+from src.repositories.workflow import WorkFlowRepository
+
+
+def make_workflow_graph() -> nx.DiGraph:
+    """
+    Builds start -> message -> condition, whose yes edge leads to the end node and no edge to another message.
+    """
+    graph = nx.DiGraph()
+    graph.add_node(1, type="startnode", topo_index=10)
+    graph.add_node(5, type="messagenode", topo_index=11, status=Status.SENT, message="Hello")
+    graph.add_node(3, type="conditionnode", topo_index=12, status_condition=Status.SENT)
+    graph.add_node(4, type="messagenode", topo_index=13, status=Status.PENDING, message="Bye")
+    graph.add_node(2, type="endnode", topo_index=14)
+    graph.add_edge(1, 5, edge_id=20, edge_type=EdgeType.DEFAULT)
+    graph.add_edge(5, 3, edge_id=21, edge_type=EdgeType.DEFAULT)
+    graph.add_edge(3, 4, edge_id=22, edge_type=EdgeType.NO)
+    graph.add_edge(3, 2, edge_id=23, edge_type=EdgeType.YES)
+    return graph
+
+
+class TestSharedGraph:
+    def test_matches_networkx_graph(self):
+        graph = make_workflow_graph()
+        shared = SharedGraph(pack_graph(workflow_id=7, version=3, graph=graph))
+
+        assert (shared.workflow_id, shared.version) == (7, 3)
+        assert shared.number_of_nodes() == 5
+        assert sorted(shared.nodes) == sorted(graph.nodes)
+        assert 3 in shared and 9 not in shared
+        assert shared.nodes[5] == {"type": "messagenode", "topo_index": 11, "status": Status.SENT}
+        assert shared.nodes[3]["status_condition"] == Status.SENT
+        for node_id in graph.nodes:
+            assert list(shared.successors(node_id)) == list(graph.successors(node_id))
+            assert list(shared.predecessors(node_id)) == list(graph.predecessors(node_id))
+        assert shared.get_edge_data(3, 2) == {"edge_id": 23, "edge_type": EdgeType.YES}
+        assert shared.get_edge_data(2, 3) is None
+        assert sorted(shared.edges) == sorted(graph.edges)
+        assert sorted(shared.to_networkx().edges(data=True)) == sorted(graph.edges(data=True))
+
+    def test_path_evaluation_matches_networkx_graph(self):
+        graph = make_workflow_graph()
+        shared = SharedGraph(pack_graph(workflow_id=7, version=3, graph=graph))
+
+        assert WorkFlowRepository._build_condition_based_path(graph=shared) == \
+               WorkFlowRepository._build_condition_based_path(graph=graph) == [1, 5, 3, 2]
+
+
+class TestSharedGraphStore:
+    def test_publish_and_open(self, tmp_path):
+        store = SharedGraphStore(directory=str(tmp_path), max_bytes=1024 * 1024)
+
+        assert store.open(workflow_id=7, version=1) is None
+
+        store.publish(workflow_id=7, version=1, graph=make_workflow_graph())
+        shared = store.publish(workflow_id=7, version=2, graph=make_workflow_graph())
+
+        assert shared.version == 2
+        assert store.open(workflow_id=7, version=2).number_of_nodes() == 5
+        # Older versions are removed, graphs mapped before keep working
+        assert store.open(workflow_id=7, version=1) is None
+        assert list(shared.successors(3)) == [4, 2]
+
+        store.discard(workflow_id=7)
+
+        assert store.open(workflow_id=7, version=2) is None
+        assert not [name for name in os.listdir(tmp_path) if not name.startswith(".")]
+
+    def test_open_checks_structure_hash(self, tmp_path):
+        store = SharedGraphStore(directory=str(tmp_path), max_bytes=1024 * 1024)
+        store.publish(workflow_id=7, version=1, graph=make_workflow_graph(), structure_hash=11)
+
+        assert store.open(workflow_id=7, version=1, structure_hash=11).structure_hash == 11
+        # The version number was reused by a change with another structure
+        assert store.open(workflow_id=7, version=1, structure_hash=12) is None
+
+    def test_evicts_least_recently_opened(self, tmp_path):
+        size = len(pack_graph(workflow_id=7, version=1, graph=make_workflow_graph()))
+        store = SharedGraphStore(directory=str(tmp_path), max_bytes=size * 5 // 2)
+
+        store.publish(workflow_id=7, version=1, graph=make_workflow_graph())
+        store.publish(workflow_id=8, version=1, graph=make_workflow_graph())
+        os.utime(store._file(workflow_id=7, version=1), (1, 1))
+        os.utime(store._file(workflow_id=8, version=1), (2, 2))
+        # Opening workflow 7 makes workflow 8 the least recently used
+        shared = store.open(workflow_id=7, version=1)
+        store.publish(workflow_id=9, version=1, graph=make_workflow_graph())
+
+        assert store.open(workflow_id=7, version=1) is not None
+        assert store.open(workflow_id=8, version=1) is None
+        assert store.open(workflow_id=9, version=1) is not None
+        # Mapped graphs outlive the eviction of their file
+        store.discard(workflow_id=7)
+        assert list(shared.successors(3)) == [4, 2]
+
+    def test_keeps_running_total(self, tmp_path):
+        store = SharedGraphStore(directory=str(tmp_path), max_bytes=1024 * 1024)
+        size = len(pack_graph(workflow_id=7, version=1, graph=make_workflow_graph()))
+
+        store.publish(workflow_id=7, version=1, graph=make_workflow_graph())
+        store.publish(workflow_id=7, version=2, graph=make_workflow_graph())
+        store.publish(workflow_id=8, version=1, graph=make_workflow_graph())
+        with store._lock() as lock:
+            # The older version of workflow 7 was removed
+            assert store._read_total(lock) == 2 * size
+
+        store.discard(workflow_id=7)
+        with store._lock() as lock:
+            assert store._read_total(lock) == size
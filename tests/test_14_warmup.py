@@ -0,0 +1,61 @@
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.access_counter import AccessCounter
+from src.graph.compiled import compiled_workflows
+from src.models import WorkFlow
+from src.repositories.start_node import StartNodeRepository
+from src.repositories.workflow import WorkFlowRepository
+from tests.conftest import test_SessionLocal
+
+
+class TestWarmUp:
+    requested_workflow_id = None
+    changed_workflow_id = None
+
+    async def test_access_counts_are_flushed(
+            self,
+            ac: AsyncClient,
+            session: AsyncSession,
+            get_or_create_workflow_id: int,
+    ):
+        TestWarmUp.requested_workflow_id = (await ac.post("/workflow/create")).json()["id"]
+        counter = AccessCounter()
+        for _ in range(1000):
+            counter.record(TestWarmUp.requested_workflow_id)
+
+        await counter.flush(session_factory=test_SessionLocal)
+        await counter.flush(session_factory=test_SessionLocal)
+
+        result = await session.execute(
+            select(WorkFlow.access_count).where(WorkFlow.id == TestWarmUp.requested_workflow_id)
+        )
+        assert result.scalar_one() == 1000
+
+    async def test_changes_bump_updated_at(
+            self,
+            ac: AsyncClient,
+            session: AsyncSession,
+    ):
+        TestWarmUp.changed_workflow_id = (await ac.post("/workflow/create")).json()["id"]
+        result = await session.execute(select(WorkFlow.updated_at).where(WorkFlow.id == TestWarmUp.changed_workflow_id))
+        created = result.scalar_one()
+
+        await StartNodeRepository(session=session).add({"workflow_id": TestWarmUp.changed_workflow_id})
+
+        result = await session.execute(select(WorkFlow.updated_at).where(WorkFlow.id == TestWarmUp.changed_workflow_id))
+        assert result.scalar_one() > created
+
+    async def test_warm_up(
+            self,
+            session: AsyncSession,
+    ):
+        compiled_workflows.clear()
+
+        warmed = await WorkFlowRepository(session=session).warm_up(limit=1)
+
+        assert sorted(warmed) == sorted([TestWarmUp.requested_workflow_id, TestWarmUp.changed_workflow_id])
+        for workflow_id in warmed:
+            version = await WorkFlowRepository(session=session).get_version(workflow_id=workflow_id)
+            assert compiled_workflows.get(workflow_id=workflow_id, version=version) is not None
@@ -0,0 +1,204 @@
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import Status, EdgeType
+from src.repositories.condition_node import ConditionNodeRepository
+from src.repositories.edge import EdgeRepository
+from src.repositories.end_node import EndNodeRepository
+from src.repositories.message_node import MessageNodeRepository
+from src.repositories.start_node import StartNodeRepository
+
+
+class TestSubflowNode:
+    subflow_id = None
+    workflow_id = None
+    subflow_node_id = None
+    message_node_id = None
+    subflow_path = []
+    nodes = {}
+
+    async def test_subflow_node_create(
+            self,
+            ac: AsyncClient,
+            get_or_create_workflow_id: int,
+    ):
+        TestSubflowNode.subflow_id = (await ac.post("/workflow/create")).json()["id"]
+        TestSubflowNode.workflow_id = (await ac.post("/workflow/create")).json()["id"]
+
+        response = await ac.post(
+            "/node/subflow/create",
+            json={"workflow_id": TestSubflowNode.workflow_id, "subflow_id": TestSubflowNode.subflow_id}
+        )
+
+        assert response.status_code == 201
+        assert response.json()["subflow_id"] == TestSubflowNode.subflow_id
+        assert response.json()["has_out_edge"] is False
+        TestSubflowNode.subflow_node_id = response.json()["id"]
+
+        response = await ac.get(f"/node/subflow/list?subflow_id={TestSubflowNode.subflow_id}")
+
+        assert response.status_code == 200
+        assert [node["id"] for node in response.json()] == [TestSubflowNode.subflow_node_id]
+
+    async def test_subflow_node_invalid_reference(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.post(
+            "/node/subflow/create",
+            json={"workflow_id": TestSubflowNode.workflow_id, "subflow_id": TestSubflowNode.workflow_id}
+        )
+        assert response.status_code == 400
+
+        # The sub-flow would use the workflow using it
+        response = await ac.post(
+            "/node/subflow/create",
+            json={"workflow_id": TestSubflowNode.subflow_id, "subflow_id": TestSubflowNode.workflow_id}
+        )
+        assert response.status_code == 400
+
+        response = await ac.post(
+            "/node/subflow/create",
+            json={"workflow_id": TestSubflowNode.workflow_id, "subflow_id": 999999}
+        )
+        assert response.status_code == 404
+
+    async def test_path_through_subflow(
+            self,
+            ac: AsyncClient,
+            session: AsyncSession,
+    ):
+        # Sub-flow: start -> message -> condition -(yes)-> end
+        start_node = await StartNodeRepository(session=session).add({"workflow_id": TestSubflowNode.subflow_id})
+        message_node = await MessageNodeRepository(session=session).add({
+            "status": Status.SENT,
+            "message": "Hello",
+            "workflow_id": TestSubflowNode.subflow_id
+        })
+        condition_node = await ConditionNodeRepository(session=session).add({
+            "status_condition": Status.SENT,
+            "workflow_id": TestSubflowNode.subflow_id
+        })
+        end_node = await EndNodeRepository(session=session).add({"workflow_id": TestSubflowNode.subflow_id})
+        for out_node, in_node, edge_type in (
+                (start_node, message_node, EdgeType.DEFAULT),
+                (message_node, condition_node, EdgeType.DEFAULT),
+                (condition_node, end_node, EdgeType.YES),
+        ):
+            await EdgeRepository(session=session).add({
+                "workflow_id": TestSubflowNode.subflow_id,
+                "start_node_id": out_node.id,
+                "end_node_id": in_node.id,
+                "edge_type": edge_type
+            })
+        TestSubflowNode.message_node_id = message_node.id
+        TestSubflowNode.subflow_path = [start_node.id, message_node.id, condition_node.id, end_node.id]
+
+        # Workflow: start -> sub-flow -> end
+        start_node = await StartNodeRepository(session=session).add({"workflow_id": TestSubflowNode.workflow_id})
+        end_node = await EndNodeRepository(session=session).add({"workflow_id": TestSubflowNode.workflow_id})
+        for out_node_id, in_node_id in (
+                (start_node.id, TestSubflowNode.subflow_node_id),
+                (TestSubflowNode.subflow_node_id, end_node.id),
+        ):
+            await EdgeRepository(session=session).add({
+                "workflow_id": TestSubflowNode.workflow_id,
+                "start_node_id": out_node_id,
+                "end_node_id": in_node_id,
+                "edge_type": EdgeType.DEFAULT
+            })
+        TestSubflowNode.nodes = {"start": start_node.id, "end": end_node.id}
+
+        response = await ac.get(f"/workflow/{TestSubflowNode.workflow_id}/path")
+
+        assert response.status_code == 200
+        # The sub-flow's path is inlined after its node
+        assert response.json() == [
+            start_node.id, TestSubflowNode.subflow_node_id, *TestSubflowNode.subflow_path, end_node.id
+        ]
+
+        response = await ac.get(f"/node/subflow/{TestSubflowNode.subflow_node_id}")
+        assert response.json()["has_out_edge"] is True
+
+    async def test_subflow_change_blocks_path(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.patch(
+            f"/node/message/update/{TestSubflowNode.message_node_id}",
+            json={"status": "pending"}
+        )
+        assert response.status_code == 200
+
+        response = await ac.get(f"/workflow/{TestSubflowNode.workflow_id}/path")
+        assert response.status_code == 404
+
+        await ac.patch(f"/node/message/update/{TestSubflowNode.message_node_id}", json={"status": "sent"})
+
+        response = await ac.get(f"/workflow/{TestSubflowNode.workflow_id}/path")
+        assert response.status_code == 200
+        assert response.json() == [
+            TestSubflowNode.nodes["start"], TestSubflowNode.subflow_node_id, *TestSubflowNode.subflow_path,
+            TestSubflowNode.nodes["end"]
+        ]
+
+    async def test_subflow_decision_table(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get(f"/workflow/{TestSubflowNode.workflow_id}/decision-table")
+
+        assert response.status_code == 200
+        table = response.json()
+        # The conditions of the sub-flow are decided in the workflow's table
+        assert table["message_node_ids"] == [TestSubflowNode.message_node_id]
+        outcomes = {outcome["conditions"][0]["equals"]: outcome for outcome in table["outcomes"]}
+        assert outcomes[True]["path"] == [
+            TestSubflowNode.nodes["start"], TestSubflowNode.subflow_node_id, *TestSubflowNode.subflow_path,
+            TestSubflowNode.nodes["end"]
+        ]
+        assert outcomes[False]["status_code"] == 404
+
+        response = await ac.post(
+            f"/workflow/{TestSubflowNode.workflow_id}/decision-table/evaluate",
+            json={"statuses": {str(TestSubflowNode.message_node_id): "pending"}}
+        )
+        assert response.status_code == 404
+
+        # The sub-flow's message node keeps its current status
+        response = await ac.post(f"/workflow/{TestSubflowNode.workflow_id}/decision-table/evaluate",
+                                 json={"statuses": {}})
+        assert response.status_code == 200
+        assert TestSubflowNode.message_node_id in response.json()
+
+    async def test_subflow_path_engines(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get(f"/workflow/{TestSubflowNode.workflow_id}/path", params={"engine": "sql"})
+        assert response.status_code == 400
+
+        response = await ac.get(f"/workflow/{TestSubflowNode.workflow_id}/path", params={"engine": "python"})
+        assert response.status_code == 200
+
+    async def test_subflow_stats(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get(f"/workflow/{TestSubflowNode.workflow_id}/stats")
+
+        assert response.status_code == 200
+        assert response.json()["subflow_node_count"] == 1
+
+    async def test_delete_used_subflow(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.delete(f"/workflow/delete/{TestSubflowNode.subflow_id}")
+        assert response.status_code == 409
+
+        response = await ac.delete(f"/node/subflow/delete/{TestSubflowNode.subflow_node_id}")
+        assert response.status_code == 204
+
+        response = await ac.delete(f"/workflow/delete/{TestSubflowNode.subflow_id}")
+        assert response.status_code == 204
@@ -0,0 +1,100 @@
+from httpx import AsyncClient
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models import WorkFlowVersion, WorkFlowVersionElement
+
+
+async def _stored_elements(session: AsyncSession, version_id: int) -> int:
+    result = await session.execute(
+        select(func.count()).select_from(WorkFlowVersionElement).where(WorkFlowVersionElement.version_id == version_id)
+    )
+    return result.scalar_one()
+
+
+def _elements(document: dict) -> dict:
+    """
+    Keeps the nodes and edges of a workflow or version document, sorted by their IDs.
+    """
+    return {
+        name: sorted(value, key=lambda element: element["id"])
+        for name, value in document.items() if name.endswith("nodes") or name == "edges"
+    }
+
+
+class TestWorkflowVersion:
+    workflow_id = None
+    documents = {}
+
+    async def test_save_versions(
+            self,
+            ac: AsyncClient,
+            session: AsyncSession,
+            monkeypatch,
+            get_or_create_workflow_id: int,
+    ):
+        monkeypatch.setattr(settings, "version_checkpoint_interval", 3)
+        TestWorkflowVersion.workflow_id = workflow_id = (await ac.post("/workflow/create")).json()["id"]
+        start_node = (await ac.post("/node/start/create", json={"workflow_id": workflow_id})).json()
+        message_nodes = [
+            (await ac.post(
+                "/node/message/create",
+                json={"status": "pending", "message": f"Message {i}", "workflow_id": workflow_id}
+            )).json()
+            for i in range(5)
+        ]
+        await ac.post("/edge/create", json={
+            "workflow_id": workflow_id,
+            "start_node_id": start_node["id"],
+            "end_node_id": message_nodes[0]["id"],
+            "edge_type": "default"
+        })
+
+        edits = [
+            lambda: ac.patch(f"/node/message/update/{message_nodes[1]['id']}", json={"status": "sent"}),
+            lambda: ac.delete(f"/node/message/delete/{message_nodes[0]['id']}"),
+            lambda: ac.post("/node/end/create", json={"workflow_id": workflow_id}),
+            lambda: ac.patch(f"/node/message/update/{message_nodes[2]['id']}", json={"message": "Changed"}),
+        ]
+        for number in range(1, len(edits) + 2):
+            response = await ac.post(f"/workflow/{workflow_id}/versions")
+
+            assert response.status_code == 201
+            assert response.json()["number"] == number
+            assert response.json()["is_checkpoint"] == (number in (1, 4))
+            TestWorkflowVersion.documents[number] = _elements((await ac.get(f"/workflow/{workflow_id}")).json())
+            if number <= len(edits):
+                await edits[number - 1]()
+
+        # Deltas only store the changed nodes and edges
+        result = await session.execute(
+            select(WorkFlowVersion.number, WorkFlowVersion.id)
+            .where(WorkFlowVersion.workflow_id == workflow_id)
+            .order_by(WorkFlowVersion.number)
+        )
+        stored = [await _stored_elements(session, version_id) for _, version_id in result]
+        # Checkpoint, changed message, removed message and edge with the start node freeing its out edge,
+        # checkpoint, changed message
+        assert stored == [7, 1, 3, 6, 1]
+
+    async def test_get_versions(
+            self,
+            ac: AsyncClient,
+    ):
+        for number, document in TestWorkflowVersion.documents.items():
+            response = await ac.get(f"/workflow/{TestWorkflowVersion.workflow_id}/versions/{number}")
+
+            assert response.status_code == 200
+            assert response.json()["number"] == number
+            assert _elements(response.json()) == document
+
+    async def test_get_version_not_found(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get(f"/workflow/{TestWorkflowVersion.workflow_id}/versions/100")
+        assert response.status_code == 404
+
+        response = await ac.post("/workflow/999999/versions")
+        assert response.status_code == 404
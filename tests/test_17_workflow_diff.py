@@ -0,0 +1,140 @@
+from httpx import AsyncClient
+
+
+class TestWorkflowDiff:
+    workflow_id = None
+    nodes = {}
+
+    async def test_diff_versions(
+            self,
+            ac: AsyncClient,
+            get_or_create_workflow_id: int,
+    ):
+        TestWorkflowDiff.workflow_id = workflow_id = (await ac.post("/workflow/create")).json()["id"]
+        start_node = (await ac.post("/node/start/create", json={"workflow_id": workflow_id})).json()
+        message_node = (await ac.post(
+            "/node/message/create",
+            json={"status": "pending", "message": "Hello", "workflow_id": workflow_id}
+        )).json()
+        end_node = (await ac.post("/node/end/create", json={"workflow_id": workflow_id})).json()
+        await ac.post("/edge/create", json={
+            "workflow_id": workflow_id,
+            "start_node_id": start_node["id"],
+            "end_node_id": message_node["id"],
+            "edge_type": "default"
+        })
+        await ac.post(f"/workflow/{workflow_id}/versions")
+        TestWorkflowDiff.nodes = {"start": start_node["id"], "message": message_node["id"], "end": end_node["id"]}
+
+        await ac.patch(f"/node/message/update/{message_node['id']}", json={"status": "sent"})
+        added_node = (await ac.post(
+            "/node/message/create",
+            json={"status": "opened", "message": "Bye", "workflow_id": workflow_id}
+        )).json()
+        await ac.post("/edge/create", json={
+            "workflow_id": workflow_id,
+            "start_node_id": message_node["id"],
+            "end_node_id": end_node["id"],
+            "edge_type": "default"
+        })
+        await ac.delete(f"/node/end/delete/{end_node['id']}")
+
+        response = await ac.get("/workflow/diff", params={"a": f"{workflow_id}:1", "b": str(workflow_id)})
+
+        assert response.status_code == 200
+        nodes, edges = response.json()["nodes"], response.json()["edges"]
+        assert [node["id"] for node in nodes["added"]] == [added_node["id"]]
+        assert nodes["added"][0]["collection"] == "message_nodes"
+        assert [node["id"] for node in nodes["removed"]] == [end_node["id"]]
+        assert len(nodes["changed"]) == 1
+        assert nodes["changed"][0]["before"]["status"] == "pending"
+        assert nodes["changed"][0]["after"]["status"] == "sent"
+        # The edge to the end node went with it
+        assert edges == {"added": [], "removed": []}
+
+        response = await ac.get("/workflow/diff", params={"a": str(workflow_id), "b": str(workflow_id)})
+
+        assert response.json()["nodes"] == {"added": [], "removed": [], "changed": []}
+
+    async def test_diff_clone(
+            self,
+            ac: AsyncClient,
+    ):
+        clone_id = (await ac.post(f"/workflow/{TestWorkflowDiff.workflow_id}/clone")).json()["id"]
+
+        response = await ac.get("/workflow/diff", params={"a": str(TestWorkflowDiff.workflow_id), "b": str(clone_id)})
+
+        assert response.status_code == 200
+        assert response.json()["nodes"] == {"added": [], "removed": [], "changed": []}
+        assert response.json()["edges"] == {"added": [], "removed": []}
+
+        # Nodes of different workflows are matched by their type, status and order among the nodes like them,
+        # the message whose status changed counts as removed and added
+        response = await ac.get("/workflow/diff", params={"a": f"{TestWorkflowDiff.workflow_id}:1", "b": str(clone_id)})
+
+        nodes, edges = response.json()["nodes"], response.json()["edges"]
+        assert sorted(node["status"] for node in nodes["added"]) == ["opened", "sent"]
+        assert {node["workflow_id"] for node in nodes["added"]} == {clone_id}
+        assert sorted(node["id"] for node in nodes["removed"]) == [TestWorkflowDiff.nodes["message"],
+                                                                   TestWorkflowDiff.nodes["end"]]
+        assert nodes["changed"] == []
+        # The edge from the start node leads to another message
+        assert [edge["end_node_id"] for edge in edges["removed"]] == [TestWorkflowDiff.nodes["message"]]
+        assert [edge["workflow_id"] for edge in edges["added"]] == [clone_id]
+
+    async def test_diff_ignores_unrelated_edits(
+            self,
+            ac: AsyncClient,
+    ):
+        clone_id = (await ac.post(f"/workflow/{TestWorkflowDiff.workflow_id}/clone")).json()["id"]
+        clone = (await ac.get(f"/workflow/{clone_id}")).json()
+        # Removing the node first in the topological order doesn't shift the matching of the others
+        start_node_id = clone["start_nodes"][0]["id"]
+        await ac.delete(f"/node/start/delete/{start_node_id}")
+        message_node_id = next(node["id"] for node in clone["message_nodes"] if node["status"] == "sent")
+        await ac.patch(f"/node/message/update/{message_node_id}", json={"message": "Changed"})
+
+        response = await ac.get("/workflow/diff", params={"a": str(TestWorkflowDiff.workflow_id), "b": str(clone_id)})
+
+        nodes, edges = response.json()["nodes"], response.json()["edges"]
+        assert nodes["added"] == []
+        assert [node["collection"] for node in nodes["removed"]] == ["start_nodes"]
+        assert [change["after"]["id"] for change in nodes["changed"]] == [message_node_id]
+        assert edges["added"] == []
+        assert [edge["edge_type"] for edge in edges["removed"]] == ["default"]
+
+    async def test_diff_edges(
+            self,
+            ac: AsyncClient,
+    ):
+        workflow_id = TestWorkflowDiff.workflow_id
+        await ac.post(f"/workflow/{workflow_id}/versions")
+        end_node = (await ac.post("/node/end/create", json={"workflow_id": workflow_id})).json()
+        edge = (await ac.post("/edge/create", json={
+            "workflow_id": workflow_id,
+            "start_node_id": TestWorkflowDiff.nodes["message"],
+            "end_node_id": end_node["id"],
+            "edge_type": "default"
+        })).json()
+
+        response = await ac.get("/workflow/diff", params={"a": f"{workflow_id}:2", "b": str(workflow_id)})
+
+        assert response.json()["edges"]["added"] == [edge]
+
+        response = await ac.get("/workflow/diff", params={"a": str(workflow_id), "b": f"{workflow_id}:2"})
+
+        assert [removed["id"] for removed in response.json()["edges"]["removed"]] == [edge["id"]]
+
+    async def test_diff_invalid(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get("/workflow/diff", params={"a": "first", "b": str(TestWorkflowDiff.workflow_id)})
+        assert response.status_code == 400
+
+        response = await ac.get("/workflow/diff", params={"a": "999999", "b": str(TestWorkflowDiff.workflow_id)})
+        assert response.status_code == 404
+
+        response = await ac.get("/workflow/diff", params={"a": f"{TestWorkflowDiff.workflow_id}:100",
+                                                          "b": str(TestWorkflowDiff.workflow_id)})
+        assert response.status_code == 404
@@ -2,7 +2,7 @@ from httpx import AsyncClient
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.models import MessageNode, EdgeType
+from src.models import MessageNode, EdgeType, NodeInterface, Status
 from src.repositories.condition_node import ConditionNodeRepository
 from src.repositories.edge import EdgeRepository
 from src.repositories.message_node import MessageNodeRepository
@@ -312,3 +312,67 @@ class TestEdge:
         await session.refresh(start_node)
 
         assert start_node.has_out_edge is False
+
+
+class TestEdgeTopologicalOrder:
+    workflow_id = None
+    message_node_ids = []
+
+    async def test_create_nodes(
+            self,
+            ac: AsyncClient,
+            session: AsyncSession
+    ):
+        response = await ac.post("/workflow/create")
+        TestEdgeTopologicalOrder.workflow_id = response.json()["id"]
+
+        for message in ("first", "second", "third"):
+            node = await MessageNodeRepository(session).add({
+                "status": Status.SENT,
+                "message": message,
+                "workflow_id": TestEdgeTopologicalOrder.workflow_id
+            })
+            TestEdgeTopologicalOrder.message_node_ids.append(node.id)
+
+    async def test_backward_edge_reorders_nodes(
+            self,
+            session: AsyncSession
+    ):
+        first, second, third = TestEdgeTopologicalOrder.message_node_ids
+        await EdgeRepository(session).add({
+            "workflow_id": TestEdgeTopologicalOrder.workflow_id,
+            "start_node_id": third,
+            "end_node_id": first,
+            "edge_type": EdgeType.DEFAULT
+        })
+        await EdgeRepository(session).add({
+            "workflow_id": TestEdgeTopologicalOrder.workflow_id,
+            "start_node_id": second,
+            "end_node_id": third,
+            "edge_type": EdgeType.DEFAULT
+        })
+
+        result = await session.execute(
+            select(NodeInterface.id).where(NodeInterface.id.in_([first, second, third])).order_by(NodeInterface.topo_index)
+        )
+        assert result.scalars().all() == [second, third, first]
+
+    async def test_cycle_edge_error(
+            self,
+            ac: AsyncClient
+    ):
+        first, second, third = TestEdgeTopologicalOrder.message_node_ids
+        response = await ac.post(
+            "/edge/create",
+            json={
+                "workflow_id": TestEdgeTopologicalOrder.workflow_id,
+                "start_node_id": first,
+                "end_node_id": second,
+                "edge_type": EdgeType.DEFAULT.value
+            }
+        )
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Cannot create an edge that closes a cycle"
+
+        await ac.delete(f"/workflow/delete/{TestEdgeTopologicalOrder.workflow_id}")
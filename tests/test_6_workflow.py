@@ -1,16 +1,71 @@
+import asyncio
+import os
+from datetime import datetime
+
 from httpx import AsyncClient
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.models import Status, EdgeType
+from src.config import settings
+from src.executor import prewarm_debouncer
+from src.graph.compiled import compiled_workflows
+from src.graph.render_cache import ImageFormat, render_cache
+from src.graph.shared_store import SharedGraph, shared_graphs
+from src.graph.structure import STRUCTURE_HASH_MODULUS, node_hash, edge_hash, structures
+from src.models import Status, EdgeType, WorkFlowPath, WorkFlow
 from src.repositories.condition_node import ConditionNodeRepository
 from src.repositories.edge import EdgeRepository
 from src.repositories.end_node import EndNodeRepository
 from src.repositories.message_node import MessageNodeRepository
 from src.repositories.start_node import StartNodeRepository
+from src.repositories.workflow import WorkFlowRepository, PathEngine
+from src.snapshot import MEDIA_TYPE, HEADER, WorkflowSnapshot, pack_snapshot
+
+
+def _snapshot_shape(snapshot: WorkflowSnapshot):
+    """
+    Describes the nodes and edges of a snapshot by their topological ranks, so workflows can be compared
+    regardless of their IDs.
+    """
+    ranks = snapshot.arrays["topo_ranks"]
+    nodes = sorted(
+        (ranks[i], {key: value for key, value in snapshot.node(i).items() if key != "id"})
+        for i in range(snapshot.node_count)
+    )
+    edges = sorted(
+        (ranks[edge["start"]], ranks[edge["end"]], edge["edge_type"].value)
+        for edge in map(snapshot.edge, range(snapshot.edge_count))
+    )
+    return nodes, edges
+
+
+def _pack(nodes: list, edges: list) -> bytes:
+    """
+    Packs a snapshot of nodes given as (ID, discriminator, extra columns) and edges given as
+    (start node ID, end node ID, edge type), the nodes listed in their topological order.
+    """
+    return pack_snapshot(
+        workflow={"id": 1, "created_at": datetime.now()},
+        nodes=[{"id": node_id, "discriminator": discriminator, "topo_index": index, **columns}
+               for index, (node_id, discriminator, columns) in enumerate(nodes)],
+        edges=[{"id": index, "start_node_id": start, "end_node_id": end, "edge_type": edge_type}
+               for index, (start, end, edge_type) in enumerate(edges)]
+    )
+
+
+def _as_format_version_1(data: bytes) -> bytes:
+    """
+    Rewrites a snapshot without sub-flow nodes in format version 1, which has no sub-flow section.
+    """
+    magic, _, node_count, edge_count, strings_size, workflow_id, created_at = HEADER.unpack_from(data)
+    header = HEADER.pack(magic, 1, node_count, edge_count, strings_size, workflow_id, created_at)
+    sections_end = len(data) - strings_size - node_count * 8
+    return header + data[HEADER.size:sections_end] + data[len(data) - strings_size:]
 
 
 class TestWorkflow:
     workflow_id = None
+    nodes = {}
 
     async def test_create_workflow(
             self,
@@ -93,6 +148,643 @@ class TestWorkflow:
         assert response.status_code == 200
         assert response.json() == [start_node.id, message_node_1.id, condition_node.id, end_node.id]
 
+        TestWorkflow.nodes = {
+            "start": start_node.id,
+            "message_1": message_node_1.id,
+            "message_2": message_node_2.id,
+            "condition": condition_node.id,
+            "end": end_node.id,
+        }
+
+    async def test_materialised_path(
+            self,
+            session: AsyncSession,
+    ):
+        nodes = TestWorkflow.nodes
+        result = await session.execute(select(WorkFlowPath).where(WorkFlowPath.workflow_id == TestWorkflow.workflow_id))
+        materialised = result.scalar_one()
+        version = await WorkFlowRepository(session=session).get_version(workflow_id=TestWorkflow.workflow_id)
+
+        assert materialised.version == version
+        assert materialised.path == [nodes["start"], nodes["message_1"], nodes["condition"], nodes["end"]]
+        assert materialised.status_code == 200
+
+    async def test_path_between_nodes(
+            self,
+            ac: AsyncClient,
+    ):
+        nodes = TestWorkflow.nodes
+        response = await ac.get(
+            f"/workflow/{TestWorkflow.workflow_id}/path",
+            params={"from": nodes["message_1"], "to": nodes["end"]}
+        )
+
+        assert response.status_code == 200
+        assert response.json() == [nodes["message_1"], nodes["condition"], nodes["end"]]
+
+    async def test_path_sql_engine(
+            self,
+            ac: AsyncClient,
+    ):
+        nodes = TestWorkflow.nodes
+        for params in ({}, {"from": nodes["message_1"]}, {"to": nodes["condition"]},
+                       {"from": nodes["message_2"], "to": nodes["end"]}, {"to": 999999}):
+            python = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/path", params={**params, "engine": "python"})
+            sql = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/path", params={**params, "engine": "sql"})
+
+            assert sql.status_code == python.status_code
+            assert sql.json() == python.json()
+
+    async def test_path_sql_engine_chosen_by_size(
+            self,
+            ac: AsyncClient,
+            monkeypatch,
+    ):
+        nodes = TestWorkflow.nodes
+        monkeypatch.setattr(settings, "sql_path_engine_threshold", 0)
+        compiled_workflows.evict(TestWorkflow.workflow_id)
+
+        response = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/path", params={"from": nodes["message_1"]})
+
+        assert response.status_code == 200
+        assert response.json() == [nodes["message_1"], nodes["condition"], nodes["end"]]
+        assert TestWorkflow.workflow_id not in compiled_workflows._entries
+
+    async def test_compiled_graph_shared_between_workers(
+            self,
+            ac: AsyncClient,
+            session: AsyncSession,
+    ):
+        nodes = TestWorkflow.nodes
+        # Another worker of the host has nothing compiled yet
+        compiled_workflows.evict(TestWorkflow.workflow_id)
+
+        compiled = await WorkFlowRepository(session=session).get_compiled(workflow_id=TestWorkflow.workflow_id)
+
+        assert isinstance(compiled.graph, SharedGraph)
+        # Left to the first reachability query
+        assert not compiled.is_indexed
+        response = await ac.get(
+            f"/workflow/{TestWorkflow.workflow_id}/path",
+            params={"from": nodes["start"], "engine": "python"}
+        )
+        assert response.json() == [nodes["start"], nodes["message_1"], nodes["condition"], nodes["end"]]
+
+    async def test_reachable(
+            self,
+            ac: AsyncClient,
+    ):
+        nodes = TestWorkflow.nodes
+        response = await ac.get(
+            f"/workflow/{TestWorkflow.workflow_id}/reachable",
+            params={"from": nodes["message_1"], "to": nodes["end"]}
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {"from_node_id": nodes["message_1"], "to_node_id": nodes["end"], "reachable": True}
+
+        response = await ac.get(
+            f"/workflow/{TestWorkflow.workflow_id}/reachable",
+            params={"from": nodes["message_2"], "to": nodes["end"]}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["reachable"] is False
+
+    async def test_reachable_node_not_found(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get(
+            f"/workflow/{TestWorkflow.workflow_id}/reachable",
+            params={"from": TestWorkflow.nodes["start"], "to": 999999}
+        )
+
+        assert response.status_code == 404
+
+    async def test_neighbourhood(
+            self,
+            ac: AsyncClient,
+    ):
+        nodes = TestWorkflow.nodes
+        response = await ac.get(
+            f"/workflow/{TestWorkflow.workflow_id}/neighbourhood",
+            params={"node_id": nodes["condition"]}
+        )
+
+        assert response.status_code == 200
+        neighbourhood = response.json()
+        assert [node["id"] for node in neighbourhood["start_nodes"]] == []
+        assert [node["id"] for node in neighbourhood["message_nodes"]] == [nodes["message_1"], nodes["message_2"]]
+        assert [node["id"] for node in neighbourhood["condition_nodes"]] == [nodes["condition"]]
+        assert [node["id"] for node in neighbourhood["end_nodes"]] == [nodes["end"]]
+        assert len(neighbourhood["edges"]) == 3
+
+        response = await ac.get(
+            f"/workflow/{TestWorkflow.workflow_id}/neighbourhood",
+            params={"node_id": nodes["end"], "hops": 2, "direction": "in"}
+        )
+
+        assert response.status_code == 200
+        neighbourhood = response.json()
+        assert [node["id"] for node in neighbourhood["message_nodes"]] == [nodes["message_1"]]
+        assert [node["id"] for node in neighbourhood["condition_nodes"]] == [nodes["condition"]]
+        assert [(edge["start_node_id"], edge["end_node_id"]) for edge in neighbourhood["edges"]] == [
+            (nodes["message_1"], nodes["condition"]),
+            (nodes["condition"], nodes["end"]),
+        ]
+
+    async def test_neighbourhood_node_not_found(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get(
+            f"/workflow/{TestWorkflow.workflow_id}/neighbourhood",
+            params={"node_id": 999999}
+        )
+
+        assert response.status_code == 404
+
+    async def test_path_follows_status_update(
+            self,
+            ac: AsyncClient,
+    ):
+        nodes = TestWorkflow.nodes
+        response = await ac.patch(f"/node/message/update/{nodes['message_1']}", json={"status": "pending"})
+        assert response.status_code == 200
+
+        response = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/path")
+        assert response.status_code == 404
+
+        response = await ac.patch(f"/node/message/update/{nodes['message_1']}", json={"status": "sent"})
+        assert response.status_code == 200
+
+        response = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/path")
+        assert response.status_code == 200
+        assert response.json() == [nodes["start"], nodes["message_1"], nodes["condition"], nodes["end"]]
+
+    async def test_change_leaves_index_and_shared_graph_to_queries(
+            self,
+            ac: AsyncClient,
+    ):
+        nodes = TestWorkflow.nodes
+        response = await ac.patch(f"/node/message/update/{nodes['message_1']}", json={"status": "sent"})
+        assert response.status_code == 200
+
+        compiled = compiled_workflows._entries[TestWorkflow.workflow_id]
+        assert not compiled.is_indexed
+        assert shared_graphs.open(workflow_id=TestWorkflow.workflow_id, version=compiled.version) is None
+
+        response = await ac.get(
+            f"/workflow/{TestWorkflow.workflow_id}/reachable",
+            params={"from": nodes["start"], "to": nodes["end"]}
+        )
+        assert response.status_code == 200
+        assert compiled.is_indexed
+
+    async def test_decision_table(
+            self,
+            ac: AsyncClient,
+    ):
+        nodes = TestWorkflow.nodes
+        response = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/decision-table")
+
+        assert response.status_code == 200
+        table = response.json()
+        assert table["message_node_ids"] == [nodes["message_1"]]
+        outcomes = {outcome["conditions"][0]["equals"]: outcome for outcome in table["outcomes"]}
+        assert outcomes[True]["conditions"] == [{"message_node_id": nodes["message_1"], "status": "sent", "equals": True}]
+        assert outcomes[True]["path"] == [nodes["start"], nodes["message_1"], nodes["condition"], nodes["end"]]
+        assert outcomes[False]["path"] is None
+        assert outcomes[False]["status_code"] == 404
+
+    async def test_decision_table_evaluate(
+            self,
+            ac: AsyncClient,
+    ):
+        nodes = TestWorkflow.nodes
+        response = await ac.post(f"/workflow/{TestWorkflow.workflow_id}/decision-table/evaluate", json={})
+        assert response.status_code == 200
+        assert response.json() == [nodes["start"], nodes["message_1"], nodes["condition"], nodes["end"]]
+
+        response = await ac.post(
+            f"/workflow/{TestWorkflow.workflow_id}/decision-table/evaluate",
+            json={"statuses": {str(nodes["message_1"]): "pending"}}
+        )
+        assert response.status_code == 404
+
+    async def test_path_image_workflow(
+            self,
+            ac: AsyncClient,
+            monkeypatch,
+    ):
+        # Renders the image in the graph executor
+        monkeypatch.setattr(settings, "graph_executor_threshold", 0)
+
+        response = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/path/image")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/png"
+        assert response.content.startswith(b"\x89PNG")
+
+    async def test_path_image_svg_workflow(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get(
+            f"/workflow/{TestWorkflow.workflow_id}/path/image",
+            params={"format": "svg", "width": 320, "height": 240}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("image/svg+xml")
+        assert b"<svg" in response.content
+
+    async def test_path_image_job_workflow(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.post(
+            f"/workflow/{TestWorkflow.workflow_id}/path/image/jobs",
+            params={"width": 330, "height": 250}
+        )
+
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        for _ in range(500):
+            response = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/path/image/jobs/{job_id}")
+            assert response.status_code == 200
+            if response.json()["status"] == "done":
+                break
+            await asyncio.sleep(0.01)
+
+        response = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/path/image/jobs/{job_id}/result")
+
+        assert response.status_code == 200
+        assert response.content.startswith(b"\x89PNG")
+
+        # The job belongs to its workflow
+        response = await ac.get(f"/workflow/{TestWorkflow.workflow_id + 1}/path/image/jobs/{job_id}")
+        assert response.status_code == 404
+        response = await ac.get(f"/workflow/{TestWorkflow.workflow_id + 1}/path/image/jobs/{job_id}/result")
+        assert response.status_code == 404
+
+        os.unlink(WorkFlowRepository.get_path_image_job(workflow_id=TestWorkflow.workflow_id, job_id=job_id).file)
+        response = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/path/image/jobs/{job_id}/result")
+
+        assert response.status_code == 410
+
+    async def test_path_image_job_not_found(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/path/image/jobs/{TestWorkflow.workflow_id}-abc.png")
+
+        assert response.status_code == 404
+
+    async def test_prewarm_after_edits(
+            self,
+            ac: AsyncClient,
+            session: AsyncSession,
+            monkeypatch,
+            tmp_path,
+    ):
+        nodes = TestWorkflow.nodes
+        monkeypatch.setattr(settings, "prewarm_enabled", True)
+        monkeypatch.setattr(prewarm_debouncer, "delay", 0.05)
+        monkeypatch.setattr(render_cache, "directory", str(tmp_path))
+
+        for message in ("Hello", "Hello, i'm fine"):
+            response = await ac.patch(f"/node/message/update/{nodes['message_1']}", json={"message": message})
+            assert response.status_code == 200
+
+        compiled = await WorkFlowRepository(session=session).get_compiled(workflow_id=TestWorkflow.workflow_id)
+        key = render_cache.key(graph=compiled.graph, path=[nodes["start"], nodes["message_1"], nodes["condition"],
+                                                           nodes["end"]], image_format=ImageFormat.PNG, width=640,
+                               height=480)
+        for _ in range(500):
+            if render_cache.get(key=key, image_format=ImageFormat.PNG):
+                break
+            await asyncio.sleep(0.01)
+
+        assert render_cache.get(key=key, image_format=ImageFormat.PNG)
+        assert (None, None) in compiled.paths
+
+    async def test_concurrent_path_images_share_one_render(
+            self,
+            ac: AsyncClient,
+            monkeypatch,
+    ):
+        builds = []
+        build_graph_and_path = WorkFlowRepository._build_graph_and_path
+
+        async def counted_build_graph_and_path(repository, **kwargs):
+            builds.append(kwargs)
+            await asyncio.sleep(0.05)
+            return await build_graph_and_path(repository, **kwargs)
+
+        monkeypatch.setattr(WorkFlowRepository, "_build_graph_and_path", counted_build_graph_and_path)
+
+        responses = await asyncio.gather(*[
+            ac.get(f"/workflow/{TestWorkflow.workflow_id}/path/image", params={"width": 350}) for _ in range(5)
+        ])
+
+        assert [response.status_code for response in responses] == [200] * 5
+        assert len(builds) == 1
+
+    async def test_focused_path_image_workflow(
+            self,
+            ac: AsyncClient,
+            session: AsyncSession,
+            monkeypatch,
+    ):
+        nodes = TestWorkflow.nodes
+        monkeypatch.setattr(settings, "focused_render_threshold", 0)
+        monkeypatch.setattr(settings, "focused_render_halo", 0)
+
+        response = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/path/image")
+
+        assert response.status_code == 200
+        assert response.content.startswith(b"\x89PNG")
+
+        compiled = await WorkFlowRepository(session=session).get_compiled(workflow_id=TestWorkflow.workflow_id)
+        path = [nodes["start"], nodes["message_1"], nodes["condition"], nodes["end"]]
+        focused = WorkFlowRepository._build_focused_graph(graph=compiled.networkx(), path=path, halo=0)
+
+        assert set(focused.nodes) == {*path, f"more-{nodes['condition']}"}
+        assert focused.nodes[f"more-{nodes['condition']}"]["label"] == "+1 more"
+
+    async def test_stream_workflow(
+            self,
+            ac: AsyncClient,
+            monkeypatch,
+    ):
+        # Forces every row into its own chunk
+        monkeypatch.setattr(settings, "stream_chunk_size", 1)
+        response = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/stream")
+        expected = (await ac.get(f"/workflow/{TestWorkflow.workflow_id}")).json()
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        streamed = response.json()
+        assert streamed.keys() == expected.keys()
+        for key, value in expected.items():
+            if isinstance(value, list):
+                assert streamed[key] == sorted(value, key=lambda item: item["id"])
+            else:
+                assert streamed[key] == value
+
+    async def test_stream_workflow_not_found(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get("/workflow/999999/stream")
+
+        assert response.status_code == 404
+
+    async def test_snapshot_round_trip(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/snapshot")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == MEDIA_TYPE
+        snapshot = WorkflowSnapshot(response.content)
+        assert snapshot.workflow_id == TestWorkflow.workflow_id
+
+        response = await ac.post("/workflow/snapshot", content=response.content)
+
+        assert response.status_code == 201
+        imported_id = response.json()["id"]
+        assert imported_id != TestWorkflow.workflow_id
+        original = (await ac.get(f"/workflow/{TestWorkflow.workflow_id}/stats")).json()
+        imported = (await ac.get(f"/workflow/{imported_id}/stats")).json()
+        assert {key: value for key, value in imported.items() if key != "id"} == \
+               {key: value for key, value in original.items() if key != "id"}
+        original = (await ac.get(f"/workflow/{TestWorkflow.workflow_id}/path")).json()
+        response = await ac.get(f"/workflow/{imported_id}/path")
+        imported = response.json()
+        assert response.status_code == 200
+        assert len(imported) == len(original)
+        reimported = WorkflowSnapshot((await ac.get(f"/workflow/{imported_id}/snapshot")).content)
+        assert _snapshot_shape(reimported) == _snapshot_shape(snapshot)
+
+    async def test_snapshot_invalid(
+            self,
+            ac: AsyncClient,
+    ):
+        snapshot = (await ac.get(f"/workflow/{TestWorkflow.workflow_id}/snapshot")).content
+
+        for data in (b"", b"not a snapshot" * 10, snapshot[:-1]):
+            response = await ac.post("/workflow/snapshot", content=data)
+
+            assert response.status_code == 400
+
+    async def test_snapshot_edge_rules(
+            self,
+            ac: AsyncClient,
+    ):
+        start = (1, "startnode", {})
+        message = (2, "messagenode", {"status": Status.PENDING, "message": "Hello"})
+        condition = (3, "conditionnode", {"status_condition": Status.SENT})
+        end = (4, "endnode", {})
+        other_end = (5, "endnode", {})
+        invalid = {
+            "end node with an out edge": ([start, end, message], [(4, 2, EdgeType.DEFAULT)]),
+            "start node with an in edge": ([message, start], [(2, 1, EdgeType.DEFAULT)]),
+            "yes edge out of a messagenode": ([message, end], [(2, 4, EdgeType.YES)]),
+            "default edge out of a conditionnode": ([condition, end], [(3, 4, EdgeType.DEFAULT)]),
+            "node with more than one out edge of a type": (
+                [message, end, other_end], [(2, 4, EdgeType.DEFAULT), (2, 5, EdgeType.DEFAULT)]
+            ),
+        }
+        for detail, (nodes, edges) in invalid.items():
+            response = await ac.post("/workflow/snapshot", content=_pack(nodes=nodes, edges=edges))
+
+            assert response.status_code == 400
+            assert response.json()["detail"] == f"Invalid snapshot: {detail}"
+
+        # The out edge flags come from the edges, the flags packed in the snapshot are left unset
+        data = _pack(nodes=[start, message, end], edges=[(1, 2, EdgeType.DEFAULT), (2, 4, EdgeType.DEFAULT)])
+        response = await ac.post("/workflow/snapshot", content=data)
+
+        assert response.status_code == 201
+        workflow = (await ac.get(f"/workflow/{response.json()['id']}")).json()
+        assert [node["has_out_edge"] for node in workflow["start_nodes"] + workflow["message_nodes"]] == [True, True]
+
+    async def test_snapshot_format_version_1(
+            self,
+            ac: AsyncClient,
+    ):
+        data = (await ac.get(f"/workflow/{TestWorkflow.workflow_id}/snapshot")).content
+        snapshot = WorkflowSnapshot(_as_format_version_1(data))
+
+        assert _snapshot_shape(snapshot) == _snapshot_shape(WorkflowSnapshot(data))
+        response = await ac.post("/workflow/snapshot", content=_as_format_version_1(data))
+        assert response.status_code == 201
+
+    async def test_snapshot_subflow_not_found(
+            self,
+            ac: AsyncClient,
+    ):
+        data = _pack(nodes=[(1, "startnode", {}), (2, "subflownode", {"subflow_id": 999999})], edges=[])
+
+        response = await ac.post("/workflow/snapshot", content=data)
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid snapshot: sub-flow workflow (ID: 999999) not found"
+
+    async def test_snapshot_not_found(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get("/workflow/999999/snapshot")
+
+        assert response.status_code == 404
+
+    async def test_clone_workflow(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.post(f"/workflow/{TestWorkflow.workflow_id}/clone")
+
+        assert response.status_code == 201
+        clone_id = response.json()["id"]
+        original = (await ac.get(f"/workflow/{TestWorkflow.workflow_id}")).json()
+        clone = (await ac.get(f"/workflow/{clone_id}")).json()
+        for name in ("start_nodes", "message_nodes", "condition_nodes", "end_nodes", "edges"):
+            assert len(clone[name]) == len(original[name])
+            assert not {item["id"] for item in clone[name]} & {item["id"] for item in original[name]}
+        assert all(edge["workflow_id"] == clone_id for edge in clone["edges"])
+
+        original_stats = (await ac.get(f"/workflow/{TestWorkflow.workflow_id}/stats")).json()
+        clone_stats = (await ac.get(f"/workflow/{clone_id}/stats")).json()
+        assert {key: value for key, value in clone_stats.items() if key != "id"} == \
+               {key: value for key, value in original_stats.items() if key != "id"}
+
+        original_snapshot = WorkflowSnapshot((await ac.get(f"/workflow/{TestWorkflow.workflow_id}/snapshot")).content)
+        clone_snapshot = WorkflowSnapshot((await ac.get(f"/workflow/{clone_id}/snapshot")).content)
+        assert _snapshot_shape(clone_snapshot) == _snapshot_shape(original_snapshot)
+
+        response = await ac.get(f"/workflow/{clone_id}/path")
+        assert response.status_code == (await ac.get(f"/workflow/{TestWorkflow.workflow_id}/path")).status_code
+
+    async def test_clone_workflow_not_found(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.post("/workflow/999999/clone")
+
+        assert response.status_code == 404
+
+    async def test_structure_hash_maintained(
+            self,
+            ac: AsyncClient,
+            session: AsyncSession,
+    ):
+        document = await WorkFlowRepository(session=session).get_document(workflow_id=TestWorkflow.workflow_id)
+        discriminators = {}
+        expected = 0
+        for name in ("start_nodes", "message_nodes", "condition_nodes", "end_nodes"):
+            for node in document[name]:
+                discriminators[node["id"]] = name[:-len("_nodes")].replace("_", "") + "node"
+                expected += node_hash(discriminators[node["id"]], node.get("status") or node.get("status_condition"))
+        for edge in document["edges"]:
+            expected += edge_hash(edge["edge_type"], discriminators[edge["start_node_id"]],
+                                  discriminators[edge["end_node_id"]])
+
+        result = await session.execute(select(WorkFlow.structure_hash).where(WorkFlow.id == TestWorkflow.workflow_id))
+        structure_hash = result.scalar_one()
+        assert structure_hash == expected % STRUCTURE_HASH_MODULUS
+
+        # Changing a status and changing it back restores the hash
+        message_node = TestWorkflow.nodes["message_1"]
+        await ac.patch(f"/node/message/update/{message_node}", json={"status": "pending"})
+        session.expire_all()
+        result = await session.execute(select(WorkFlow.structure_hash).where(WorkFlow.id == TestWorkflow.workflow_id))
+        assert result.scalar_one() != structure_hash
+        await ac.patch(f"/node/message/update/{message_node}", json={"status": "sent"})
+        result = await session.execute(select(WorkFlow.structure_hash).where(WorkFlow.id == TestWorkflow.workflow_id))
+        assert result.scalar_one() == structure_hash
+
+    async def test_structure_shared_between_clones(
+            self,
+            ac: AsyncClient,
+            session: AsyncSession,
+            monkeypatch,
+    ):
+        clone_id = (await ac.post(f"/workflow/{TestWorkflow.workflow_id}/clone")).json()["id"]
+        compiled_workflows.clear()
+        structures.clear()
+        repository = WorkFlowRepository(session=session)
+        path = await repository.get_path(workflow_id=TestWorkflow.workflow_id, engine=PathEngine.PYTHON)
+        _, table = await repository.get_decision_table(workflow_id=TestWorkflow.workflow_id)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("Computed again")
+
+        # The clone reuses the path and the decision table computed for the original
+        monkeypatch.setattr(WorkFlowRepository, "_build_condition_based_path", fail)
+        original = await repository.get_compiled(workflow_id=TestWorkflow.workflow_id)
+        clone = await repository.get_compiled(workflow_id=clone_id)
+        assert clone.structure is original.structure
+        node_ids = dict(zip(original.order, clone.order))
+        clone_path = await repository.get_path(workflow_id=clone_id, engine=PathEngine.PYTHON)
+        assert clone_path == [node_ids[node_id] for node_id in path]
+        _, clone_table = await repository.get_decision_table(workflow_id=clone_id)
+        assert clone_table.outcomes == table.relabel(graph=None, node_ids=node_ids).outcomes
+        assert clone.layout() == {node_ids[node_id]: position for node_id, position in original.layout().items()}
+
+    async def test_stats_workflow(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/stats")
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "id": TestWorkflow.workflow_id,
+            "start_node_count": 1,
+            "message_node_count": 2,
+            "condition_node_count": 1,
+            "end_node_count": 1,
+            "subflow_node_count": 0,
+            "default_edge_count": 2,
+            "yes_edge_count": 1,
+            "no_edge_count": 1,
+            "has_start_node": True,
+            "has_end_node": True,
+            "start_node_connected": True,
+            "end_node_connected": True,
+        }
+
+    async def test_stats_after_node_delete(
+            self,
+            ac: AsyncClient,
+            session: AsyncSession,
+    ):
+        end_node = (await EndNodeRepository(session=session).list(workflow_id=TestWorkflow.workflow_id))[0]
+        await EndNodeRepository(session=session).delete(model_object_id=end_node.id)
+
+        response = await ac.get(f"/workflow/{TestWorkflow.workflow_id}/stats")
+
+        assert response.status_code == 200
+        assert response.json()["end_node_count"] == 0
+        assert response.json()["yes_edge_count"] == 0
+        assert response.json()["no_edge_count"] == 1
+        assert response.json()["has_end_node"] is False
+        assert response.json()["end_node_connected"] is False
+
+    async def test_stats_workflow_not_found(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get("/workflow/999999/stats")
+
+        assert response.status_code == 404
+
     async def test_delete_workflow(
             self,
             ac: AsyncClient,
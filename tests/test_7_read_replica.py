@@ -0,0 +1,93 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import NullPool, text, insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from src import database
+from src.config import settings
+from src.database import get_read_session_factory
+from src.main import app
+from src.models import Base, WorkFlow
+from tests.conftest import test_SessionLocal
+
+# Workflow ID only the replica has
+REPLICA_ONLY_WORKFLOW_ID = 1_000_000
+
+
+class TestReadReplica:
+    @pytest.fixture(autouse=True)
+    async def replica(self):
+        """
+        Fixture providing a second database standing for the read replica, with a workflow only it has.
+        The primary and the replica of the application are switched to the test databases, so the real routing
+        of the read dependencies is exercised.
+
+        Yields:
+            sessionmaker: The session factory of the replica.
+        """
+        primary_url = make_url(settings.db_url)
+        replica_name = f"{primary_url.database}_replica"
+        admin_engine = create_async_engine(primary_url, poolclass=NullPool, isolation_level="AUTOCOMMIT")
+        async with admin_engine.connect() as conn:
+            await conn.execute(text(f'DROP DATABASE IF EXISTS "{replica_name}"'))
+            await conn.execute(text(f'CREATE DATABASE "{replica_name}"'))
+
+        replica_engine = create_async_engine(primary_url.set(database=replica_name), poolclass=NullPool)
+        async with replica_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(WorkFlow).values(id=REPLICA_ONLY_WORKFLOW_ID))
+        replica_SessionLocal = sessionmaker(replica_engine, class_=AsyncSession, autocommit=False, autoflush=False,
+                                            expire_on_commit=False)
+
+        override = app.dependency_overrides.pop(get_read_session_factory)
+        primary, read = database.SessionLocal, database.ReadSessionLocal
+        database.SessionLocal, database.ReadSessionLocal = test_SessionLocal, replica_SessionLocal
+        try:
+            yield replica_SessionLocal
+        finally:
+            database.SessionLocal, database.ReadSessionLocal = primary, read
+            app.dependency_overrides[get_read_session_factory] = override
+            await replica_engine.dispose()
+            async with admin_engine.connect() as conn:
+                await conn.execute(text(f'DROP DATABASE IF EXISTS "{replica_name}" WITH (FORCE)'))
+            await admin_engine.dispose()
+
+    async def test_reads_use_replica(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get(f"/workflow/{REPLICA_ONLY_WORKFLOW_ID}")
+
+        assert response.status_code == 200
+        assert response.json()["id"] == REPLICA_ONLY_WORKFLOW_ID
+
+        response = await ac.get("/workflow/list")
+
+        assert [workflow["id"] for workflow in response.json()] == [REPLICA_ONLY_WORKFLOW_ID]
+
+    async def test_force_primary(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.get(f"/workflow/{REPLICA_ONLY_WORKFLOW_ID}", headers={"X-Force-Primary": "true"})
+
+        assert response.status_code == 404
+
+    async def test_read_your_writes(
+            self,
+            ac: AsyncClient,
+    ):
+        response = await ac.post("/workflow/create")
+        workflow_id = response.json()["id"]
+
+        # The write went to the primary, which the replica hasn't caught up with
+        response = await ac.get(f"/workflow/{workflow_id}")
+        assert response.status_code == 404
+
+        response = await ac.get(f"/workflow/{workflow_id}", headers={"X-Force-Primary": "true"})
+        assert response.status_code == 200
+        assert response.json()["id"] == workflow_id
+
+        await ac.delete(f"/workflow/delete/{workflow_id}")
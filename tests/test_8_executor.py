@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import time
+
+import networkx as nx
+import pytest
+from fastapi import HTTPException
+
+from src.config import settings
+from src.executor import run_graph_task, check_deadline, graph_deadline, Debouncer, SingleFlight
+from src.graph.compiled import CompiledWorkflow
+from src.graph.decision_table import DecisionTable
+from src.repositories.workflow import WorkFlowRepository
+
+
+class TestGraphExecutor:
+    async def test_small_graph_runs_inline(self):
+        thread_name = await run_graph_task(1, lambda: threading.current_thread().name)
+
+        assert thread_name == threading.current_thread().name
+
+    async def test_large_graph_runs_in_executor(self, monkeypatch):
+        monkeypatch.setattr(settings, "graph_executor_threshold", 10)
+
+        thread_name = await run_graph_task(11, lambda: threading.current_thread().name)
+
+        assert thread_name.startswith("graph")
+
+    async def test_deadline_exceeded(self, monkeypatch):
+        monkeypatch.setattr(settings, "graph_executor_threshold", 0)
+        monkeypatch.setattr(settings, "graph_deadline_seconds", 0.05)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await run_graph_task(1, time.sleep, 0.5)
+
+        assert exc_info.value.status_code == 504
+
+    async def test_work_stops_at_deadline(self, monkeypatch):
+        monkeypatch.setattr(settings, "graph_executor_threshold", 0)
+        monkeypatch.setattr(settings, "graph_deadline_seconds", 0.05)
+        stopped = threading.Event()
+
+        def work():
+            try:
+                while True:
+                    check_deadline()
+                    time.sleep(0.01)
+            except HTTPException:
+                stopped.set()
+                raise
+
+        with pytest.raises(HTTPException):
+            await run_graph_task(1, work)
+
+        # The thread gave up too instead of holding its slot in the executor
+        assert await asyncio.get_running_loop().run_in_executor(None, stopped.wait, 1)
+
+    async def test_deadline_is_shared_by_the_request(self, monkeypatch):
+        monkeypatch.setattr(settings, "graph_executor_threshold", 0)
+
+        with graph_deadline(0.15):
+            await run_graph_task(1, time.sleep, 0.1)
+            with pytest.raises(HTTPException) as exc_info:
+                await run_graph_task(1, time.sleep, 0.1)
+
+        assert exc_info.value.status_code == 504
+
+
+class TestDeadlineIsNotMemoised:
+    @staticmethod
+    def make_compiled() -> CompiledWorkflow:
+        graph = nx.DiGraph()
+        graph.add_node(1, type="startnode", topo_index=0)
+        graph.add_node(2, type="endnode", topo_index=1)
+        graph.add_edge(1, 2, edge_type="default", edge_id=1)
+        return CompiledWorkflow(workflow_id=1, version=1, graph=graph)
+
+    def test_path_after_timeout(self):
+        compiled = self.make_compiled()
+
+        with graph_deadline(-1):
+            with pytest.raises(HTTPException) as exc_info:
+                WorkFlowRepository._evaluate_path(compiled=compiled)
+        assert exc_info.value.status_code == 504
+
+        # A later request with time left gets the path
+        with graph_deadline(30):
+            assert WorkFlowRepository._evaluate_path(compiled=compiled) == [1, 2]
+
+    def test_decision_table_after_timeout(self):
+        compiled = self.make_compiled()
+        calls = []
+
+        def evaluate(graph, decide):
+            calls.append(1)
+            if len(calls) == 1:
+                raise HTTPException(status_code=504, detail="Graph processing exceeded the deadline")
+            return [1, 2]
+
+        with pytest.raises(HTTPException) as exc_info:
+            DecisionTable.compile(graph=compiled.graph, evaluate=evaluate)
+        assert exc_info.value.status_code == 504
+
+        table = DecisionTable.compile(graph=compiled.graph, evaluate=evaluate)
+        assert [outcome["path"] for outcome in table.outcomes] == [[1, 2]]
+        assert table.is_portable
+
+    def test_timed_out_outcome_is_not_portable(self):
+        table = DecisionTable(graph=None, root={}, outcomes=[{"status_code": 504, "path": None, "conditions": []}])
+
+        assert not table.is_portable
+
+
+class TestDebouncer:
+    async def test_burst_is_coalesced(self):
+        debouncer = Debouncer(delay=0.05)
+        runs = []
+
+        async def task(key):
+            runs.append(key)
+
+        for _ in range(5):
+            debouncer.schedule(1, lambda: task(1))
+            await asyncio.sleep(0.01)
+        debouncer.schedule(2, lambda: task(2))
+        await asyncio.sleep(0.2)
+
+        assert sorted(runs) == [1, 2]
+
+
+class TestSingleFlight:
+    async def test_concurrent_calls_share_one_run(self):
+        single_flight = SingleFlight()
+        runs = []
+
+        async def compute(key):
+            runs.append(key)
+            await asyncio.sleep(0.05)
+            return key
+
+        results = await asyncio.gather(
+            *[single_flight.do("a", lambda: compute("a")) for _ in range(5)],
+            single_flight.do("b", lambda: compute("b"))
+        )
+
+        assert results == ["a"] * 5 + ["b"]
+        assert runs == ["a", "b"]
+
+        assert await single_flight.do("a", lambda: compute("a")) == "a"
+        assert runs == ["a", "b", "a"]
+
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        single_flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.05)
+            return 1
+
+        first = asyncio.ensure_future(single_flight.do("a", compute))
+        second = asyncio.ensure_future(single_flight.do("a", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        assert await second == 1
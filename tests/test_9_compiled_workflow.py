@@ -0,0 +1,49 @@
+import random
+
+import networkx as nx
+
+from src.graph.compiled import CompiledWorkflow, CompiledWorkflowCache
+
+
+def make_graph(nodes: int, edges: int, seed: int) -> nx.DiGraph:
+    """
+    Builds a random DAG whose topo_index attributes hold a topological order.
+    """
+    rng = random.Random(seed)
+    graph = nx.DiGraph()
+    order = list(range(nodes))
+    rng.shuffle(order)
+    for node_id in range(nodes):
+        graph.add_node(node_id, topo_index=order.index(node_id))
+    while graph.number_of_edges() < edges:
+        out_node_id, in_node_id = rng.sample(range(nodes), 2)
+        if order.index(out_node_id) > order.index(in_node_id):
+            out_node_id, in_node_id = in_node_id, out_node_id
+        graph.add_edge(out_node_id, in_node_id)
+    return graph
+
+
+class TestCompiledWorkflow:
+    def test_reachability_index_matches_graph_search(self):
+        graph = make_graph(nodes=60, edges=90, seed=7)
+        compiled = CompiledWorkflow(workflow_id=1, version=1, graph=graph)
+        compiled.build_reachability_index()
+
+        for from_node_id in graph.nodes:
+            descendants = nx.descendants(graph, from_node_id) | {from_node_id}
+            for to_node_id in graph.nodes:
+                assert compiled.is_reachable(from_node_id, to_node_id) == (to_node_id in descendants)
+
+    def test_cache_returns_current_version_only(self):
+        cache = CompiledWorkflowCache(max_size=1)
+        compiled = CompiledWorkflow(workflow_id=1, version=2, graph=make_graph(nodes=3, edges=1, seed=1))
+        cache.put(compiled)
+
+        assert cache.get(workflow_id=1, version=2) is compiled
+        assert cache.get(workflow_id=1, version=3) is None
+
+        cache.put(CompiledWorkflow(workflow_id=1, version=1, graph=compiled.graph))
+        assert cache.get(workflow_id=1, version=2) is compiled
+
+        cache.put(CompiledWorkflow(workflow_id=2, version=1, graph=compiled.graph))
+        assert cache.get(workflow_id=1, version=2) is None